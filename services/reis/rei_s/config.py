@@ -25,6 +25,11 @@ def update_tempdir() -> None:
 update_tempdir()
 
 
+# the engines for extracting the text of pdfs, see `PdfProvider`
+PdfEngine = Literal["fast", "pdfminer", "pypdf"]
+DEFAULT_PDF_ENGINES: tuple[PdfEngine, ...] = ("pdfminer", "pypdf")
+
+
 def check_required_arguments(needed: Mapping[str, str | SecretStr | None], switch_name: str, switch_value: str) -> None:
     missing = []
     for name, value in needed.items():
@@ -72,9 +77,46 @@ class Config(BaseSettings, frozen=True):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore", env_ignore_empty=True)
 
     workers: Annotated[int, Field(gt=0)] = 1
+    # additional workers, which only process interactive requests (`/files/process`), such that they are not
+    # queued behind large uploads
+    interactive_workers: Annotated[int, Field(ge=0)] = 1
     metrics_port: Annotated[int, Field(ge=0)] = 9200
     batch_size: Annotated[int, Field(gt=0)] | None = None
+    # generate the pdf preview and embed the next batch while the current batch is written to the vector store
+    pipelined_ingest: bool = True
+    # number of batches of a file which are embedded at the same time
+    embedding_concurrency: Annotated[int, Field(gt=0)] = 1
+    # where the cpu-bound parsing, chunking and converting runs, the i/o always runs in the threads of the workers:
+    # `hybrid` uses the worker pool for files above the filesize_threshold, `process` for all files and `thread` never
+    # `adaptive` chunks a file in the worker pool, if its measured cpu time per byte of the provider is expected to
+    # exceed the overhead of the pool, and falls back to `hybrid` until a provider was measured
+    executor_type: Literal["thread", "hybrid", "adaptive", "process"] = "hybrid"
     filesize_threshold: Annotated[int, Field(gt=0)] = 10**5
+    # pre-warmed worker processes for files above the filesize_threshold, defaults to the number of workers and
+    # interactive workers
+    worker_pool_size: Annotated[int, Field(gt=0)] | None = None
+    # worker processes are replaced after this many tasks or if they used more memory (in bytes)
+    worker_pool_max_tasks: Annotated[int, Field(gt=0)] = 50
+    worker_pool_max_memory: Annotated[int, Field(gt=0)] = 2 * 10**9
+    # large pdfs are split into ranges of pages, which are parsed in parallel by the worker pool
+    pdf_parallel_parsing: bool = True
+    pdf_parallel_min_pages: Annotated[int, Field(gt=0)] = 100
+    pdf_page_range_size: Annotated[int, Field(gt=0)] = 50
+    # the pdf engines are tried in this order, the next one continues if an engine fails or declines the file
+    pdf_engines: Annotated[tuple[PdfEngine, ...], Field(min_length=1)] = DEFAULT_PDF_ENGINES
+    # office files are converted by this many long-running LibreOffice instances of the main process, defaults to the
+    # number of workers and interactive workers, 0 disables them
+    # they need unoserver and unoconvert, otherwise a new soffice process converts each file
+    libre_office_pool_size: Annotated[int, Field(ge=0)] | None = None
+    # a conversion is aborted after this many seconds and its instance is restarted
+    libre_office_timeout: Annotated[int, Field(gt=0)] = 300
+    # uploads are rejected with 429 before their body is read, if this many files or bytes are accepted but not
+    # processed yet, and with 503, if less disk space (in bytes) would be left
+    max_queued_files: Annotated[int, Field(gt=0)] | None = None
+    max_queued_bytes: Annotated[int, Field(gt=0)] | None = None
+    min_free_disk: Annotated[int, Field(ge=0)] | None = None
+    # the rejected clients are asked to retry after this many seconds
+    admission_retry_after: Annotated[int, Field(gt=0)] = 30
 
     embeddings_type: Literal[
         "azure-openai", "openai", "openai-compatible", "random-test-embeddings", "ollama", "bedrock", "nvidia"
@@ -106,11 +148,42 @@ class Config(BaseSettings, frozen=True):
     embeddings_nvidia_base_url: str | None = None
     embeddings_nvidia_api_key: SecretStr | None = None
 
+    # cache for the embeddings of chunks, keyed by the embeddings model and the hash of the chunk text
+    embeddings_cache_type: Literal["sqlite", "postgres"] | None = None
+    embeddings_cache_sqlite_path: str | None = None
+    # defaults to STORE_PGVECTOR_URL
+    embeddings_cache_postgres_url: SecretStr | None = None
+    embeddings_cache_max_entries: Annotated[int, Field(gt=0)] = 10**6
+    # time to live in seconds
+    embeddings_cache_ttl: Annotated[int, Field(gt=0)] = 30 * 24 * 60 * 60
+    # in-memory cache for the embeddings of search queries, 0 disables the cache
+    query_embeddings_cache_size: Annotated[int, Field(ge=0)] = 1000
+    # time to live in seconds
+    query_embeddings_cache_ttl: Annotated[int, Field(gt=0)] = 60 * 60
+
+    # ingests, which are requested with `Prefer: respond-async`, are persisted as jobs and resumed after a restart
+    job_store_type: Literal["sqlite", "postgres"] | None = None
+    job_store_sqlite_path: str | None = None
+    # defaults to STORE_PGVECTOR_URL
+    job_store_postgres_url: SecretStr | None = None
+    # the uploaded files are kept here until their job is finished, it needs to survive restarts
+    job_spool_dir: str | None = None
+    # a job is resumed by another process, if its process did not renew it for this many seconds
+    job_lease: Annotated[int, Field(gt=0)] = 60
+    # a job is started by at most this many processes, then it fails, e.g. if it crashes every process running it
+    job_max_attempts: Annotated[int, Field(gt=0)] = 3
+    # finished and failed jobs are kept for the status api until they were not updated for this many seconds
+    job_ttl: Annotated[int, Field(gt=0)] = 7 * 24 * 60 * 60
+
     stt_type: Literal["azure-openai-whisper"] | None = None
     stt_azure_openai_whisper_endpoint: str | None = None
     stt_azure_openai_whisper_api_key: SecretStr | None = None
     stt_azure_openai_whisper_api_version: str | None = None
     stt_azure_openai_whisper_deployment_name: str | None = None
+    # number of segments of an audio file, which are transcribed at the same time
+    stt_concurrency: Annotated[int, Field(gt=0)] = 4
+    # a segment is transcribed again after connection errors, rate limits and server errors
+    stt_retries: Annotated[int, Field(ge=0)] = 3
 
     store_type: Literal["azure-ai-search", "pgvector", "dev-null"]
     # needed for Azure AI Search vectorstore
@@ -128,8 +201,13 @@ class Config(BaseSettings, frozen=True):
     file_store_s3_secret_access_key: SecretStr | None = None
     file_store_s3_bucket_name: str | None = None
     file_store_s3_region_name: str | None = None
+    # number of concurrent requests, when checking the existence of several files
+    file_store_s3_max_concurrency: Annotated[int, Field(gt=0)] = 16
     # needed for filesystem filestore
     file_store_filesystem_basepath: str | None = None
+    # the search results remember for this many seconds, whether a pdf is in the file store, 0 disables the cache
+    file_exists_cache_ttl: Annotated[int, Field(ge=0)] = 30
+    file_exists_cache_size: Annotated[int, Field(gt=0)] = 10000
 
     @model_validator(mode="after")
     def store_dependend_requirements(self) -> Self:
@@ -222,6 +300,45 @@ class Config(BaseSettings, frozen=True):
 
         return self
 
+    @model_validator(mode="after")
+    def embeddings_cache_dependend_requirements(self) -> Self:
+        if self.embeddings_cache_type == "sqlite":
+            needed_for_sqlite = {
+                "EMBEDDINGS_CACHE_SQLITE_PATH": self.embeddings_cache_sqlite_path,
+            }
+            check_required_arguments(needed_for_sqlite, "EMBEDDINGS_CACHE_TYPE", "sqlite")
+
+        if self.embeddings_cache_type == "postgres":
+            if self.embeddings_cache_postgres_url is None and self.store_pgvector_url is None:
+                raise ValueError(
+                    'With EMBEDDINGS_CACHE_TYPE == "postgres": '
+                    "EMBEDDINGS_CACHE_POSTGRES_URL or STORE_PGVECTOR_URL is required but was not given."
+                )
+            check_valid_postgres_connection_string(self.embeddings_cache_postgres_url or self.store_pgvector_url)
+
+        return self
+
+    @model_validator(mode="after")
+    def job_store_dependend_requirements(self) -> Self:
+        if self.job_store_type is not None:
+            check_required_arguments({"JOB_SPOOL_DIR": self.job_spool_dir}, "JOB_STORE_TYPE", self.job_store_type)
+
+        if self.job_store_type == "sqlite":
+            needed_for_sqlite = {
+                "JOB_STORE_SQLITE_PATH": self.job_store_sqlite_path,
+            }
+            check_required_arguments(needed_for_sqlite, "JOB_STORE_TYPE", "sqlite")
+
+        if self.job_store_type == "postgres":
+            if self.job_store_postgres_url is None and self.store_pgvector_url is None:
+                raise ValueError(
+                    'With JOB_STORE_TYPE == "postgres": '
+                    "JOB_STORE_POSTGRES_URL or STORE_PGVECTOR_URL is required but was not given."
+                )
+            check_valid_postgres_connection_string(self.job_store_postgres_url or self.store_pgvector_url)
+
+        return self
+
     @model_validator(mode="after")
     def stt_dependend_requirements(self) -> Self:
         if self.stt_type == "azure-openai-whisper":
@@ -1,5 +1,39 @@
-from prometheus_client import Counter
+from prometheus_client import Counter, Gauge, Histogram
 
 files_processed_counter = Counter("files_processed_total", "Number of files that have been processed.")
 
 files_added_to_queue = Counter("files_added_to_queue_total", "Number of files that have been processed.")
+
+query_embeddings_cache_hits = Counter(
+    "query_embeddings_cache_hits_total", "Number of search queries whose embedding was found in the cache."
+)
+
+query_embeddings_cache_misses = Counter(
+    "query_embeddings_cache_misses_total", "Number of search queries which had to be embedded."
+)
+
+uploads_queued = Gauge("uploads_queued", "Number of uploads which were accepted but are not processed yet.")
+
+upload_bytes_queued = Gauge("upload_bytes_queued", "Size of the uploads which were accepted but are not processed yet.")
+
+uploads_rejected = Counter(
+    "uploads_rejected_total", "Number of uploads which were rejected by the admission control.", ["reason"]
+)
+
+work_queued = Gauge("work_queued", "Number of tasks which wait for a worker.", ["priority"])
+
+processing_mode = Counter(
+    "processing_mode_total", "Number of files chunked in a thread or in the worker pool.", ["provider", "mode"]
+)
+
+processing_cpu_seconds = Histogram("processing_cpu_seconds", "Cpu time spent on chunking a file.", ["provider", "mode"])
+
+processing_predicted_cpu_seconds = Histogram(
+    "processing_predicted_cpu_seconds", "Predicted cpu time of chunking a file.", ["provider", "mode"]
+)
+
+processing_cpu_seconds_per_byte = Gauge(
+    "processing_cpu_seconds_per_byte", "Estimated cpu time of chunking a byte.", ["provider"]
+)
+
+worker_pool_overhead_seconds = Gauge("worker_pool_overhead_seconds", "Estimated overhead of a task in the worker pool.")
@@ -1,5 +1,8 @@
+import asyncio
+import os
 import re
-from typing import Annotated, List, Optional
+import tempfile
+from typing import Annotated, Iterator, List, Optional
 from asyncio import wrap_future
 import uuid
 import aiofiles
@@ -8,9 +11,13 @@ from urllib.parse import unquote
 from fastapi import APIRouter, Depends, Request, Header, Response, HTTPException
 from fastapi.params import Query
 
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import AfterValidator
 from rei_s.services import store_service
+from rei_s.services.admission import Admission, get_admission_controller
+from rei_s.services.filestore_adapter import DocumentStream
+from rei_s.services.ingest_queue import IngestQueue
+from rei_s.services.work_scheduler import estimate_cost
 from rei_s.config import Config, get_config
 from rei_s.types.dtos import (
     FileProcessResult,
@@ -18,6 +25,7 @@ from rei_s.types.dtos import (
     FileResult,
     FileType,
     FileTypesResult,
+    IngestJobDto,
 )
 from rei_s.types.source_file import SourceFile
 from rei_s import logger
@@ -64,7 +72,7 @@ async def get_file_types(config: Annotated[Config, Depends(get_config)]) -> File
         },
     },
 )
-def get_files(
+async def get_files(
     config: Annotated[Config, Depends(get_config)],
     query: Annotated[str, Query(description="The query from the internal tool")],
     take: Annotated[int, Query(description="The number of results to return")],
@@ -81,13 +89,13 @@ def get_files(
     Get the files matching the query.
     """
     file_ids = files.split(",") if files is not None else None
-    store_docs = store_service.search(config, query, bucket, take, file_ids, index_name)
+    store_docs = await store_service.asearch(config, query, bucket, take, file_ids, index_name)
 
     docs = [ResultDocument(content=doc.page_content, metadata=getattr(doc, "metadata", {})) for doc in store_docs]
 
     debug = store_service.get_file_sources_markdown(store_docs)
 
-    sources = store_service.get_file_sources(config, store_docs)
+    sources = await store_service.aget_file_sources(config, store_docs)
     return FileResult(files=docs, debug=debug, sources=sources)
 
 
@@ -126,10 +134,16 @@ def get_documents_content(
 def get_document_pdf(
     config: Annotated[Config, Depends(get_config)],
     doc_id: Annotated[str, Query(description="The ID of the document")],
+    byte_range: Annotated[str | None, Header(alias="Range", include_in_schema=False)] = None,
+    if_none_match: Annotated[str | None, Header(alias="If-None-Match", include_in_schema=False)] = None,
 ) -> Response:
     """
     Get the document's pdf by its ID.
     """
+    stream = store_service.stream_document_pdf(config, doc_id, byte_range, if_none_match)
+    if stream is not None:
+        return stream_response(stream)
+
     content = store_service.get_document_pdf(config, doc_id)
 
     if content is None:
@@ -138,14 +152,74 @@ def get_document_pdf(
     return FileResponse(content.path, media_type="application/octet-stream")
 
 
+def stream_response(stream: DocumentStream) -> Response:
+    headers = {"Accept-Ranges": "bytes"}
+    if stream.etag is not None:
+        headers["ETag"] = stream.etag
+
+    if stream.not_modified:
+        stream.close()
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Length"] = str(stream.content_length)
+    if stream.content_range is not None:
+        headers["Content-Range"] = stream.content_range
+
+    def chunks() -> Iterator[bytes]:
+        try:
+            yield from stream.chunks
+        finally:
+            stream.close()
+
+    return StreamingResponse(
+        chunks(),
+        status_code=206 if stream.content_range is not None else 200,
+        headers=headers,
+        media_type="application/octet-stream",
+    )
+
+
+def admit_upload(config: Config, request: Request, directory: str) -> Admission:
+    """Checks the limits for queued uploads, before the body is read."""
+    content_length = request.headers.get("content-length", "")
+    size = int(content_length) if content_length.isdigit() else None
+    return get_admission_controller(config).admit(size, directory)
+
+
+async def receive_upload(request: Request, path: str, admission: Admission) -> None:
+    """Writes the body of the upload to `path`, it must not be larger than the admitted size."""
+    received = 0
+    async with aiofiles.open(path, "wb") as file:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if admission.declared and received > admission.size:
+                raise HTTPException(status_code=413, detail="The body is larger than its Content-Length")
+            await file.write(chunk)
+
+
+def prefers_async(prefer: str | None) -> bool:
+    # e.g. `Prefer: respond-async, wait=10`, see RFC 7240
+    return prefer is not None and any(
+        token.split(";")[0].strip().lower() == "respond-async" for token in prefer.split(",")
+    )
+
+
 @router.post(
     "/files",
     tags=["files"],
     operation_id="uploadFile",
+    response_model=None,
     responses={
+        202: {
+            "description": "Accepted as a job with `Prefer: respond-async`, if a job store is configured",
+            "model": IngestJobDto,
+        },
         400: {
             "description": "Processing failed",
         },
+        411: {
+            "description": "Content-Length is required, if the queued uploads are limited",
+        },
         413: {
             "description": "File too large",
         },
@@ -155,6 +229,12 @@ def get_document_pdf(
         422: {
             "description": "Validation error",
         },
+        429: {
+            "description": "Too many uploads are queued, see `Retry-After`",
+        },
+        503: {
+            "description": "Not enough disk space, see `Retry-After`",
+        },
     },
 )
 async def post_files(
@@ -167,26 +247,37 @@ async def post_files(
     index_name: Annotated[
         str | None, Header(description="The name of the index", alias="indexName"), AfterValidator(check_index_name)
     ] = None,
-) -> None:
+    prefer: Annotated[str | None, Header(description="`respond-async` to process the file as a job")] = None,
+) -> Response | None:
     """
     Processes the file into chunks and stores them in the vector store.
+
+    With `Prefer: respond-async`, the file is processed in the background and the job is returned immediately.
+    Its progress is reported by GET /jobs/{job_id}. Without a configured job store, the preference is ignored.
     """
     if file_name is None:
         raise ValueError("File name is not defined")
     if file_mime_type is None:
         raise ValueError("content_type is not defined")
 
-    dest_path = get_new_file_path(file_id)
-    async with aiofiles.open(dest_path, "wb") as temp_file:
-        async for chunk in request.stream():
-            await temp_file.write(chunk)
+    ingest_queue = getattr(request.app.state, "ingest_queue", None)
+    if prefers_async(prefer) and ingest_queue is not None:
+        admission = admit_upload(config, request, ingest_queue.spool_dir)
+        return await post_files_async(
+            request, ingest_queue, admission, file_name, file_mime_type, bucket, file_id, index_name
+        )
 
+    admission = admit_upload(config, request, tempfile.gettempdir())
+    dest_path = get_new_file_path(file_id)
     q = SourceFile(id=file_id, path=dest_path, file_name=unquote(file_name), mime_type=file_mime_type)
     try:
+        await receive_upload(request, dest_path, admission)
+
         files_added_to_queue.inc()
+        # uploads are shared fairly between the buckets, such that a bulk import does not block the others
         await wrap_future(
-            request.app.state.executor.submit(
-                store_service.process_and_add_file, config, q, bucket, index_name=index_name
+            request.app.state.executor.submit_prioritized(
+                "bulk", bucket, estimate_cost(q.size), store_service.process_and_add_file, config, q, bucket, index_name
             )
         )
     except Exception as e:
@@ -194,6 +285,46 @@ async def post_files(
         raise
     finally:
         q.delete()
+        admission.release()
+
+
+async def post_files_async(
+    request: Request,
+    ingest_queue: IngestQueue,
+    admission: Admission,
+    file_name: str,
+    file_mime_type: str,
+    bucket: str,
+    file_id: str,
+    index_name: str | None,
+) -> Response:
+    job_id = str(uuid.uuid4())
+
+    # the file is written to the spool directory directly, where it is kept until the job is finished
+    dest_path = ingest_queue.spool_path(job_id)
+    try:
+        await receive_upload(request, dest_path, admission)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        admission.release()
+        raise
+
+    files_added_to_queue.inc()
+    # the upload counts as queued until its job is finished
+    try:
+        job = await asyncio.to_thread(
+            ingest_queue.add, job_id, file_id, unquote(file_name), file_mime_type, bucket, index_name, admission.release
+        )
+    except BaseException:
+        admission.release()
+        raise
+
+    return JSONResponse(
+        IngestJobDto.model_validate(job).model_dump(mode="json", by_alias=True),
+        status_code=202,
+        headers={"Location": f"/jobs/{job_id}", "Preference-Applied": "respond-async"},
+    )
 
 
 @router.post(
@@ -204,12 +335,21 @@ async def post_files(
         400: {
             "description": "Processing failed",
         },
+        411: {
+            "description": "Content-Length is required, if the queued uploads are limited",
+        },
         413: {
             "description": "File too large",
         },
         415: {
             "description": "File format not supported",
         },
+        429: {
+            "description": "Too many uploads are queued, see `Retry-After`",
+        },
+        503: {
+            "description": "Not enough disk space, see `Retry-After`",
+        },
     },
 )
 async def post_files_only_processing(
@@ -231,19 +371,24 @@ async def post_files_only_processing(
 
     file_id = str(uuid.uuid4())
 
+    admission = admit_upload(config, request, tempfile.gettempdir())
     dest_path = get_new_file_path(file_id)
-    async with aiofiles.open(dest_path, "wb") as temp_file:
-        async for chunk in request.stream():
-            await temp_file.write(chunk)
-
     q = SourceFile(id=file_id, path=dest_path, file_name=unquote(file_name), mime_type=file_mime_type)
     try:
-        result = await wrap_future(request.app.state.executor.submit(store_service.process_file, config, q, chunk_size))
+        await receive_upload(request, dest_path, admission)
+
+        # a user is waiting for the chunks, so this is started before any upload
+        result = await wrap_future(
+            request.app.state.executor.submit_prioritized(
+                "interactive", "", estimate_cost(q.size), store_service.process_file, config, q, chunk_size
+            )
+        )
     except Exception as e:
         logger.error(f"Error response from task: {e}")
         raise
     finally:
         q.delete()
+        admission.release()
     processed_docs = result
 
     docs = [ResultDocument(content=doc.page_content, metadata=getattr(doc, "metadata", {})) for doc in processed_docs]
@@ -0,0 +1,33 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from rei_s.config import Config, get_config
+from rei_s.services.job_store_provider import get_job_store
+from rei_s.types.dtos import IngestJobDto
+
+
+router = APIRouter()
+
+
+@router.get(
+    "/jobs/{job_id}",
+    tags=["jobs"],
+    operation_id="getJob",
+    responses={
+        404: {
+            "description": "Job Not Found",
+        },
+    },
+)
+def get_job(config: Annotated[Config, Depends(get_config)], job_id: str) -> IngestJobDto:
+    """
+    Get the state and the progress of an ingest job, which was accepted with `Prefer: respond-async`.
+    """
+    job_store = get_job_store(config)
+    job = job_store.get(job_id) if job_store is not None else None
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return IngestJobDto.model_validate(job)
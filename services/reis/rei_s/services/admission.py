@@ -0,0 +1,103 @@
+from functools import lru_cache
+import shutil
+from threading import Lock
+
+from fastapi import HTTPException
+
+from rei_s.config import Config
+from rei_s.metrics.metrics import uploads_queued, upload_bytes_queued, uploads_rejected
+
+
+class Admission:
+    """An accepted upload, which counts against the limits until it is released."""
+
+    def __init__(self, controller: "AdmissionController", size: int, declared: bool = True) -> None:
+        self.controller = controller
+        self.size = size
+        # whether the size is the `Content-Length` of the upload, which the body must not exceed
+        self.declared = declared
+        self.released = False
+
+    def release(self) -> None:
+        self.controller.release(self)
+
+
+class AdmissionController:
+    """Limits the uploads, which were accepted but are not processed yet.
+
+    Uploads are checked with their `Content-Length`, before their body is read. They are rejected with 429 if too many
+    files or bytes are queued, and with 503 if the disk, where they would be written to, is (almost) full. Uploads
+    without a `Content-Length` are rejected with 411, if the bytes or the disk space are limited.
+    """
+
+    def __init__(
+        self,
+        max_files: int | None = None,
+        max_bytes: int | None = None,
+        min_free_disk: int | None = None,
+        retry_after: int = 30,
+    ) -> None:
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.min_free_disk = min_free_disk
+        self.retry_after = retry_after
+        self.files = 0
+        self.bytes = 0
+        self.lock = Lock()
+
+    def reject(self, reason: str, status_code: int, detail: str) -> HTTPException:
+        uploads_rejected.labels(reason).inc()
+        # a retry only helps, if the limit was reached
+        headers = {"Retry-After": str(self.retry_after)} if status_code in (429, 503) else None
+        return HTTPException(status_code=status_code, detail=detail, headers=headers)
+
+    def admit(self, size: int | None, directory: str) -> Admission:
+        """Accepts an upload of `size` bytes (None if unknown), which is written to `directory`.
+
+        Raises an `HTTPException`, if it is rejected.
+        """
+        declared = size is not None
+        if size is None:
+            if self.max_bytes is not None or self.min_free_disk is not None:
+                raise self.reject("length", 411, "Content-Length is required")
+            size = 0
+
+        with self.lock:
+            if self.max_files is not None and self.files >= self.max_files:
+                raise self.reject("files", 429, "Too many files are queued")
+            # a single file larger than the limit is accepted, if nothing else is queued
+            if self.max_bytes is not None and self.files and self.bytes + size > self.max_bytes:
+                raise self.reject("bytes", 429, "Too many bytes are queued")
+            # the uploads, which were accepted before, might not be written to the disk yet
+            if (
+                self.min_free_disk is not None
+                and shutil.disk_usage(directory).free - self.bytes - size < self.min_free_disk
+            ):
+                raise self.reject("disk", 503, "Not enough disk space")
+
+            self.files += 1
+            self.bytes += size
+        uploads_queued.inc()
+        upload_bytes_queued.inc(size)
+        return Admission(self, size, declared)
+
+    def release(self, admission: Admission) -> None:
+        with self.lock:
+            if admission.released:
+                return
+            admission.released = True
+            self.files -= 1
+            self.bytes -= admission.size
+        uploads_queued.dec()
+        upload_bytes_queued.dec(admission.size)
+
+
+# the counters are shared by all requests, so we reuse one instance per configuration
+@lru_cache
+def get_admission_controller(config: Config) -> AdmissionController:
+    return AdmissionController(
+        max_files=config.max_queued_files,
+        max_bytes=config.max_queued_bytes,
+        min_free_disk=config.min_free_disk,
+        retry_after=config.admission_retry_after,
+    )
@@ -0,0 +1,105 @@
+import hashlib
+import unicodedata
+from threading import Lock
+
+from langchain_core.embeddings import Embeddings
+
+from rei_s import logger
+from rei_s.metrics.metrics import query_embeddings_cache_hits, query_embeddings_cache_misses
+from rei_s.services.embeddings_cache_adapter import EmbeddingsCacheAdapter
+from rei_s.services.ttl_cache import TTLCache
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embeddings model and caches the document embeddings by the hash of the text.
+
+    Query embeddings are kept in a separate in-memory cache, keyed by the normalized query text.
+    The namespace identifies the embeddings model, such that switching the model does not return stale vectors.
+    """
+
+    # the eviction needs to scan the cache, so we do it only every n writes
+    evict_every: int = 100
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: EmbeddingsCacheAdapter | None,
+        namespace: str,
+        query_cache: TTLCache[str, list[float]] | None = None,
+    ) -> None:
+        self.embeddings = embeddings
+        self.cache = cache
+        self.namespace = namespace
+        self.query_cache = query_cache
+        self.writes = 0
+        self.lock = Lock()
+
+    @staticmethod
+    def key_for(namespace: str, text: str) -> str:
+        return f"{namespace}:{hashlib.sha256(text.encode()).hexdigest()}"
+
+    @staticmethod
+    def normalize_query(text: str) -> str:
+        # queries which only differ in whitespace or unicode composition get the same embedding
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.cache is None:
+            return self.embeddings.embed_documents(texts)
+
+        keys = [self.key_for(self.namespace, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # identical texts are only embedded once
+        missing = {key: text for key, text, vector in zip(keys, texts, vectors, strict=True) if vector is None}
+        logger.info(f"embeddings cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            # some embeddings return numpy floats, which can not be serialized
+            embedded = {key: [float(x) for x in vector] for key, vector in zip(missing, new_vectors, strict=True)}
+            self.cache.set_many(embedded)
+            self.count_writes()
+            vectors = [embedded[key] if vector is None else vector for key, vector in zip(keys, vectors, strict=True)]
+
+        return [vector for vector in vectors if vector is not None]
+
+    def embed_query(self, text: str) -> list[float]:
+        if self.query_cache is None:
+            return self.embeddings.embed_query(text)
+
+        key = f"{self.namespace}:{self.normalize_query(text)}"
+        vector = self.get_cached_query(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.query_cache.set(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> list[float]:
+        if self.query_cache is None:
+            return await self.embeddings.aembed_query(text)
+
+        key = f"{self.namespace}:{self.normalize_query(text)}"
+        vector = self.get_cached_query(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self.query_cache.set(key, vector)
+        return vector
+
+    def get_cached_query(self, key: str) -> list[float] | None:
+        if self.query_cache is None:
+            return None
+
+        vector = self.query_cache.get(key)
+        if vector is None:
+            query_embeddings_cache_misses.inc()
+        else:
+            query_embeddings_cache_hits.inc()
+        return vector
+
+    def count_writes(self) -> None:
+        with self.lock:
+            self.writes += 1
+            evict = self.writes % self.evict_every == 0
+        if evict and self.cache is not None:
+            self.cache.evict()
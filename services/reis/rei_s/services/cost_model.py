@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from threading import Lock
+import time
+from typing import Callable, Iterator, Literal, TypeVar
+
+from rei_s.config import Config
+from rei_s.metrics.metrics import (
+    processing_cpu_seconds,
+    processing_cpu_seconds_per_byte,
+    processing_mode,
+    processing_predicted_cpu_seconds,
+    worker_pool_overhead_seconds,
+)
+
+T = TypeVar("T")
+
+# where a file is chunked: in the thread of the request or in a worker of the pool
+ExecutionMode = Literal["thread", "process"]
+
+# weight of a new measurement in the moving averages
+SMOOTHING = 0.2
+# a provider is measured this many times, before its estimate replaces the filesize_threshold
+MIN_SAMPLES = 3
+# the overhead of a task in the worker pool in seconds, until it was measured
+INITIAL_OVERHEAD = 0.05
+
+
+@dataclass
+class Estimate:
+    """An exponentially weighted moving average."""
+
+    value: float
+    samples: int = 0
+
+    def update(self, sample: float) -> None:
+        self.value = sample if self.samples == 0 else (1 - SMOOTHING) * self.value + SMOOTHING * sample
+        self.samples += 1
+
+
+class CostModel:
+    """Online estimates of the cpu time per byte of every format provider and of the overhead of the worker pool.
+
+    A file is chunked in the worker pool, if chunking it in a thread is expected to hold the GIL longer than handing
+    it to the pool takes. Until a provider was measured a few times, the filesize_threshold decides.
+    """
+
+    def __init__(self, filesize_threshold: int) -> None:
+        self.filesize_threshold = filesize_threshold
+        self.rates: dict[str, Estimate] = {}
+        self.overhead = Estimate(INITIAL_OVERHEAD)
+        self.lock = Lock()
+
+    def predict(self, provider: str, size: int) -> float | None:
+        """The expected cpu time of chunking a file of `size` bytes, or None if the provider was not measured yet."""
+        with self.lock:
+            rate = self.rates.get(provider)
+            if rate is None or rate.samples < MIN_SAMPLES:
+                return None
+            return rate.value * size
+
+    def prefers_worker_pool(self, provider: str, size: int) -> bool:
+        predicted = self.predict(provider, size)
+        if predicted is None:
+            return size >= self.filesize_threshold
+        with self.lock:
+            return predicted > self.overhead.value
+
+    def record(self, provider: str, mode: ExecutionMode, size: int, cpu_time: float, predicted: float | None) -> None:
+        with self.lock:
+            rate = self.rates.setdefault(provider, Estimate(0.0))
+            if size > 0:
+                rate.update(cpu_time / size)
+            rate_value = rate.value
+
+        processing_mode.labels(provider, mode).inc()
+        processing_cpu_seconds.labels(provider, mode).observe(cpu_time)
+        if predicted is not None:
+            processing_predicted_cpu_seconds.labels(provider, mode).observe(predicted)
+        processing_cpu_seconds_per_byte.labels(provider).set(rate_value)
+
+    def record_overhead(self, overhead: float) -> None:
+        """Measures the overhead of a task in the worker pool, i.e., the time to hand it to a worker and back."""
+        with self.lock:
+            self.overhead.update(overhead)
+            overhead = self.overhead.value
+        worker_pool_overhead_seconds.set(overhead)
+
+
+def measure_thread_time(items: Iterator[T], on_done: Callable[[float], None]) -> Iterator[T]:
+    """Yields the items and reports the cpu time of this thread, which was spent producing them."""
+    cpu_time = 0.0
+    while True:
+        start = time.thread_time()
+        try:
+            item = next(items)
+        except StopIteration:
+            break
+        finally:
+            cpu_time += time.thread_time() - start
+        yield item
+    on_done(cpu_time)
+
+
+# the estimates are shared by all requests, so we reuse one instance per configuration
+@lru_cache
+def get_cost_model(config: Config) -> CostModel:
+    return CostModel(config.filesize_threshold)
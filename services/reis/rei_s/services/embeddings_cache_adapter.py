@@ -0,0 +1,19 @@
+from abc import ABC, abstractmethod
+
+
+class EmbeddingsCacheAdapter(ABC):
+    @abstractmethod
+    def get_many(self, keys: list[str]) -> list[list[float] | None]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_many(self, items: dict[str, list[float]]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def evict(self) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self) -> None:
+        raise NotImplementedError
@@ -0,0 +1,22 @@
+from functools import lru_cache
+
+from rei_s.config import Config
+from rei_s.services.embeddings_cache_adapter import EmbeddingsCacheAdapter
+from rei_s.services.embeddings_caches.postgres import PostgresEmbeddingsCacheAdapter
+from rei_s.services.embeddings_caches.sqlite import SqliteEmbeddingsCacheAdapter
+
+
+# the cache holds connections, so we reuse one instance per configuration
+@lru_cache
+def get_embeddings_cache(
+    config: Config,
+) -> EmbeddingsCacheAdapter | None:
+    if config.embeddings_cache_type is None:
+        # this is an optional feature
+        return None
+    elif config.embeddings_cache_type == "sqlite":
+        return SqliteEmbeddingsCacheAdapter.create(config=config)
+    elif config.embeddings_cache_type == "postgres":
+        return PostgresEmbeddingsCacheAdapter.create(config=config)
+    else:
+        raise ValueError(f"Embeddings cache type {config.embeddings_cache_type} not supported")
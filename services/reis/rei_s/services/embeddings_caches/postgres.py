@@ -0,0 +1,129 @@
+from threading import Lock
+import time
+
+import orjson
+from sqlalchemy import Engine, create_engine, text
+
+from rei_s.config import Config
+from rei_s.services.embeddings_cache_adapter import EmbeddingsCacheAdapter
+
+
+class PostgresEmbeddingsCacheAdapter(EmbeddingsCacheAdapter):
+    engine: Engine
+    max_entries: int
+    ttl: int
+    # the access times are only needed for the eviction, so the hits are collected and written at most once per
+    # interval (in seconds), instead of turning every read into a write
+    touch_interval: float = 60
+    lock: Lock
+    accessed: set[str]
+    touched_at: float
+
+    def get_many(self, keys: list[str]) -> list[list[float] | None]:
+        if not keys:
+            return []
+
+        with self.engine.begin() as connection:
+            rows = connection.execute(
+                text("SELECT key, vector FROM reis_embeddings_cache WHERE key = ANY(:keys) AND created_at > :expired"),
+                {"keys": keys, "expired": time.time() - self.ttl},
+            ).fetchall()
+
+        found = {key: orjson.loads(vector) for key, vector in rows}
+        self.touch(list(found))
+        return [found.get(key) for key in keys]
+
+    def touch(self, keys: list[str]) -> None:
+        with self.lock:
+            self.accessed.update(keys)
+            due = time.monotonic() - self.touched_at >= self.touch_interval
+        if due:
+            self.write_access_times()
+
+    def write_access_times(self) -> None:
+        with self.lock:
+            keys = list(self.accessed)
+            self.accessed = set()
+            self.touched_at = time.monotonic()
+        if not keys:
+            return
+
+        now = time.time()
+        with self.engine.begin() as connection:
+            # rows, which were touched within the interval already, are not written again
+            connection.execute(
+                text(
+                    "UPDATE reis_embeddings_cache SET accessed_at = :now "
+                    "WHERE key = ANY(:keys) AND accessed_at < :touched"
+                ),
+                {"now": now, "keys": keys, "touched": now - self.touch_interval},
+            )
+
+    def set_many(self, items: dict[str, list[float]]) -> None:
+        if not items:
+            return
+
+        now = time.time()
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "INSERT INTO reis_embeddings_cache (key, vector, created_at, accessed_at) "
+                    "VALUES (:key, :vector, :now, :now) "
+                    "ON CONFLICT (key) DO UPDATE SET vector = EXCLUDED.vector, "
+                    "created_at = EXCLUDED.created_at, accessed_at = EXCLUDED.accessed_at"
+                ),
+                [{"key": key, "vector": orjson.dumps(vector), "now": now} for key, vector in items.items()],
+            )
+
+    def evict(self) -> None:
+        self.write_access_times()
+        with self.engine.begin() as connection:
+            connection.execute(
+                text("DELETE FROM reis_embeddings_cache WHERE created_at <= :expired"),
+                {"expired": time.time() - self.ttl},
+            )
+            connection.execute(
+                text(
+                    "DELETE FROM reis_embeddings_cache WHERE key IN "
+                    "(SELECT key FROM reis_embeddings_cache ORDER BY accessed_at DESC OFFSET :max_entries)"
+                ),
+                {"max_entries": self.max_entries},
+            )
+
+    def close(self) -> None:
+        # the collected hits would be lost otherwise
+        self.write_access_times()
+        self.engine.dispose()
+
+    @classmethod
+    def create(cls, config: Config) -> "PostgresEmbeddingsCacheAdapter":
+        url = config.embeddings_cache_postgres_url or config.store_pgvector_url
+        if url is None:
+            raise ValueError("The env variable `EMBEDDINGS_CACHE_POSTGRES_URL` is missing.")
+
+        engine = create_engine(url.get_secret_value(), pool_size=5, max_overflow=10, pool_recycle=3600)
+        with engine.begin() as connection:
+            connection.execute(
+                text(
+                    "CREATE TABLE IF NOT EXISTS reis_embeddings_cache "
+                    "(key TEXT PRIMARY KEY, vector BYTEA NOT NULL, "
+                    "created_at DOUBLE PRECISION NOT NULL, accessed_at DOUBLE PRECISION NOT NULL)"
+                )
+            )
+            connection.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS reis_embeddings_cache_accessed_at "
+                    "ON reis_embeddings_cache (accessed_at)"
+                )
+            )
+
+        instance = cls()
+
+        instance.engine = engine
+        instance.max_entries = config.embeddings_cache_max_entries
+        instance.ttl = config.embeddings_cache_ttl
+        instance.lock = Lock()
+        instance.accessed = set()
+        instance.touched_at = time.monotonic()
+
+        return instance
@@ -0,0 +1,91 @@
+from itertools import batched
+import os
+import sqlite3
+from threading import Lock
+import time
+
+import orjson
+
+from rei_s.config import Config
+from rei_s.services.embeddings_cache_adapter import EmbeddingsCacheAdapter
+
+# sqlite limits the number of variables of a statement (999 before version 3.32)
+MAX_VARIABLES = 500
+
+
+class SqliteEmbeddingsCacheAdapter(EmbeddingsCacheAdapter):
+    connection: sqlite3.Connection
+    lock: Lock
+    max_entries: int
+    ttl: int
+
+    def get_many(self, keys: list[str]) -> list[list[float] | None]:
+        if not keys:
+            return []
+
+        now = time.time()
+        rows = []
+        with self.lock:
+            for chunk in batched(keys, MAX_VARIABLES - 1):
+                placeholders = ", ".join("?" for _ in chunk)
+                rows += self.connection.execute(
+                    f"SELECT key, vector FROM embeddings_cache WHERE key IN ({placeholders}) AND created_at > ?",
+                    [*chunk, now - self.ttl],
+                ).fetchall()
+                # this is used for the least recently used eviction
+                self.connection.execute(
+                    f"UPDATE embeddings_cache SET accessed_at = ? WHERE key IN ({placeholders})", [now, *chunk]
+                )
+            self.connection.commit()
+
+        found = {key: orjson.loads(vector) for key, vector in rows}
+        return [found.get(key) for key in keys]
+
+    def set_many(self, items: dict[str, list[float]]) -> None:
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings_cache (key, vector, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                [(key, orjson.dumps(vector), now, now) for key, vector in items.items()],
+            )
+            self.connection.commit()
+
+    def evict(self) -> None:
+        with self.lock:
+            self.connection.execute("DELETE FROM embeddings_cache WHERE created_at <= ?", [time.time() - self.ttl])
+            self.connection.execute(
+                "DELETE FROM embeddings_cache WHERE key IN "
+                "(SELECT key FROM embeddings_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                [self.max_entries],
+            )
+            self.connection.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+    @classmethod
+    def create(cls, config: Config) -> "SqliteEmbeddingsCacheAdapter":
+        if config.embeddings_cache_sqlite_path is None:
+            raise ValueError("The env variable `EMBEDDINGS_CACHE_SQLITE_PATH` is missing.")
+
+        os.makedirs(os.path.dirname(os.path.abspath(config.embeddings_cache_sqlite_path)), exist_ok=True)
+
+        # the connection is shared between the worker threads, access is serialized by the lock
+        connection = sqlite3.connect(config.embeddings_cache_sqlite_path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings_cache "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS embeddings_cache_accessed_at ON embeddings_cache (accessed_at)")
+        connection.commit()
+
+        instance = cls()
+
+        instance.connection = connection
+        instance.lock = Lock()
+        instance.max_entries = config.embeddings_cache_max_entries
+        instance.ttl = config.embeddings_cache_ttl
+
+        return instance
@@ -1,3 +1,8 @@
+from threading import Lock
+from typing import Any
+
+import httpx
+import openai
 from langchain_openai import OpenAIEmbeddings, AzureOpenAIEmbeddings
 from langchain_community.embeddings import FakeEmbeddings
 from langchain_ollama import OllamaEmbeddings
@@ -5,9 +10,96 @@ from langchain_core.embeddings import Embeddings
 from langchain_aws.embeddings.bedrock import BedrockEmbeddings
 from langchain_nvidia_ai_endpoints import NVIDIAEmbeddings
 from rei_s.config import Config
+from rei_s.services.cached_embeddings import CachedEmbeddings
+from rei_s.services.embeddings_cache_provider import get_embeddings_cache
+from rei_s.services.ttl_cache import TTLCache
+
+
+lock = Lock()
+
+# Embeddings clients are reused for every request with the same configuration.
+# This way the connection pool (and for OpenAI the tokenizer) survive between requests.
+_embeddings_clients: dict[Config, Embeddings] = {}
+_http_clients: list[httpx.Client] = []
+_async_http_clients: list[httpx.AsyncClient] = []
 
 
 def get_embeddings(config: Config) -> Embeddings:
+    with lock:
+        embeddings = _embeddings_clients.get(config)
+    if embeddings is not None:
+        return embeddings
+
+    # the clients and the cache may connect to remote services, so they are created outside of the lock
+    embeddings = create_embeddings(config)
+    cache = get_embeddings_cache(config)
+    query_cache = get_query_embeddings_cache(config)
+    if cache is not None or query_cache is not None:
+        embeddings = CachedEmbeddings(
+            embeddings, cache, namespace=get_embeddings_model_identity(config), query_cache=query_cache
+        )
+
+    with lock:
+        # another request might have created the client in the meantime, its http clients are closed on shutdown
+        return _embeddings_clients.setdefault(config, embeddings)
+
+
+def get_query_embeddings_cache(config: Config) -> TTLCache[str, list[float]] | None:
+    if config.query_embeddings_cache_size == 0:
+        return None
+
+    return TTLCache(maxsize=config.query_embeddings_cache_size, ttl=config.query_embeddings_cache_ttl)
+
+
+async def close_embeddings() -> None:
+    with lock:
+        http_clients = list(_http_clients)
+        async_http_clients = list(_async_http_clients)
+        caches = {
+            id(embeddings.cache): embeddings.cache
+            for embeddings in _embeddings_clients.values()
+            if isinstance(embeddings, CachedEmbeddings) and embeddings.cache is not None
+        }
+        _http_clients.clear()
+        _async_http_clients.clear()
+        _embeddings_clients.clear()
+        get_embeddings_cache.cache_clear()
+
+    for client in http_clients:
+        client.close()
+    for async_client in async_http_clients:
+        await async_client.aclose()
+    for cache in caches.values():
+        cache.close()
+
+
+def create_http_clients() -> dict[str, Any]:
+    """Creates keep-alive http clients for the OpenAI based embeddings."""
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60)
+
+    http_client = openai.DefaultHttpxClient(limits=limits)
+    http_async_client = openai.DefaultAsyncHttpxClient(limits=limits)
+    _http_clients.append(http_client)
+    _async_http_clients.append(http_async_client)
+
+    return {"http_client": http_client, "http_async_client": http_async_client}
+
+
+def get_embeddings_model_identity(config: Config) -> str:
+    """Identifies the embeddings model, i.e., texts embedded by models with the same identity get the same vector."""
+    model_names = {
+        "openai": config.embeddings_openai_model_name,
+        "openai-compatible": config.embeddings_openai_compatible_model_name,
+        "ollama": config.embeddings_ollama_model_name,
+        "azure-openai": f"{config.embeddings_azure_openai_model_name}/{config.embeddings_azure_openai_deployment_name}",
+        "bedrock": config.embeddings_bedrock_model_id,
+        "nvidia": config.embeddings_nvidia_model,
+        "random-test-embeddings": None,
+    }
+    return f"{config.embeddings_type}/{model_names.get(config.embeddings_type)}"
+
+
+def create_embeddings(config: Config) -> Embeddings:
     # for low tier subscriptions, we will encounter rate limits when uploading larger files
     # since we may have multiple workers using the same embedding endpoint, we will encounter
     # multiple triggers of the rate limit error. However, we do not want to fail after
@@ -25,6 +117,7 @@ def get_embeddings(config: Config) -> Embeddings:
             model=config.embeddings_openai_model_name,
             max_retries=max_retries,
             openai_api_base=config.embeddings_openai_endpoint,
+            **create_http_clients(),
         )
     if config.embeddings_type.lower() == "openai-compatible":
         # The only difference is that we send the plain text instead of a tokenized version.
@@ -40,6 +133,7 @@ def get_embeddings(config: Config) -> Embeddings:
             max_retries=max_retries,
             openai_api_base=config.embeddings_openai_compatible_endpoint,
             check_embedding_ctx_length=False,
+            **create_http_clients(),
         )
     elif config.embeddings_type.lower() == "ollama":
         # this is ensured by the config validation, the following lines are there to help the ty typechecker
@@ -64,6 +158,7 @@ def get_embeddings(config: Config) -> Embeddings:
             azure_endpoint=config.embeddings_azure_openai_endpoint,
             openai_api_version=config.embeddings_azure_openai_api_version,
             max_retries=max_retries,
+            **create_http_clients(),
         )
     elif config.embeddings_type.lower() == "bedrock":
         if config.embeddings_bedrock_region_name is None:
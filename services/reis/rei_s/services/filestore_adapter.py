@@ -1,8 +1,26 @@
+import asyncio
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
 
 from rei_s.types.source_file import SourceFile
 
 
+@dataclass
+class DocumentStream:
+    """The content of a stored document, which is read in chunks instead of being copied to a local file."""
+
+    chunks: Iterator[bytes] = field(default_factory=lambda: iter(()))
+    # length of the returned content, i.e., of the range if only a range was requested
+    content_length: int = 0
+    etag: str | None = None
+    # e.g. `bytes 0-99/1234`, if only a range of the document is returned
+    content_range: str | None = None
+    # the document still matches the etag of `If-None-Match`, so no content is returned
+    not_modified: bool = False
+    close: Callable[[], None] = lambda: None
+
+
 class FileStoreAdapter(ABC):
     @abstractmethod
     def add_document(self, document: SourceFile) -> None:
@@ -19,3 +37,19 @@ class FileStoreAdapter(ABC):
     @abstractmethod
     def exists(self, doc_id: str) -> bool:
         raise NotImplementedError
+
+    def stream_document(
+        self, doc_id: str, byte_range: str | None = None, if_none_match: str | None = None
+    ) -> DocumentStream | None:
+        """Streams the document directly from the store. Returns None, if the store can not stream documents.
+
+        `byte_range` and `if_none_match` are the values of the HTTP headers `Range` and `If-None-Match`.
+        """
+        return None
+
+    def exists_many(self, doc_ids: list[str]) -> dict[str, bool]:
+        return {doc_id: self.exists(doc_id) for doc_id in doc_ids}
+
+    async def aexists_many(self, doc_ids: list[str]) -> dict[str, bool]:
+        # file stores without an async client run the blocking check in a thread
+        return await asyncio.to_thread(self.exists_many, doc_ids)
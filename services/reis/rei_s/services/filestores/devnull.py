@@ -16,6 +16,12 @@ class DevNullFileStoreAdapter(FileStoreAdapter):
     def exists(self, doc_id: str) -> bool:
         return False
 
+    def exists_many(self, doc_ids: list[str]) -> dict[str, bool]:
+        return {doc_id: False for doc_id in doc_ids}
+
+    async def aexists_many(self, doc_ids: list[str]) -> dict[str, bool]:
+        return self.exists_many(doc_ids)
+
     @classmethod
     def create(cls, config: Config) -> "DevNullFileStoreAdapter":
         return cls()
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+import shutil
 from rei_s.config import Config
 from rei_s.services.filestore_adapter import FileStoreAdapter
 from rei_s.types.source_file import SourceFile
@@ -19,8 +20,8 @@ class FSFileStoreAdapter(FileStoreAdapter):
 
     def add_document(self, document: SourceFile) -> None:
         path = normalized_path(self.path, document.id)
-        with open(path, "wb") as f:
-            f.write(document.buffer)
+        # copies in the kernel where possible, instead of reading the file into memory
+        shutil.copyfile(document.path, path)
 
     def delete(self, doc_id: str) -> None:
         path = normalized_path(self.path, doc_id)
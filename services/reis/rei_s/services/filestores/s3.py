@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from threading import Lock
 
 import boto3
@@ -6,16 +8,26 @@ from fastapi import HTTPException
 from mypy_boto3_s3 import S3Client
 
 from rei_s.config import Config
-from rei_s.services.filestore_adapter import FileStoreAdapter
+from rei_s.services.filestore_adapter import DocumentStream, FileStoreAdapter
 from rei_s.types.source_file import SourceFile
 
 
 lock = Lock()
 
 
+# the adapter is created per request, so the threads for the HEAD requests are shared by all instances
+@lru_cache
+def get_executor(max_workers: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-exists")
+
+
 class S3FileStoreAdapter(FileStoreAdapter):
     client: S3Client
     bucket_name: str
+    # runs the concurrent HEAD requests of `exists_many`
+    executor: ThreadPoolExecutor
+    # size of the chunks, when streaming a document
+    chunk_size: int = 64 * 1024
 
     def add_document(self, document: SourceFile) -> None:
         with open(document.path, "rb") as f:
@@ -28,13 +40,54 @@ class S3FileStoreAdapter(FileStoreAdapter):
         self.client.delete_object(Bucket=self.bucket_name, Key=doc_id)
 
     def get_document(self, doc_id: str) -> SourceFile:
+        file = SourceFile.new_temporary_file()
+        try:
+            # downloads in chunks, instead of reading the whole object into memory
+            self.client.download_file(self.bucket_name, doc_id, str(file.path))
+        except ClientError as e:
+            file.delete()
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                raise HTTPException(status_code=404, detail="File not found") from e
+            raise
+        return file
+
+    def stream_document(
+        self, doc_id: str, byte_range: str | None = None, if_none_match: str | None = None
+    ) -> DocumentStream | None:
+        # S3 evaluates the range and the etag itself, so we can pass the headers through
+        conditions: dict[str, str] = {}
+        if byte_range is not None:
+            conditions["Range"] = byte_range
+        if if_none_match is not None:
+            conditions["IfNoneMatch"] = if_none_match
+
         try:
-            response = self.client.get_object(Bucket=self.bucket_name, Key=doc_id)
+            response = self.client.get_object(Bucket=self.bucket_name, Key=doc_id, **conditions)
         except ClientError as e:
-            if e.response["Error"]["Code"] == "NoSuchKey":
+            code = e.response["Error"]["Code"]
+            if code == "NoSuchKey":
                 raise HTTPException(status_code=404, detail="File not found") from e
+            if code in ("304", "NotModified"):
+                return DocumentStream(etag=self.get_etag(doc_id, e), not_modified=True)
+            if code == "InvalidRange":
+                raise HTTPException(status_code=416, detail="Range not satisfiable") from e
             raise
-        return SourceFile.new_temporary_file(response["Body"].read())
+
+        body = response["Body"]
+        return DocumentStream(
+            chunks=body.iter_chunks(self.chunk_size),
+            content_length=response["ContentLength"],
+            etag=response.get("ETag"),
+            content_range=response.get("ContentRange"),
+            close=body.close,
+        )
+
+    def get_etag(self, doc_id: str, error: ClientError) -> str | None:
+        # If-None-Match may be a list, a weak tag or "*", so the etag of the object is taken from the response
+        etag = error.response.get("ResponseMetadata", {}).get("HTTPHeaders", {}).get("etag")
+        if etag is None:
+            etag = self.client.head_object(Bucket=self.bucket_name, Key=doc_id).get("ETag")
+        return etag
 
     def exists(self, doc_id: str) -> bool:
         try:
@@ -46,6 +99,13 @@ class S3FileStoreAdapter(FileStoreAdapter):
         else:
             return True
 
+    def exists_many(self, doc_ids: list[str]) -> dict[str, bool]:
+        if len(doc_ids) <= 1:
+            return super().exists_many(doc_ids)
+
+        # S3 has no batch HEAD, but the boto3 client is thread safe, so the requests are sent concurrently
+        return dict(zip(doc_ids, self.executor.map(self.exists, doc_ids), strict=True))
+
     @classmethod
     def create(cls, config: Config) -> "S3FileStoreAdapter":
         if config.file_store_s3_secret_access_key is None:
@@ -72,5 +132,6 @@ class S3FileStoreAdapter(FileStoreAdapter):
 
         instance.client = s3_client
         instance.bucket_name = config.file_store_s3_bucket_name
+        instance.executor = get_executor(config.file_store_s3_max_concurrency)
 
         return instance
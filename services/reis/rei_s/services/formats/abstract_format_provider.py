@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Iterator
 
 from langchain_core.documents import Document
 
@@ -17,6 +18,10 @@ class AbstractFormatProvider(ABC):
     def process_file(self, file: SourceFile, chunk_size: int | None = None) -> list[Document]:
         raise NotImplementedError
 
+    def iter_chunks(self, file: SourceFile, chunk_size: int | None = None) -> Iterator[Document]:
+        """Yields the chunks of the file, see `streams_chunks`."""
+        yield from self.process_file(file, chunk_size)
+
     @abstractmethod
     def convert_file_to_pdf(self, file: SourceFile) -> SourceFile:
         raise NotImplementedError
@@ -42,3 +47,15 @@ class AbstractFormatProvider(ABC):
     def may_start_separate_process_for_converting(self) -> bool:
         """Whether this provider benefits from converting to a pdf preview in a separate process."""
         return True
+
+    @property
+    def streams_chunks(self) -> bool:
+        """Whether `iter_chunks` yields chunks while the file is parsed, instead of parsing the whole file first."""
+        return False
+
+    def distributes_to_worker_pool(self, file: SourceFile) -> bool:
+        """Whether the provider distributes the processing of this file to the worker pool itself.
+
+        In this case, the provider is called in the current process, instead of running it in a worker.
+        """
+        return False
@@ -63,7 +63,7 @@ class MarkdownProvider(AbstractFormatProvider):
     def process_file(
         self, file: SourceFile, chunk_size: int | None = None, chunk_overlap: int | None = None
     ) -> list[Document]:
-        text = file.buffer.decode()
+        text = file.text()
 
         # Parse frontmatter and extract metadata
         frontmatter_metadata, content = parse_frontmatter(text)
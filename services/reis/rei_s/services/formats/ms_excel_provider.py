@@ -1,6 +1,10 @@
-from typing import Any
+from typing import Any, Iterable, Iterator
+
+from langchain_core.documents import Document
 
 from rei_s.services.formats.office_provider import OfficeProvider
+from rei_s.services.formats.ooxml import XLSX_MAIN_PART, iter_xlsx_sheets
+from rei_s.types.source_file import SourceFile
 
 
 class MsExcelProvider(OfficeProvider):
@@ -8,5 +12,44 @@ class MsExcelProvider(OfficeProvider):
 
     file_name_extensions = [".xlsx"]
 
+    native_part = XLSX_MAIN_PART
+
     def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, **_kwargs: Any) -> None:
         super().__init__(chunk_size, chunk_overlap, **_kwargs)
+
+    def iter_native_sections(self, file: SourceFile, chunk_size: int) -> Iterator[Document]:
+        for sheet, rows in iter_xlsx_sheets(str(file.path)):
+            yield from self.sheet_sections(sheet, rows, chunk_size)
+
+    @staticmethod
+    def sheet_sections(sheet: str, rows: Iterable[tuple[int, list[str]]], chunk_size: int) -> Iterator[Document]:
+        """Groups whole rows up to the chunk size. Every section starts with the header, i.e., the first row."""
+        header: str | None = None
+        lines: list[str] = []
+        first_row = last_row = 0
+        length = 0
+        for row, values in rows:
+            line = "\t".join(values)
+            if header is None:
+                header, first_row = line, row
+                continue
+
+            # the header is repeated in every section, such that the values of a chunk can be understood on their own
+            if lines and len(header) + length + len(line) + 1 > chunk_size:
+                yield MsExcelProvider.section(sheet, header, lines, first_row, last_row)
+                lines, length = [], 0
+            if not lines:
+                first_row = row
+            lines.append(line)
+            length += len(line) + 1
+            last_row = row
+
+        if lines or header is not None:
+            yield MsExcelProvider.section(sheet, header or "", lines, first_row, last_row or first_row)
+
+    @staticmethod
+    def section(sheet: str, header: str, lines: list[str], first_row: int, last_row: int) -> Document:
+        return Document(
+            page_content="\n".join([header, *lines]),
+            metadata={"sheet": sheet, "first_row": first_row, "last_row": last_row},
+        )
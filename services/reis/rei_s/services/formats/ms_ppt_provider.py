@@ -1,5 +1,10 @@
-from typing import Any
+from typing import Any, Iterator
+
+from langchain_core.documents import Document
+
 from rei_s.services.formats.office_provider import OfficeProvider
+from rei_s.services.formats.ooxml import PPTX_MAIN_PART, iter_pptx_slides
+from rei_s.types.source_file import SourceFile
 
 
 class MsPptProvider(OfficeProvider):
@@ -7,5 +12,13 @@ class MsPptProvider(OfficeProvider):
 
     file_name_extensions = [".pptx"]
 
+    native_part = PPTX_MAIN_PART
+
     def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, **_kwargs: Any) -> None:
         super().__init__(chunk_size, chunk_overlap, **_kwargs)
+
+    def iter_native_sections(self, file: SourceFile, chunk_size: int) -> Iterator[Document]:
+        for slide, text in enumerate(iter_pptx_slides(str(file.path)), start=1):
+            if text:
+                # the pdf preview has a page for every slide
+                yield Document(page_content=text, metadata={"slide": slide, "page": slide})
@@ -1,6 +1,10 @@
-from typing import Any
+from typing import Any, Iterator
+
+from langchain_core.documents import Document
 
 from rei_s.services.formats.office_provider import OfficeProvider
+from rei_s.services.formats.ooxml import DOCX_MAIN_PART, group_paragraphs, iter_docx_paragraphs
+from rei_s.types.source_file import SourceFile
 
 
 class MsWordProvider(OfficeProvider):
@@ -8,5 +12,11 @@ class MsWordProvider(OfficeProvider):
 
     file_name_extensions = [".docx"]
 
+    native_part = DOCX_MAIN_PART
+
     def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, **_kwargs: Any) -> None:
         super().__init__(chunk_size, chunk_overlap, **_kwargs)
+
+    def iter_native_sections(self, file: SourceFile, chunk_size: int) -> Iterator[Document]:
+        for paragraph, text in group_paragraphs(iter_docx_paragraphs(str(file.path)), chunk_size):
+            yield Document(page_content=text, metadata={"paragraph": paragraph})
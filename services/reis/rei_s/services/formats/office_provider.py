@@ -1,11 +1,15 @@
-from typing import Any
+from typing import Any, Iterator
 
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from rei_s import logger
+from rei_s.config import Config
 from rei_s.services.formats.abstract_format_provider import AbstractFormatProvider
+from rei_s.services.formats.ooxml import has_part
 from rei_s.services.formats.pdf_provider import PdfProvider
 from rei_s.services.formats.utils import convert_office_to_pdf, validate_chunk_overlap, validate_chunk_size
+from rei_s.services.libre_office_pool import get_libre_office_pool
 from rei_s.types.source_file import SourceFile
 
 
@@ -14,10 +18,17 @@ class OfficeProvider(AbstractFormatProvider):
 
     file_name_extensions = []
 
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, **_kwargs: Any) -> None:
+    # the part of the archive, which is read by `iter_native_sections`
+    # without it, the text is extracted from the pdf, which LibreOffice renders
+    native_part: str | None = None
+
+    def __init__(
+        self, chunk_size: int = 1000, chunk_overlap: int = 200, config: Config | None = None, **_kwargs: Any
+    ) -> None:
         super().__init__()
         self.default_chunk_size = chunk_size
         self.default_chunk_overlap = chunk_overlap
+        self.config = config
 
     def splitter(
         self, chunk_size: int | None = None, chunk_overlap: int | None = None
@@ -29,13 +40,60 @@ class OfficeProvider(AbstractFormatProvider):
     def process_file(
         self, file: SourceFile, chunk_size: int | None = None, chunk_overlap: int | None = None
     ) -> list[Document]:
+        return list(self.iter_chunks(file, chunk_size, chunk_overlap))
+
+    def iter_chunks(
+        self, file: SourceFile, chunk_size: int | None = None, chunk_overlap: int | None = None
+    ) -> Iterator[Document]:
+        chunk_size = validate_chunk_size(chunk_size, self.default_chunk_size)
+        sections = self.native_sections(file, chunk_size)
+        if sections is None:
+            yield from self.iter_pdf_chunks(file, chunk_size, chunk_overlap)
+            return
+
+        splitter = self.splitter(chunk_size, chunk_overlap)
+        for section in sections:
+            yield from splitter.split_documents([section])
+
+    def native_sections(self, file: SourceFile, chunk_size: int) -> Iterator[Document] | None:
+        """The text of the file in sections with their metadata, read directly from the file.
+
+        Returns None, if the file has to be converted to pdf to get its text.
+        """
+        if self.native_part is None:
+            return None
+        if not has_part(str(file.path), self.native_part):
+            logger.info(f"Can not read {file.id} as {self.name} file, converting it to pdf instead")
+            return None
+        return self.iter_native_sections(file, chunk_size)
+
+    def iter_native_sections(self, file: SourceFile, chunk_size: int) -> Iterator[Document]:
+        """The sections read from the `native_part`, overridden by the providers which have one."""
+        return iter(())
+
+    def iter_pdf_chunks(self, file: SourceFile, chunk_size: int, chunk_overlap: int | None) -> Iterator[Document]:
         pdf = self.convert_file_to_pdf(file)
-        return PdfProvider().process_file(pdf, chunk_size, chunk_overlap)
+        try:
+            yield from PdfProvider(config=self.config).iter_chunks(pdf, chunk_size, chunk_overlap)
+        finally:
+            # the pdf of an ingest is kept for the preview
+            pdf.delete()
+
+    @property
+    def streams_chunks(self) -> bool:
+        return True
 
     @property
     def may_start_separate_process_for_chunking(self) -> bool:
-        # office files are converted to pdf and then processed with the pdf provider
-        return PdfProvider().may_start_separate_process_for_chunking
+        # office files are parsed directly or converted to pdf and then processed with the pdf provider
+        return PdfProvider(config=self.config).may_start_separate_process_for_chunking
+
+    def distributes_to_worker_pool(self, file: SourceFile) -> bool:
+        # the LibreOffice daemons belong to the main process, so a file which has to be converted is not sent to a
+        # worker. The pdf provider distributes the pages of a large pdf to the worker pool instead.
+        if self.config is None or get_libre_office_pool(self.config) is None:
+            return False
+        return self.native_part is None or not has_part(str(file.path), self.native_part)
 
     @property
     def may_start_separate_process_for_converting(self) -> bool:
@@ -44,4 +102,4 @@ class OfficeProvider(AbstractFormatProvider):
         return False
 
     def convert_file_to_pdf(self, file: SourceFile) -> SourceFile:
-        return convert_office_to_pdf(file)
+        return convert_office_to_pdf(file, self.config)
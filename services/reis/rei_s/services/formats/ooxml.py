@@ -0,0 +1,303 @@
+"""Streaming text extraction from Office Open XML files (docx, pptx, xlsx).
+
+The files are zip archives of XML parts, which are parsed incrementally, such that only the current paragraph, slide
+or row is held in memory (besides the shared strings of a workbook).
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+import posixpath
+import re
+from typing import IO, Iterable, Iterator
+from xml.etree.ElementTree import Element, iterparse, parse
+import zipfile
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+S = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PR = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+# alternative content is stored twice (e.g. text boxes), we only read the preferred choice
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+DOCX_MAIN_PART = "word/document.xml"
+PPTX_MAIN_PART = "ppt/presentation.xml"
+XLSX_MAIN_PART = "xl/workbook.xml"
+
+
+def has_part(path: str, part: str) -> bool:
+    """Whether the file is an OOXML archive with the given part, i.e., whether it can be read natively."""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            return part in archive.namelist()
+    except (zipfile.BadZipFile, OSError):
+        return False
+
+
+def iter_paragraphs(stream: IO[bytes], paragraph: str, text: str, breaks: dict[str, str]) -> Iterator[Element | str]:
+    """Yields the text of every paragraph, and the elements closing, while no paragraph is open.
+
+    Paragraphs nested in a paragraph (e.g. in a text box) are yielded after the text of the paragraph containing them.
+    """
+    # the parents of the current element, such that finished elements can be dropped from the tree
+    parents: list[Element] = []
+    # the text of every open paragraph and the texts of the paragraphs nested in it
+    open_paragraphs: list[tuple[list[str], list[str]]] = []
+    fallback_depth = 0
+    for event, elem in iterparse(stream, events=("start", "end")):
+        if event == "start":
+            parents.append(elem)
+            if elem.tag == MC_FALLBACK:
+                fallback_depth += 1
+            elif elem.tag == paragraph and not fallback_depth:
+                open_paragraphs.append(([], []))
+            continue
+
+        parents.pop()
+        if elem.tag == MC_FALLBACK:
+            fallback_depth -= 1
+        elif fallback_depth:
+            pass
+        elif elem.tag == paragraph:
+            texts, nested = open_paragraphs.pop()
+            if open_paragraphs:
+                open_paragraphs[-1][1].extend(["".join(texts), *nested])
+            else:
+                yield "".join(texts)
+                yield from nested
+        elif open_paragraphs and elem.tag == text:
+            open_paragraphs[-1][0].append(elem.text or "")
+        elif open_paragraphs and elem.tag in breaks:
+            open_paragraphs[-1][0].append(breaks[elem.tag])
+
+        if not open_paragraphs:
+            if not fallback_depth:
+                yield elem
+            if parents:
+                parents[-1].remove(elem)
+
+
+def iter_docx_paragraphs(path: str) -> Iterator[str]:
+    with zipfile.ZipFile(path) as archive, archive.open(DOCX_MAIN_PART) as stream:
+        breaks = {f"{W}tab": "\t", f"{W}br": "\n", f"{W}cr": "\n"}
+        for item in iter_paragraphs(stream, f"{W}p", f"{W}t", breaks):
+            if isinstance(item, str):
+                yield item
+
+
+def group_paragraphs(paragraphs: Iterable[str], size: int, separator: str = "\n\n") -> Iterator[tuple[int, str]]:
+    """Joins consecutive paragraphs up to `size` characters. Yields the (1-based) index of the first one with the text.
+
+    Longer paragraphs are passed on as they are, the splitter takes care of them.
+    """
+    group: list[str] = []
+    length = 0
+    first = 1
+    for index, text in enumerate(paragraphs, start=1):
+        if not text.strip():
+            continue
+        if group and length + len(text) > size:
+            yield first, separator.join(group)
+            group, length = [], 0
+        if not group:
+            first = index
+        group.append(text)
+        length += len(text) + len(separator)
+    if group:
+        yield first, separator.join(group)
+
+
+def read_relationships(archive: zipfile.ZipFile, part: str) -> dict[str, str]:
+    """The targets of the relationships of a part by their id, as paths within the archive."""
+    directory, name = posixpath.split(part)
+    rels = posixpath.join(directory, "_rels", name + ".rels")
+    if rels not in archive.namelist():
+        return {}
+    with archive.open(rels) as stream:
+        root = parse(stream).getroot()
+
+    targets = {}
+    for rel in root.iter(f"{PR}Relationship"):
+        target = rel.get("Target", "")
+        if rel.get("TargetMode") == "External":
+            continue
+        # targets are relative to the directory of the part, unless they are absolute
+        path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(directory, target))
+        targets[rel.get("Id", "")] = path
+    return targets
+
+
+def iter_pptx_slides(path: str) -> Iterator[str]:
+    """Yields the text of every slide. Paragraphs are separated by a line break, shapes by an empty line."""
+    with zipfile.ZipFile(path) as archive:
+        with archive.open(PPTX_MAIN_PART) as stream:
+            presentation = parse(stream).getroot()
+        targets = read_relationships(archive, PPTX_MAIN_PART)
+        slides = [targets[s.get(f"{R}id", "")] for s in presentation.iter(f"{P}sldId") if s.get(f"{R}id") in targets]
+
+        for slide in slides:
+            with archive.open(slide) as stream:
+                shapes: list[str] = []
+                paragraphs: list[str] = []
+                for item in iter_paragraphs(stream, f"{A}p", f"{A}t", {f"{A}br": "\n"}):
+                    if isinstance(item, str):
+                        paragraphs.append(item)
+                    elif item.tag in {f"{P}sp", f"{P}graphicFrame"} and paragraphs:
+                        shapes.append("\n".join(paragraphs).strip())
+                        paragraphs = []
+                if paragraphs:
+                    shapes.append("\n".join(paragraphs).strip())
+                yield "\n\n".join(s for s in shapes if s)
+
+
+def read_shared_strings(archive: zipfile.ZipFile, part: str) -> list[str]:
+    if part not in archive.namelist():
+        return []
+    strings = []
+    with archive.open(part) as stream:
+        for _, elem in iterparse(stream):
+            if elem.tag == f"{S}si":
+                # phonetic hints (rPh) are not part of the displayed text
+                phonetic = {id(t) for rph in elem.iter(f"{S}rPh") for t in rph.iter(f"{S}t")}
+                strings.append("".join(t.text or "" for t in elem.iter(f"{S}t") if id(t) not in phonetic))
+                elem.clear()
+    return strings
+
+
+def column_index(cell_reference: str) -> int:
+    """The 0-based column of a cell reference like `AB12`."""
+    index = 0
+    for char in cell_reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord("A") + 1
+    return index - 1
+
+
+# the number formats, which are predefined for dates and times
+BUILTIN_DATE_FORMATS = set(range(14, 23)) | set(range(45, 48))
+# quoted text, escaped characters and colors or conditions in brackets do not make a format a date format
+NON_DATE_FORMAT_PARTS = re.compile(r'"[^"]*"|\\.|\[[^\]]*\]')
+
+
+@dataclass
+class Workbook:
+    """The parts of a workbook, which are needed to read the values of all its sheets."""
+
+    shared_strings: list[str] = field(default_factory=list)
+    # the indexes of the cell styles, which format numbers as dates
+    date_styles: set[int] = field(default_factory=set)
+    # dates are stored as days since this day
+    epoch: datetime = datetime(1899, 12, 30)
+
+
+def is_date_format(format_code: str) -> bool:
+    code = NON_DATE_FORMAT_PARTS.sub("", format_code).lower()
+    return any(c in code for c in "dmyhs") and "general" not in code
+
+
+def read_date_styles(archive: zipfile.ZipFile, part: str) -> set[int]:
+    if part not in archive.namelist():
+        return set()
+    with archive.open(part) as stream:
+        styles = parse(stream).getroot()
+
+    date_formats = set(BUILTIN_DATE_FORMATS)
+    for number_format in styles.iter(f"{S}numFmt"):
+        if is_date_format(number_format.get("formatCode", "")):
+            date_formats.add(int(number_format.get("numFmtId", "0")))
+
+    cell_formats = styles.find(f"{S}cellXfs")
+    if cell_formats is None:
+        return set()
+    return {
+        index for index, xf in enumerate(cell_formats.iter(f"{S}xf")) if int(xf.get("numFmtId", "0")) in date_formats
+    }
+
+
+def format_date(value: str, epoch: datetime) -> str:
+    try:
+        date = epoch + timedelta(days=float(value))
+    except (ValueError, OverflowError):
+        return value
+    # round to seconds, since the fractions of a day are not exact
+    date = (date + timedelta(microseconds=500_000)).replace(microsecond=0)
+    if date.time() == time(0):
+        return date.date().isoformat()
+    if float(value) < 1:
+        return date.time().isoformat()
+    return date.isoformat(sep=" ")
+
+
+def cell_value(cell: Element, workbook: Workbook) -> str:
+    cell_type = cell.get("t", "n")
+    if cell_type == "inlineStr":
+        return "".join(t.text or "" for t in cell.iter(f"{S}t"))
+
+    value = cell.findtext(f"{S}v")
+    if value is None:
+        return ""
+    if cell_type == "s":
+        index = int(value)
+        return workbook.shared_strings[index] if index < len(workbook.shared_strings) else ""
+    if cell_type == "b":
+        return "TRUE" if value == "1" else "FALSE"
+    if cell_type == "n" and int(cell.get("s", "0")) in workbook.date_styles:
+        return format_date(value, workbook.epoch)
+    return value
+
+
+def iter_sheet_rows(stream: IO[bytes], workbook: Workbook) -> Iterator[tuple[int, list[str]]]:
+    """Yields the (1-based) number and the cell values of every non-empty row."""
+    row_number = 0
+    sheet_data = None
+    for event, elem in iterparse(stream, events=("start", "end")):
+        if event == "start":
+            if elem.tag == f"{S}sheetData":
+                sheet_data = elem
+            continue
+        if elem.tag != f"{S}row":
+            continue
+
+        row_number = int(elem.get("r", row_number + 1))
+        values: list[str] = []
+        for cell in elem.iter(f"{S}c"):
+            reference = cell.get("r")
+            column = column_index(reference) if reference else len(values)
+            # empty cells are usually omitted, so the gaps are filled up
+            values.extend([""] * (column - len(values)))
+            values.append(cell_value(cell, workbook).strip())
+        # finished rows are dropped from the tree
+        if sheet_data is not None:
+            sheet_data.remove(elem)
+
+        while values and not values[-1]:
+            values.pop()
+        if values:
+            yield row_number, values
+
+
+def iter_xlsx_sheets(path: str) -> Iterator[tuple[str, Iterator[tuple[int, list[str]]]]]:
+    """Yields the name and the rows of every sheet. The rows have to be consumed before the next sheet."""
+    with zipfile.ZipFile(path) as archive:
+        with archive.open(XLSX_MAIN_PART) as stream:
+            root = parse(stream).getroot()
+        targets = read_relationships(archive, XLSX_MAIN_PART)
+
+        workbook = Workbook()
+        for target in targets.values():
+            if target.endswith("sharedStrings.xml"):
+                workbook.shared_strings = read_shared_strings(archive, target)
+            elif target.endswith("styles.xml"):
+                workbook.date_styles = read_date_styles(archive, target)
+        properties = root.find(f"{S}workbookPr")
+        if properties is not None and properties.get("date1904", "false").lower() in {"1", "true"}:
+            workbook.epoch = datetime(1904, 1, 1)
+
+        for sheet in root.iter(f"{S}sheet"):
+            part = targets.get(sheet.get(f"{R}id", ""))
+            if part is None or part not in archive.namelist():
+                continue
+            with archive.open(part) as stream:
+                yield sheet.get("name", ""), iter_sheet_rows(stream, workbook)
@@ -1,17 +1,22 @@
-from io import BytesIO
+from functools import lru_cache
+import os
 import shutil
-from typing import Any, BinaryIO
+from typing import Any, BinaryIO, Iterator, Sequence
 
 from langchain_core.documents import Document
 from langchain_community.document_loaders.parsers.pdf import PDFMinerParser, PyPDFParser
+from langchain_core.document_loaders import BaseBlobParser
+from langchain_community.document_loaders.blob_loaders import BlobLoader
 from langchain_community.document_loaders.generic import GenericLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 import pdfminer
 import pypdf
 
 from rei_s import logger
+from rei_s.config import DEFAULT_PDF_ENGINES, Config, PdfEngine
 from rei_s.services.formats.abstract_format_provider import AbstractFormatProvider
-from rei_s.services.formats.utils import BytesLoader, validate_chunk_overlap, validate_chunk_size
+from rei_s.services.formats.utils import SourceFileLoader, validate_chunk_overlap, validate_chunk_size
+from rei_s.services.multiprocess_utils import get_worker_pool, in_worker_process, uses_worker_pool, worker_pool_size
 from rei_s.types.source_file import SourceFile
 from rei_s.utils import get_new_file_path
 
@@ -37,15 +42,65 @@ class TolerantPDFMinerParser(PDFMinerParser):
         return metadata
 
 
+# the fast engine only looks at the first pages to decide, whether the whole file is plain text
+PLAIN_TEXT_SAMPLE_PAGES = 3
+PLAIN_TEXT_MIN_WORDS = 50
+
+
+# the pages are counted to decide where the file is chunked and again to split it, so the count is cached
+# the size and the modification time are part of the key, such that a reused path is counted again
+@lru_cache(maxsize=64)
+def count_pages(path: str, size: int, mtime_ns: int) -> int | None:
+    try:
+        # counting the pages only reads the cross reference table, not the content
+        return len(pypdf.PdfReader(path).pages)
+    except Exception as e:
+        logger.warning(f"Could not count the pages of PDF {path}, parsing it as a whole. Error: `{e}`")
+        return None
+
+
+def is_plain_text(text: str) -> bool:
+    """A heuristic for text, which pypdf extracts as well as PDFMiner.
+
+    Sparse pages (slides, forms), many short lines (tables, columns), missing spaces between words and
+    characters without unicode mapping indicate a layout, which PDFMiner handles better.
+    """
+    words = text.split()
+    if len(words) < PLAIN_TEXT_MIN_WORDS:
+        return False
+    if "(cid:" in text or "\ufffd" in text:
+        return False
+    if sum(len(w) for w in words) / len(words) > 12 or sum(len(w) > 25 for w in words) > len(words) / 50:
+        return False
+
+    lines = [line for line in text.splitlines() if line.strip()]
+    short_lines = sum(len(line.split()) <= 3 for line in lines)
+    return short_lines <= len(lines) / 2
+
+
+def looks_like_plain_text(file: SourceFile) -> bool:
+    try:
+        reader = pypdf.PdfReader(file.path)
+        pages = reader.pages[:PLAIN_TEXT_SAMPLE_PAGES]
+        return len(pages) > 0 and all(is_plain_text(page.extract_text()) for page in pages)
+    except Exception as e:
+        logger.debug(f"Could not sample the text of PDF {file.id}. Error: `{e}`")
+        return False
+
+
 class PdfProvider(AbstractFormatProvider):
     name = "pdf"
 
     file_name_extensions = [".pdf"]
 
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, **_kwargs: Any) -> None:
+    def __init__(
+        self, chunk_size: int = 1000, chunk_overlap: int = 200, config: Config | None = None, **_kwargs: Any
+    ) -> None:
         super().__init__()
         self.default_chunk_size = chunk_size
         self.default_chunk_overlap = chunk_overlap
+        self.config = config
+        self.engines = config.pdf_engines if config else DEFAULT_PDF_ENGINES
 
     def splitter(
         self, chunk_size: int | None = None, chunk_overlap: int | None = None
@@ -57,25 +112,142 @@ class PdfProvider(AbstractFormatProvider):
     def process_file(
         self, file: SourceFile, chunk_size: int | None = None, chunk_overlap: int | None = None
     ) -> list[Document]:
-        loader = GenericLoader(
-            blob_loader=BytesLoader(BytesIO(file.buffer)),
-            blob_parser=TolerantPDFMinerParser(extract_images=False, mode="page"),
-        )
+        return list(self.iter_chunks(file, chunk_size, chunk_overlap))
 
+    def iter_chunks(
+        self, file: SourceFile, chunk_size: int | None = None, chunk_overlap: int | None = None
+    ) -> Iterator[Document]:
+        page_ranges = self.page_ranges(file)
+        if page_ranges is None:
+            # the pages are parsed and split one by one, such that only a single page is held in memory
+            splitter = self.splitter(chunk_size, chunk_overlap)
+            yield from self.parse_and_split(file, splitter, self.engines)
+            return
+
+        # large files are split into ranges of pages, which are parsed in parallel by the worker pool
+        # the results are yielded in the order of the pages
+        # this is ensured by `page_ranges`, the following lines are there to help the ty typechecker
+        if self.config is None:
+            raise ValueError("The pages can only be parsed in parallel with a config.")
+        chunk_size = validate_chunk_size(chunk_size, self.default_chunk_size)
+        chunk_overlap = validate_chunk_overlap(chunk_overlap, self.default_chunk_overlap)
+        tasks = [(file, start, end, chunk_size, chunk_overlap, self.engines) for start, end in page_ranges]
+        for chunks in get_worker_pool(self.config).map(PdfProvider.process_page_range, tasks):
+            yield from chunks
+
+    def page_ranges(self, file: SourceFile) -> list[tuple[int, int]] | None:
+        """The ranges of pages to be parsed in parallel, or None if the file should be parsed as a whole."""
+        config = self.config
+        # the workers do not distribute their tasks any further
+        if config is None or not config.pdf_parallel_parsing or in_worker_process():
+            return None
+        if worker_pool_size(config) < 2 or not uses_worker_pool(config, file.size):
+            return None
+
+        stat = os.stat(file.path)
+        num_pages = count_pages(file.path, stat.st_size, stat.st_mtime_ns)
+        if num_pages is None or num_pages < config.pdf_parallel_min_pages:
+            return None
+
+        size = config.pdf_page_range_size
+        return [(start, min(start + size, num_pages)) for start in range(0, num_pages, size)]
+
+    def distributes_to_worker_pool(self, file: SourceFile) -> bool:
+        return self.page_ranges(file) is not None
+
+    @staticmethod
+    def process_page_range(
+        file: SourceFile, start: int, end: int, chunk_size: int, chunk_overlap: int, engines: Sequence[PdfEngine]
+    ) -> list[Document]:
+        """Parses the pages from `start` (inclusive) to `end` (exclusive). Runs in a worker process."""
+        part, total_pages = PdfProvider.write_pages(file, start, end)
         try:
-            documents = loader.load()
-            parser_info = f"PDFMiner {pdfminer.__version__}"
-        except Exception as e:
-            # Fallback to PyPDF if PDFMiner fails
-            # sometimes PyPDF is more tolerant to malformed PDFs
-            logger.warning(f"PDFMiner failed to load PDF {file.id}, falling back to PyPDF. Error: `{e}`")
-            loader = GenericLoader(
-                blob_loader=BytesLoader(BytesIO(file.buffer)),
-                blob_parser=PyPDFParser(extract_images=False, mode="page"),
-            )
-            documents = loader.load()
-            parser_info = f"PyPDF {pypdf.__version__}"
+            splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+            return list(PdfProvider.parse_and_split(part, splitter, engines, start, total_pages))
+        finally:
+            part.delete()
+
+    @staticmethod
+    def write_pages(file: SourceFile, start: int, end: int | None = None) -> tuple[SourceFile, int]:
+        """Writes the given pages into a new temporary pdf. Returns it with the number of pages of the original file."""
+        reader = pypdf.PdfReader(file.path)
+        writer = pypdf.PdfWriter()
+        for page in reader.pages[start:end]:
+            writer.add_page(page)
+        if reader.metadata:
+            writer.add_metadata(reader.metadata)
+
+        part = SourceFile.new_temporary_file(extension="pdf")
+        part.id = file.id
+        writer.write(part.path)
+        return part, len(reader.pages)
+
+    @staticmethod
+    def parse_and_split(
+        file: SourceFile,
+        splitter: RecursiveCharacterTextSplitter,
+        engines: Sequence[PdfEngine],
+        page_offset: int = 0,
+        total_pages: int | None = None,
+    ) -> Iterator[Document]:
+        """Parses the pages with the first engine, which accepts the file.
 
+        If an engine fails, the next one continues after the pages, whose chunks have already been passed on.
+        """
+        for i, engine in enumerate(engines):
+            remaining = engines[i + 1 :]
+            # the fast engine declines files with a complex layout, unless it is the last resort
+            if engine == "fast" and remaining and not looks_like_plain_text(file):
+                logger.debug(f"PDF {file.id} does not look like plain text, skipping the fast engine")
+                continue
+
+            parser, parser_info = PdfProvider.parser(engine)
+            parsed_pages = 0
+            try:
+                for page in PdfProvider.iter_pages(SourceFileLoader(file), parser):
+                    yield from PdfProvider.split_page(splitter, page, parser_info, page_offset, total_pages)
+                    parsed_pages += 1
+                return
+            except Exception as e:
+                if not remaining:
+                    raise
+                logger.warning(
+                    f"{parser_info} failed to load PDF {file.id} at page {page_offset + parsed_pages + 1}, "
+                    f"falling back to {remaining[0]}. Error: `{e}`"
+                )
+                if parsed_pages == 0:
+                    continue
+
+            # only the remaining pages are parsed again, instead of the whole file
+            part, num_pages = PdfProvider.write_pages(file, parsed_pages)
+            try:
+                yield from PdfProvider.parse_and_split(
+                    part, splitter, remaining, page_offset + parsed_pages, total_pages or num_pages
+                )
+            finally:
+                part.delete()
+            return
+
+    @staticmethod
+    def parser(engine: str) -> tuple[BaseBlobParser, str]:
+        if engine == "pdfminer":
+            return TolerantPDFMinerParser(extract_images=False, mode="page"), f"PDFMiner {pdfminer.__version__}"
+        if engine == "fast":
+            return PyPDFParser(extract_images=False, mode="page"), f"PyPDF {pypdf.__version__} (fast)"
+        return PyPDFParser(extract_images=False, mode="page"), f"PyPDF {pypdf.__version__}"
+
+    @staticmethod
+    def iter_pages(blob_loader: BlobLoader, parser: BaseBlobParser) -> Iterator[Document]:
+        return GenericLoader(blob_loader=blob_loader, blob_parser=parser).lazy_load()
+
+    @staticmethod
+    def split_page(
+        splitter: RecursiveCharacterTextSplitter,
+        page: Document,
+        parser_info: str,
+        page_offset: int = 0,
+        total_pages: int | None = None,
+    ) -> list[Document]:
         uninteresting_metadata = [
             "producer",
             "creator",
@@ -84,17 +256,20 @@ class PdfProvider(AbstractFormatProvider):
             "ptex.fullbanner",
         ]
 
-        for doc in documents:
-            doc.metadata["pdf_parser"] = parser_info
-            if "page" in doc.metadata:
-                # this loader starts to count at 0
-                # since convention for pdfs (and books, ...) is to start at 1, we need to increase it here
-                doc.metadata["page"] += 1
-            for key in uninteresting_metadata:
-                if key in doc.metadata:
-                    del doc.metadata[key]
+        page.metadata["pdf_parser"] = parser_info
+        if "page" in page.metadata:
+            # this loader starts to count at 0
+            # since convention for pdfs (and books, ...) is to start at 1, we need to increase it here
+            # the pages of a partial pdf are additionally shifted by its first page
+            page.metadata["page"] += 1 + page_offset
+        if total_pages is not None:
+            # a partial pdf only knows its own pages
+            page.metadata["total_pages"] = total_pages
+        for key in uninteresting_metadata:
+            if key in page.metadata:
+                del page.metadata[key]
 
-        chunks = self.splitter(chunk_size, chunk_overlap).split_documents(documents)
+        chunks = splitter.split_documents([page])
 
         # apparently we can encounter 0x00 bytes, which can not be handled by pgvector
         for c in chunks:
@@ -102,6 +277,10 @@ class PdfProvider(AbstractFormatProvider):
 
         return chunks
 
+    @property
+    def streams_chunks(self) -> bool:
+        return True
+
     @property
     def may_start_separate_process_for_converting(self) -> bool:
         # pdf files are converted to pdf by a simple copy, which does not need a subprocess
@@ -109,5 +288,5 @@ class PdfProvider(AbstractFormatProvider):
 
     def convert_file_to_pdf(self, file: SourceFile) -> SourceFile:
         path = get_new_file_path(extension="pdf")
-        shutil.copy(file.path, path)
+        shutil.copyfile(file.path, path)
         return SourceFile(id=file.id, path=path, mime_type="application/pdf", file_name=file.file_name)
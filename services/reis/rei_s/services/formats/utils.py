@@ -1,4 +1,3 @@
-from io import BytesIO
 import os
 from pathlib import Path
 import shutil
@@ -15,6 +14,8 @@ from pygments.formatters import HtmlFormatter  # type: ignore[import-untyped]
 from weasyprint import HTML
 
 from rei_s import logger
+from rei_s.config import Config
+from rei_s.services.libre_office_pool import LibreOfficeError, get_libre_office_pool
 from rei_s.types.source_file import SourceFile
 from rei_s.utils import get_new_file_path
 
@@ -41,12 +42,15 @@ def validate_chunk_overlap(chunk_overlap: int | None, default: int) -> int:
     return chunk_overlap
 
 
-class BytesLoader(BlobLoader):
-    def __init__(self, buffer: BytesIO) -> None:
-        self.buffer = buffer
+class SourceFileLoader(BlobLoader):
+    """Loads the file lazily from disk, instead of reading it into memory first."""
+
+    def __init__(self, file: SourceFile) -> None:
+        self.file = file
 
     def yield_blobs(self) -> Generator[Blob, None, None]:
-        yield Blob.from_data(self.buffer.getvalue(), path="stream")
+        # the path is a temporary file, which should not end up in the metadata
+        yield Blob.from_path(self.file.path, metadata={"source": "stream"})
 
 
 class ProcessingError(Exception):
@@ -55,9 +59,13 @@ class ProcessingError(Exception):
         self.status = status
         self.message = message
 
+    def __reduce__(self) -> tuple[type["ProcessingError"], tuple[str, int]]:
+        # needed to pass the error from a worker process back to the caller
+        return (self.__class__, (self.message, self.status))
+
 
 def generate_pdf_from_md_file(file: SourceFile, format_: str | None = None) -> SourceFile:
-    markdown_text = file.buffer.decode()
+    markdown_text = file.text()
     if format_ in {"plain", "md", "markdown"}:
         markdown_text = markdown_text
     elif format_:
@@ -80,11 +88,42 @@ def generate_pdf_from_md(markdown_text: str, doc_id: str, file_name: str) -> Sou
     return SourceFile(id=doc_id, path=path, mime_type="application/pdf", file_name=file_name)
 
 
-def convert_office_to_pdf(file: SourceFile) -> SourceFile:
-    # If we already have a preview PDF, use it
-    if file.preview_pdf_cache is not None and file.preview_pdf_cache.exists:
-        return file.preview_pdf_cache
+def convert_office_to_pdf(file: SourceFile, config: Config | None = None) -> SourceFile:
+    # during an ingest, the chunking and the preview share the pdf, such that the file is converted only once
+    shared_path = file.artifact("converted.pdf", lambda path: write_office_pdf(file, path, config))
+    if shared_path is not None:
+        return SourceFile(
+            id=file.id, path=shared_path, mime_type="application/pdf", file_name=file.file_name, is_artifact=True
+        )
+
+    output_dir = Path(tempfile.gettempdir()) / uuid4().hex
+    output_dir.mkdir(parents=True, exist_ok=True)
+    pdf_path = os.path.join(output_dir, Path(file.path).stem + ".pdf")
+    try:
+        write_office_pdf(file, pdf_path, config)
+    except Exception:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        raise
+
+    return SourceFile(id=file.id, path=pdf_path, mime_type="application/pdf", file_name=file.file_name, delete_dir=True)
+
+
+def write_office_pdf(file: SourceFile, pdf_path: str, config: Config | None = None) -> None:
+    pool = get_libre_office_pool(config) if config else None
+    if pool is None:
+        convert_office_to_pdf_with_cli(file, pdf_path)
+        return
+
+    logger.info(f"Converting {file.id} with a LibreOffice daemon")
+    try:
+        pool.convert(str(file.path), pdf_path)
+    except LibreOfficeError as e:
+        raise ValueError(f"Can not convert {file.id} to pdf: {e}") from e
 
+
+def convert_office_to_pdf_with_cli(file: SourceFile, pdf_path: str) -> None:
+    # starts a new LibreOffice instance with a new user profile for every file
+    # it names the pdf after the file, so it is written into a new directory first
     output_dir = Path(tempfile.gettempdir()) / uuid4().hex
     output_dir.mkdir(parents=True, exist_ok=True)
     libreoffice_home = Path(tempfile.gettempdir()) / uuid4().hex
@@ -119,13 +158,8 @@ def convert_office_to_pdf(file: SourceFile) -> SourceFile:
         finally:
             shutil.rmtree(libreoffice_home, ignore_errors=True)
     else:
+        shutil.rmtree(output_dir, ignore_errors=True)
         raise ValueError(f"Can not convert {file.id} to pdf, giving up")
 
-    base = os.path.basename(file.path)
-    pdf_name = os.path.splitext(base)[0] + ".pdf"
-    pdf_path = os.path.join(output_dir, pdf_name)
-
-    pdf = SourceFile(id=file.id, path=pdf_path, mime_type="application/pdf", file_name=file.file_name, delete_dir=True)
-    file.preview_pdf_cache = pdf
-
-    return pdf
+    shutil.move(output_dir / (Path(file.path).stem + ".pdf"), pdf_path)
+    shutil.rmtree(output_dir, ignore_errors=True)
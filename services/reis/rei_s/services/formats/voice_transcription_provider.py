@@ -1,5 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
+import csv
 from dataclasses import dataclass
+import json
+import os
 from pathlib import Path
+import tempfile
+import time
+import uuid
 from typing import Any
 
 from langchain_core.documents import Document
@@ -19,12 +26,20 @@ from rei_s.services.formats.utils import (
     generate_pdf_from_md_file,
 )
 from rei_s.types.source_file import SourceFile, temp_file
+from rei_s.utils import get_new_file_path
+
+# the upload limit of whisper
+MAX_SEGMENT_SIZE = 25 * 1000 * 1000
+# the bitrate of a stream is an average, leave some room for variable bitrates and the container
+SEGMENT_SIZE_MARGIN = 0.8
 
 
 @dataclass
 class MediaMetadata:
     audio_codec: str | None
     duration: float
+    # bits per second of the audio stream, or of the whole file if the stream does not tell
+    bit_rate: int | None = None
 
 
 class VoiceTranscriptionProvider(AbstractFormatProvider):
@@ -61,6 +76,8 @@ class VoiceTranscriptionProvider(AbstractFormatProvider):
     }
 
     parser: AzureOpenAIWhisperParser | None
+    concurrency: int = 4
+    retries: int = 3
 
     def __init__(
         self,
@@ -82,12 +99,16 @@ class VoiceTranscriptionProvider(AbstractFormatProvider):
             if config.stt_azure_openai_whisper_deployment_name is None:
                 raise ValueError("The env variable `STT_AZURE_OPENAI_WHISPER_DEPLOYMENT_NAME` is missing.")
 
+            # the client is shared by the threads transcribing the segments, the retries are done per segment below
             self.parser = AzureOpenAIWhisperParser(
                 api_key=config.stt_azure_openai_whisper_api_key.get_secret_value(),
                 azure_endpoint=config.stt_azure_openai_whisper_endpoint,
                 api_version=config.stt_azure_openai_whisper_api_version,
                 deployment_name=config.stt_azure_openai_whisper_deployment_name,
+                max_retries=0,
             )
+            self.concurrency = config.stt_concurrency
+            self.retries = config.stt_retries
         else:
             self.parser = None
 
@@ -119,20 +140,28 @@ class VoiceTranscriptionProvider(AbstractFormatProvider):
             raise ProcessingError(message, 400) from e
 
         audio_codec = None
+        bit_rate = metadata["format"].get("bit_rate")
         for stream in metadata["streams"]:
             if stream["codec_type"] == "audio":
                 audio_codec = stream["codec_name"]
+                bit_rate = stream.get("bit_rate", bit_rate)
                 break
 
         duration = float(metadata["format"]["duration"])
 
-        return MediaMetadata(audio_codec, duration)
+        return MediaMetadata(audio_codec, duration, int(bit_rate) if bit_rate else None)
+
+    @staticmethod
+    def fits_into_segment(bit_rate: int | None, segment_duration_seconds: int) -> bool:
+        if bit_rate is None:
+            return False
+        return bit_rate * segment_duration_seconds / 8 <= MAX_SEGMENT_SIZE * SEGMENT_SIZE_MARGIN
 
     def split_into_compatible_format(
         self,
         input_path: str | Path,
         segment_duration_seconds: int | None = None,
-        output_bitrate: str = "128k",
+        output_bitrate: int = 128_000,
         force_reencode: bool = False,
     ) -> tuple[list[SourceFile], list[int | float], str]:
         metadata = self.probe_audio_codec(input_path)
@@ -142,41 +171,67 @@ class VoiceTranscriptionProvider(AbstractFormatProvider):
         if segment_duration_seconds is None:
             segment_duration_seconds = self.default_segment_duration
 
-        if audio_codec in self.supported_audio_codecs and not force_reencode:
+        # the bitrate is chosen up front, such that every segment is below the upload limit
+        if (
+            audio_codec in self.supported_audio_codecs
+            and not force_reencode
+            and self.fits_into_segment(metadata.bit_rate, segment_duration_seconds)
+        ):
             logger.info(f"segment audio of length {duration} s")
-            output_kwargs = {"c": "copy"}
+            output_kwargs: dict[str, str | int] = {"c": "copy"}
         else:
-            logger.info(f"segment and reencode audio of length {duration} s")
-            output_kwargs = {"audio_bitrate": output_bitrate}
+            max_bitrate = int(MAX_SEGMENT_SIZE * SEGMENT_SIZE_MARGIN * 8 / segment_duration_seconds)
+            bitrate = min(output_bitrate, max_bitrate)
+            logger.info(f"segment and reencode audio of length {duration} s with {bitrate // 1000} kbit/s")
+            output_kwargs = {"audio_bitrate": bitrate}
             audio_codec = "vorbis"
+        extension = self.audio_codecs_to_file_extension[audio_codec]
 
-        segments_files: list[SourceFile] = []
-        segment_timestamps: list[int | float] = list(range(0, int(duration), segment_duration_seconds))
-        for n, start_time in enumerate(segment_timestamps):
-            logger.info(f"segment {n + 1} / {len(segment_timestamps)}")
-
-            segment_file = SourceFile.new_temporary_file(extension=self.audio_codecs_to_file_extension[audio_codec])
-            try:
-                _out, _err = (
-                    ffmpeg.input(input_path, ss=start_time, t=segment_duration_seconds)
-                    .output(segment_file.path, y=None, **output_kwargs)
-                    .run(capture_stdout=True, capture_stderr=True)
+        # all segments are written by a single ffmpeg process, which lists them with their start and end time
+        prefix = str(uuid.uuid4())
+        segment_list = get_new_file_path(prefix, "csv")
+        try:
+            _out, _err = (
+                ffmpeg.input(input_path)
+                .output(
+                    get_new_file_path(f"{prefix}-%05d", extension),
+                    f="segment",
+                    segment_time=segment_duration_seconds,
+                    segment_list=segment_list,
+                    segment_list_type="csv",
+                    reset_timestamps=1,
+                    vn=None,
+                    y=None,
+                    **output_kwargs,
                 )
-            except ffmpeg.Error as e:  # pragma: no cover
-                message = self.build_ffmpeg_error_message(e)
-                logger.error(message)
-                raise ProcessingError(message, 400) from e
-
-            segments_files.append(segment_file)
-
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+            with open(segment_list, newline="") as f:
+                entries = list(csv.reader(f))
+        except ffmpeg.Error as e:
+            for leftover in Path(tempfile.gettempdir()).glob(f"{prefix}-*"):
+                leftover.unlink()
+            message = self.build_ffmpeg_error_message(e)
+            logger.error(message)
+            raise ProcessingError(message, 400) from e
+        finally:
+            if os.path.exists(segment_list):
+                os.remove(segment_list)
+
+        segments_files = [
+            SourceFile(path=get_new_file_path(name), mime_type="", file_name=name) for name, _start, _end in entries
+        ]
+        segment_timestamps: list[int | float] = [float(start) for _name, start, _end in entries]
         segment_timestamps.append(duration)
+        logger.info(f"split audio into {len(segments_files)} segments")
 
-        # check that no segment is larger than 25 MB. This could happen for very high bitrates.
-        # In that case we reencode with a lower bitrate
-        if any(x.size >= 25 * 1000 * 1000 for x in segments_files):
+        # the bitrate of a stream might be far off its average. In that case we reencode with a lower bitrate
+        if any(x.size >= MAX_SEGMENT_SIZE for x in segments_files):
             # cleanup first
             for i in segments_files:
                 i.delete()
+            if force_reencode:
+                raise ProcessingError("File too large. The limit is 25 MiB.", 413)
             # split with reencode
             return self.split_into_compatible_format(
                 input_path, segment_duration_seconds, output_bitrate, force_reencode=True
@@ -184,6 +239,40 @@ class VoiceTranscriptionProvider(AbstractFormatProvider):
 
         return segments_files, segment_timestamps, audio_codec
 
+    @staticmethod
+    def is_transient(e: openai.APIError) -> bool:
+        return isinstance(e, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError))
+
+    @staticmethod
+    def retry_delay(e: openai.APIError, retry: int) -> float:
+        # the service tells us how long to wait, if we are rate limited
+        if isinstance(e, openai.APIStatusError):
+            try:
+                return float(e.response.headers.get("retry-after", ""))
+            except ValueError:
+                pass
+        return float(2**retry)
+
+    def transcribe_segment(self, segment: SourceFile, n: int, total: int) -> list[Document]:
+        if self.parser is None:
+            raise ValueError(f"calling disabled format provider: `{self.__class__.name}`")
+
+        blob = Blob.from_path(segment.path)
+        retry = 0
+        while True:
+            logger.info(f"process {n + 1} / {total}")
+            try:
+                return self.parser.parse(blob)
+            except openai.APIError as e:
+                if isinstance(e, openai.APIStatusError) and e.status_code == 413:
+                    raise ProcessingError("File too large. The limit is 25 MiB.", e.status_code) from e
+                if not self.is_transient(e) or retry == self.retries:
+                    raise
+                retry += 1
+                logger.warning(f"transcription of segment {n + 1} / {total} failed, retry {retry}/{self.retries}: {e}")
+                delay = self.retry_delay(e, retry - 1)
+            time.sleep(delay)
+
     def parse_file(self, file: SourceFile) -> list[Document]:
         if self.parser is None:
             raise ValueError(f"calling disabled format provider: `{self.__class__.name}`")
@@ -193,33 +282,44 @@ class VoiceTranscriptionProvider(AbstractFormatProvider):
         segments, segment_timestamps, _audio_codec = self.split_into_compatible_format(file.path)
 
         results = []
-        for n, segment in enumerate(segments):
-            blob = Blob.from_path(segment.path)
-            logger.info(f"process {n + 1} / {len(segments)}")
-            try:
-                docs = self.parser.parse(blob)
-            except openai.APIStatusError as e:  # pragma: no cover
-                if e.status_code == 413:
-                    raise ProcessingError("File too large. The limit is 25 MiB.", e.status_code) from e
-                else:
-                    raise
-            finally:
+        # the segments are transcribed concurrently, the transcripts are collected in the order of the segments
+        executor = ThreadPoolExecutor(max_workers=max(1, min(len(segments), self.concurrency)))
+        try:
+            futures = [executor.submit(self.transcribe_segment, s, n, len(segments)) for n, s in enumerate(segments)]
+            for n, future in enumerate(futures):
+                docs = future.result()
+                for doc in docs:
+                    doc.metadata["segment_begin_seconds"] = segment_timestamps[n]
+                    doc.metadata["segment_end_seconds"] = segment_timestamps[n + 1]
+                    doc.metadata["total_segments"] = len(segments)
+                    doc.metadata["total_duration"] = segment_timestamps[-1]
+
+                results.extend(docs)
+        finally:
+            # if a segment failed, the segments which did not start yet are not transcribed anymore
+            executor.shutdown(wait=True, cancel_futures=True)
+            for segment in segments:
                 segment.delete()
 
-            for doc in docs:
-                doc.metadata["segment_begin_seconds"] = segment_timestamps[n]
-                doc.metadata["segment_end_seconds"] = segment_timestamps[n + 1]
-                doc.metadata["total_segments"] = len(segments)
-                doc.metadata["total_duration"] = segment_timestamps[-1]
+        return results
 
-            results.extend(docs)
+    def transcribe(self, file: SourceFile) -> list[Document]:
+        """The transcript of the file. Within an ingest, the chunking and the preview share it."""
+        path = file.artifact("transcript.json", lambda path: self.write_transcript(file, path))
+        if path is None:
+            return self.parse_file(file)
+        with open(path) as f:
+            return [Document(page_content=doc["page_content"], metadata=doc["metadata"]) for doc in json.load(f)]
 
-        return results
+    def write_transcript(self, file: SourceFile, path: str) -> None:
+        docs = self.parse_file(file)
+        with open(path, "w") as f:
+            json.dump([{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs], f)
 
     def process_file(
         self, file: SourceFile, chunk_size: int | None = None, chunk_overlap: int | None = None
     ) -> list[Document]:
-        results = self.parse_file(file)
+        results = self.transcribe(file)
 
         chunks = self.splitter(chunk_size, chunk_overlap).split_documents(results)
         return chunks
@@ -230,7 +330,7 @@ class VoiceTranscriptionProvider(AbstractFormatProvider):
         return False
 
     def convert_file_to_pdf(self, file: SourceFile) -> SourceFile:
-        docs = self.parse_file(file)
+        docs = self.transcribe(file)
 
         plain = "\n".join([doc.page_content for doc in docs])
 
@@ -0,0 +1,182 @@
+import os
+from threading import Event, Lock, Thread
+from typing import Callable
+import uuid
+
+from fastapi import HTTPException
+
+from rei_s import logger
+from rei_s.config import Config
+from rei_s.services import store_service
+from rei_s.services.job_store_adapter import IngestJob, JobStatus, JobStoreAdapter
+from rei_s.services.work_scheduler import WorkScheduler, estimate_cost
+from rei_s.types.source_file import SourceFile
+
+
+class IngestQueue:
+    """Runs ingests in the background, which are persisted as jobs and resumed after a restart.
+
+    The uploaded files are kept in the spool directory until their job is finished. Every process renews its
+    unfinished jobs regularly. Jobs, which were not renewed within the lease (i.e., their process died), are claimed
+    by a process which has their file.
+    """
+
+    def __init__(self, config: Config, job_store: JobStoreAdapter, executor: WorkScheduler) -> None:
+        if config.job_spool_dir is None:
+            raise ValueError("The env variable `JOB_SPOOL_DIR` is missing.")
+
+        self.config = config
+        self.job_store = job_store
+        self.executor = executor
+        self.spool_dir = config.job_spool_dir
+        self.owner = str(uuid.uuid4())
+        # no more jobs are started
+        self.stopped = Event()
+        # the jobs are not renewed anymore
+        self.closed = Event()
+        self.heartbeat = Thread(target=self.keep_alive, name="ingest-queue-heartbeat", daemon=True)
+        # the final status of jobs, which could not be saved yet
+        self.unsaved: dict[str, tuple[JobStatus, str | None, int | None]] = {}
+        self.lock = Lock()
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+    def spool_path(self, job_id: str) -> str:
+        return os.path.join(self.spool_dir, job_id)
+
+    def add(
+        self,
+        job_id: str,
+        file_id: str,
+        file_name: str,
+        mime_type: str,
+        bucket: str,
+        index_name: str | None,
+        on_finished: Callable[[], None] | None = None,
+    ) -> IngestJob:
+        """Persists the job for the file at `spool_path(job_id)` and queues it.
+
+        `on_finished` is called, when this process is done with the job, even if it failed or was left to the next one.
+        """
+        job = IngestJob(
+            id=job_id,
+            file_id=file_id,
+            file_name=file_name,
+            mime_type=mime_type,
+            bucket=bucket,
+            index_name=index_name,
+            path=self.spool_path(job_id),
+            owner=self.owner,
+        )
+        self.job_store.add(job)
+        self.schedule(job, on_finished)
+        logger.info(f"queued job {job.id} for doc_id {job.file_id}")
+        return job
+
+    def schedule(self, job: IngestJob, on_finished: Callable[[], None] | None = None) -> None:
+        def run() -> None:
+            try:
+                self.run(job)
+            finally:
+                if on_finished is not None:
+                    on_finished()
+
+        cost = estimate_cost(os.path.getsize(job.path) if os.path.exists(job.path) else 0)
+        self.executor.submit_prioritized("bulk", job.bucket, cost, run)
+
+    def run(self, job: IngestJob) -> None:
+        if self.stopped.is_set():
+            # the job is resumed after the restart
+            return
+
+        file = SourceFile(id=job.file_id, path=job.path, file_name=job.file_name, mime_type=job.mime_type)
+        try:
+            self.finish(job, *self.process(job, file))
+        finally:
+            file.delete()
+
+    def process(self, job: IngestJob, file: SourceFile) -> tuple[JobStatus, str | None, int | None]:
+        """Adds the file and returns the final status of the job, its error and the status code of the error."""
+        try:
+            if job.status == "running":
+                # the previous attempt might have stored some of the chunks, only those are removed, such that a
+                # previously stored version of the document stays searchable. Its preview is left as it is, it is
+                # overwritten by this attempt.
+                logger.info(f"resume job {job.id} for doc_id {job.file_id}, attempt {job.attempts}")
+                chunk_ids = self.job_store.get_chunk_ids(job.id)
+                store_service.remove_chunks(self.config, job.file_id, chunk_ids, job.index_name)
+            if job.attempts > self.config.job_max_attempts:
+                logger.error(f"job {job.id} failed: it was interrupted {job.attempts - 1} times")
+                return "failed", "Processing was interrupted too often", 500
+            self.job_store.set_status(job.id, "running")
+
+            store_service.process_and_add_file(
+                self.config,
+                file,
+                job.bucket,
+                job.index_name,
+                lambda done, total: self.job_store.set_progress(job.id, done, total),
+                lambda chunk_ids: self.job_store.add_chunk_ids(job.id, chunk_ids),
+            )
+        except HTTPException as e:
+            logger.error(f"job {job.id} failed: {e.detail}")
+            return "failed", str(e.detail), e.status_code
+        except Exception as e:
+            logger.error(f"job {job.id} failed: {e!r}")
+            return "failed", "Processing failed", 500
+        return "done", None, None
+
+    def finish(self, job: IngestJob, status: JobStatus, error: str | None, error_status: int | None) -> None:
+        try:
+            self.job_store.set_status(job.id, status, error, error_status)
+        except Exception as e:
+            # otherwise the job would stay running and be renewed by this process as long as it lives
+            logger.warning(f"Failed saving the status of job {job.id}, retrying with the next renewal: {e!r}")
+            with self.lock:
+                self.unsaved[job.id] = (status, error, error_status)
+
+    def save_statuses(self) -> None:
+        with self.lock:
+            unsaved = self.unsaved.copy()
+        for job_id, result in unsaved.items():
+            self.job_store.set_status(job_id, *result)
+            with self.lock:
+                del self.unsaved[job_id]
+
+    def resume_abandoned(self) -> None:
+        for job in self.job_store.list_abandoned():
+            # the spool directory might not be shared with the process, which accepted the job
+            if os.path.exists(job.path) and self.job_store.claim(job, self.owner):
+                logger.info(f"claimed abandoned job {job.id} for doc_id {job.file_id}")
+                job.owner = self.owner
+                job.attempts += 1
+                self.schedule(job)
+
+    def keep_alive(self) -> None:
+        while not self.closed.wait(self.config.job_lease / 3):
+            try:
+                self.job_store.heartbeat(self.owner)
+                self.save_statuses()
+                if not self.stopped.is_set():
+                    self.resume_abandoned()
+                self.job_store.evict()
+            except Exception as e:
+                logger.warning(f"Failed renewing the ingest jobs: {e!r}")
+
+    def start(self) -> None:
+        self.resume_abandoned()
+        self.heartbeat.start()
+
+    def stop(self) -> None:
+        """Jobs, which did not start yet, are left to the next process. The running jobs are still renewed."""
+        self.stopped.set()
+
+    def close(self) -> None:
+        self.stopped.set()
+        self.closed.set()
+        if self.heartbeat.is_alive():
+            self.heartbeat.join()
+        try:
+            self.save_statuses()
+        except Exception as e:
+            logger.warning(f"Failed saving the status of {len(self.unsaved)} jobs: {e!r}")
@@ -0,0 +1,83 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+import time
+from typing import Literal
+
+JobStatus = Literal["queued", "running", "done", "failed"]
+
+
+@dataclass
+class IngestJob:
+    id: str
+    file_id: str
+    file_name: str
+    mime_type: str
+    bucket: str
+    index_name: str | None
+    # the uploaded file in the spool directory, it is deleted when the job is finished
+    path: str
+    # the process running the job, see `IngestQueue`
+    owner: str
+    status: JobStatus = "queued"
+    chunks_done: int = 0
+    # unknown, while a streamed file is still parsed
+    chunks_total: int | None = None
+    error: str | None = None
+    error_status: int | None = None
+    # the number of processes, which started the job, see `IngestQueue`
+    attempts: int = 1
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    # renewed by the owner while it is alive
+    heartbeat_at: float = field(default_factory=time.time)
+
+
+class JobStoreAdapter(ABC):
+    @abstractmethod
+    def add(self, job: IngestJob) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, job_id: str) -> IngestJob | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_status(
+        self, job_id: str, status: JobStatus, error: str | None = None, error_status: int | None = None
+    ) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_chunk_ids(self, job_id: str, chunk_ids: list[str]) -> None:
+        """Records the chunks, which are about to be written, such that an interrupted attempt can be cleaned up.
+
+        The chunk ids of a job are removed, when its status is set to `done` or `failed`.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_chunk_ids(self, job_id: str) -> list[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_progress(self, job_id: str, chunks_done: int, chunks_total: int | None) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def heartbeat(self, owner: str) -> None:
+        """Renews the unfinished jobs of the owner."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_abandoned(self) -> list[IngestJob]:
+        """The unfinished jobs, whose owner did not renew them within the lease."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim(self, job: IngestJob, owner: str) -> bool:
+        """Takes over an abandoned job and counts the attempt. Fails, if another process claimed it in the meantime."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def evict(self) -> None:
+        raise NotImplementedError
@@ -0,0 +1,22 @@
+from functools import lru_cache
+
+from rei_s.config import Config
+from rei_s.services.job_store_adapter import JobStoreAdapter
+from rei_s.services.job_stores.postgres import PostgresJobStoreAdapter
+from rei_s.services.job_stores.sqlite import SqliteJobStoreAdapter
+
+
+# the store holds connections, so we reuse one instance per configuration
+@lru_cache
+def get_job_store(
+    config: Config,
+) -> JobStoreAdapter | None:
+    if config.job_store_type is None:
+        # this is an optional feature
+        return None
+    elif config.job_store_type == "sqlite":
+        return SqliteJobStoreAdapter.create(config=config)
+    elif config.job_store_type == "postgres":
+        return PostgresJobStoreAdapter.create(config=config)
+    else:
+        raise ValueError(f"Job store type {config.job_store_type} not supported")
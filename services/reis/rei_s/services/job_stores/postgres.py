@@ -0,0 +1,153 @@
+from dataclasses import asdict, fields
+import time
+
+from sqlalchemy import Engine, create_engine, text
+
+from rei_s.config import Config
+from rei_s.services.job_store_adapter import IngestJob, JobStatus, JobStoreAdapter
+
+COLUMNS = [f.name for f in fields(IngestJob)]
+
+
+class PostgresJobStoreAdapter(JobStoreAdapter):
+    engine: Engine
+    lease: int
+    ttl: int
+
+    def add(self, job: IngestJob) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    f"INSERT INTO reis_ingest_jobs ({', '.join(COLUMNS)}) "
+                    f"VALUES ({', '.join(':' + c for c in COLUMNS)})"
+                ),
+                asdict(job),
+            )
+
+    def get(self, job_id: str) -> IngestJob | None:
+        with self.engine.begin() as connection:
+            row = connection.execute(text("SELECT * FROM reis_ingest_jobs WHERE id = :id"), {"id": job_id}).fetchone()
+        return IngestJob(**row._mapping) if row is not None else None
+
+    def set_status(
+        self, job_id: str, status: JobStatus, error: str | None = None, error_status: int | None = None
+    ) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "UPDATE reis_ingest_jobs SET status = :status, error = :error, error_status = :error_status, "
+                    "updated_at = :now WHERE id = :id"
+                ),
+                {"status": status, "error": error, "error_status": error_status, "now": time.time(), "id": job_id},
+            )
+            if status in ("done", "failed"):
+                connection.execute(text("DELETE FROM reis_ingest_job_chunks WHERE job_id = :id"), {"id": job_id})
+
+    def add_chunk_ids(self, job_id: str, chunk_ids: list[str]) -> None:
+        if not chunk_ids:
+            return
+
+        with self.engine.begin() as connection:
+            connection.execute(
+                text("INSERT INTO reis_ingest_job_chunks (job_id, chunk_id) VALUES (:job_id, :chunk_id)"),
+                [{"job_id": job_id, "chunk_id": chunk_id} for chunk_id in chunk_ids],
+            )
+
+    def get_chunk_ids(self, job_id: str) -> list[str]:
+        with self.engine.begin() as connection:
+            rows = connection.execute(
+                text("SELECT chunk_id FROM reis_ingest_job_chunks WHERE job_id = :id"), {"id": job_id}
+            ).fetchall()
+        return [row.chunk_id for row in rows]
+
+    def set_progress(self, job_id: str, chunks_done: int, chunks_total: int | None) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "UPDATE reis_ingest_jobs SET chunks_done = :chunks_done, chunks_total = :chunks_total, "
+                    "updated_at = :now WHERE id = :id"
+                ),
+                {"chunks_done": chunks_done, "chunks_total": chunks_total, "now": time.time(), "id": job_id},
+            )
+
+    def heartbeat(self, owner: str) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "UPDATE reis_ingest_jobs SET heartbeat_at = :now "
+                    "WHERE owner = :owner AND status IN ('queued', 'running')"
+                ),
+                {"now": time.time(), "owner": owner},
+            )
+
+    def list_abandoned(self) -> list[IngestJob]:
+        with self.engine.begin() as connection:
+            rows = connection.execute(
+                text(
+                    "SELECT * FROM reis_ingest_jobs WHERE status IN ('queued', 'running') AND heartbeat_at < :expired "
+                    "ORDER BY created_at"
+                ),
+                {"expired": time.time() - self.lease},
+            ).fetchall()
+        return [IngestJob(**row._mapping) for row in rows]
+
+    def claim(self, job: IngestJob, owner: str) -> bool:
+        with self.engine.begin() as connection:
+            result = connection.execute(
+                text(
+                    "UPDATE reis_ingest_jobs SET owner = :owner, heartbeat_at = :now, attempts = attempts + 1 "
+                    "WHERE id = :id AND owner = :previous_owner AND heartbeat_at = :heartbeat_at"
+                ),
+                {
+                    "owner": owner,
+                    "now": time.time(),
+                    "id": job.id,
+                    "previous_owner": job.owner,
+                    "heartbeat_at": job.heartbeat_at,
+                },
+            )
+        return result.rowcount == 1
+
+    def evict(self) -> None:
+        with self.engine.begin() as connection:
+            # unfinished jobs are kept, however long they are queued, until they are finished or failed
+            connection.execute(
+                text("DELETE FROM reis_ingest_jobs WHERE status IN ('done', 'failed') AND updated_at <= :expired"),
+                {"expired": time.time() - self.ttl},
+            )
+
+    @classmethod
+    def create(cls, config: Config) -> "PostgresJobStoreAdapter":
+        url = config.job_store_postgres_url or config.store_pgvector_url
+        if url is None:
+            raise ValueError("The env variable `JOB_STORE_POSTGRES_URL` is missing.")
+
+        engine = create_engine(url.get_secret_value(), pool_size=5, max_overflow=10, pool_recycle=3600)
+        with engine.begin() as connection:
+            connection.execute(
+                text(
+                    "CREATE TABLE IF NOT EXISTS reis_ingest_jobs "
+                    "(id TEXT PRIMARY KEY, file_id TEXT NOT NULL, file_name TEXT NOT NULL, mime_type TEXT NOT NULL, "
+                    "bucket TEXT NOT NULL, index_name TEXT, path TEXT NOT NULL, owner TEXT NOT NULL, "
+                    "status TEXT NOT NULL, chunks_done INTEGER NOT NULL, chunks_total INTEGER, error TEXT, "
+                    "error_status INTEGER, attempts INTEGER NOT NULL, created_at DOUBLE PRECISION NOT NULL, "
+                    "updated_at DOUBLE PRECISION NOT NULL, heartbeat_at DOUBLE PRECISION NOT NULL)"
+                )
+            )
+            connection.execute(
+                text("CREATE INDEX IF NOT EXISTS reis_ingest_jobs_status ON reis_ingest_jobs (status, heartbeat_at)")
+            )
+            connection.execute(
+                text("CREATE TABLE IF NOT EXISTS reis_ingest_job_chunks (job_id TEXT NOT NULL, chunk_id TEXT NOT NULL)")
+            )
+            connection.execute(
+                text("CREATE INDEX IF NOT EXISTS reis_ingest_job_chunks_job_id ON reis_ingest_job_chunks (job_id)")
+            )
+
+        instance = cls()
+
+        instance.engine = engine
+        instance.lease = config.job_lease
+        instance.ttl = config.job_ttl
+
+        return instance
@@ -0,0 +1,135 @@
+from dataclasses import asdict, fields
+import os
+import sqlite3
+from threading import Lock
+import time
+
+from rei_s.config import Config
+from rei_s.services.job_store_adapter import IngestJob, JobStatus, JobStoreAdapter
+
+COLUMNS = [f.name for f in fields(IngestJob)]
+
+
+class SqliteJobStoreAdapter(JobStoreAdapter):
+    connection: sqlite3.Connection
+    lock: Lock
+    lease: int
+    ttl: int
+
+    def add(self, job: IngestJob) -> None:
+        with self.lock:
+            self.connection.execute(
+                f"INSERT INTO ingest_jobs ({', '.join(COLUMNS)}) VALUES ({', '.join(':' + c for c in COLUMNS)})",
+                asdict(job),
+            )
+            self.connection.commit()
+
+    def get(self, job_id: str) -> IngestJob | None:
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM ingest_jobs WHERE id = ?", [job_id]).fetchone()
+        return IngestJob(**row) if row is not None else None
+
+    def set_status(
+        self, job_id: str, status: JobStatus, error: str | None = None, error_status: int | None = None
+    ) -> None:
+        with self.lock:
+            self.connection.execute(
+                "UPDATE ingest_jobs SET status = ?, error = ?, error_status = ?, updated_at = ? WHERE id = ?",
+                [status, error, error_status, time.time(), job_id],
+            )
+            if status in ("done", "failed"):
+                self.connection.execute("DELETE FROM ingest_job_chunks WHERE job_id = ?", [job_id])
+            self.connection.commit()
+
+    def add_chunk_ids(self, job_id: str, chunk_ids: list[str]) -> None:
+        with self.lock:
+            self.connection.executemany(
+                "INSERT INTO ingest_job_chunks (job_id, chunk_id) VALUES (?, ?)",
+                [(job_id, chunk_id) for chunk_id in chunk_ids],
+            )
+            self.connection.commit()
+
+    def get_chunk_ids(self, job_id: str) -> list[str]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT chunk_id FROM ingest_job_chunks WHERE job_id = ?", [job_id]
+            ).fetchall()
+        return [row["chunk_id"] for row in rows]
+
+    def set_progress(self, job_id: str, chunks_done: int, chunks_total: int | None) -> None:
+        with self.lock:
+            self.connection.execute(
+                "UPDATE ingest_jobs SET chunks_done = ?, chunks_total = ?, updated_at = ? WHERE id = ?",
+                [chunks_done, chunks_total, time.time(), job_id],
+            )
+            self.connection.commit()
+
+    def heartbeat(self, owner: str) -> None:
+        with self.lock:
+            self.connection.execute(
+                "UPDATE ingest_jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                [time.time(), owner],
+            )
+            self.connection.commit()
+
+    def list_abandoned(self) -> list[IngestJob]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT * FROM ingest_jobs WHERE status IN ('queued', 'running') AND heartbeat_at < ? "
+                "ORDER BY created_at",
+                [time.time() - self.lease],
+            ).fetchall()
+        return [IngestJob(**row) for row in rows]
+
+    def claim(self, job: IngestJob, owner: str) -> bool:
+        with self.lock:
+            cursor = self.connection.execute(
+                "UPDATE ingest_jobs SET owner = ?, heartbeat_at = ?, attempts = attempts + 1 "
+                "WHERE id = ? AND owner = ? AND heartbeat_at = ?",
+                [owner, time.time(), job.id, job.owner, job.heartbeat_at],
+            )
+            self.connection.commit()
+        return cursor.rowcount == 1
+
+    def evict(self) -> None:
+        with self.lock:
+            # unfinished jobs are kept, however long they are queued, until they are finished or failed
+            self.connection.execute(
+                "DELETE FROM ingest_jobs WHERE status IN ('done', 'failed') AND updated_at <= ?",
+                [time.time() - self.ttl],
+            )
+            self.connection.commit()
+
+    @classmethod
+    def create(cls, config: Config) -> "SqliteJobStoreAdapter":
+        if config.job_store_sqlite_path is None:
+            raise ValueError("The env variable `JOB_STORE_SQLITE_PATH` is missing.")
+
+        os.makedirs(os.path.dirname(os.path.abspath(config.job_store_sqlite_path)), exist_ok=True)
+
+        # the connection is shared between the worker threads, access is serialized by the lock
+        connection = sqlite3.connect(config.job_store_sqlite_path, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_jobs "
+            "(id TEXT PRIMARY KEY, file_id TEXT NOT NULL, file_name TEXT NOT NULL, mime_type TEXT NOT NULL, "
+            "bucket TEXT NOT NULL, index_name TEXT, path TEXT NOT NULL, owner TEXT NOT NULL, status TEXT NOT NULL, "
+            "chunks_done INTEGER NOT NULL, chunks_total INTEGER, error TEXT, error_status INTEGER, "
+            "attempts INTEGER NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL, heartbeat_at REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS ingest_jobs_status ON ingest_jobs (status, heartbeat_at)")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_job_chunks (job_id TEXT NOT NULL, chunk_id TEXT NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS ingest_job_chunks_job_id ON ingest_job_chunks (job_id)")
+        connection.commit()
+
+        instance = cls()
+
+        instance.connection = connection
+        instance.lock = Lock()
+        instance.lease = config.job_lease
+        instance.ttl = config.job_ttl
+
+        return instance
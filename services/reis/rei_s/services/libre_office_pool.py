@@ -0,0 +1,255 @@
+import atexit
+from contextlib import contextmanager
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+from queue import Queue
+from threading import Lock
+import time
+from typing import Generator
+
+from rei_s import logger
+from rei_s.config import Config
+from rei_s.services.multiprocess_utils import in_worker_process
+
+# unoserver runs with the python of LibreOffice, which has the UNO bindings (e.g. alpine's `py3-libreoffice`), and
+# unoconvert hands the files to it, so neither has to be importable from the python of REI-S
+UNOSERVER_AVAILABLE = shutil.which("unoserver") is not None and shutil.which("unoconvert") is not None
+
+
+class LibreOfficeError(Exception):
+    pass
+
+
+def free_port() -> int:
+    # the port is free now, but another process might take it before unoserver binds it, so `start` retries
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LibreOfficeDaemon:
+    """A headless LibreOffice instance, which is controlled by `unoserver` and converts files sent by `unoconvert`.
+
+    Every instance has its own user profile, which is reused for all its conversions.
+    """
+
+    process: subprocess.Popen[bytes] | None = None
+    # number of times, the start is tried with new ports
+    start_attempts: int = 3
+
+    def __init__(self, startup_timeout: float) -> None:
+        self.startup_timeout = startup_timeout
+        self.profile = tempfile.mkdtemp(prefix="libreoffice-")
+        self.port = 0
+
+    def start(self) -> None:
+        os.makedirs(self.profile, exist_ok=True)
+        # unoserver exits right away, if one of its ports has been taken in the meantime
+        for attempt in range(self.start_attempts):
+            if self.launch():
+                return
+            logger.warning(f"LibreOffice daemon exited on startup, attempt {attempt + 1}/{self.start_attempts}")
+        raise LibreOfficeError("LibreOffice daemon did not start")
+
+    def launch(self) -> bool:
+        """Starts unoserver on new ports. Returns False, if it exited before listening."""
+        self.port = free_port()
+        cmd = [
+            "unoserver",
+            "--interface",
+            "127.0.0.1",
+            "--port",
+            str(self.port),
+            "--uno-interface",
+            "127.0.0.1",
+            "--uno-port",
+            str(free_port()),
+            "--user-installation",
+            f"file://{self.profile}",
+        ]
+        logger.info(f"Starting LibreOffice daemon on port {self.port}")
+        # unoserver and its LibreOffice get a process group of their own, which is killed as a whole on `stop`
+        self.process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env={**os.environ, "HOME": self.profile},
+            start_new_session=True,
+        )
+
+        # unoserver listens, once it is connected to LibreOffice, which takes some seconds
+        deadline = time.monotonic() + self.startup_timeout
+        while not self.healthy():
+            if self.process.poll() is not None:
+                self.stop()
+                return False
+            if time.monotonic() > deadline:
+                self.stop()
+                raise LibreOfficeError("LibreOffice daemon did not start")
+            time.sleep(0.2)
+        return True
+
+    def listening(self) -> bool:
+        try:
+            with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def healthy(self) -> bool:
+        if self.process is None or self.process.poll() is not None:
+            return False
+        return self.listening()
+
+    def convert(self, source_path: str, target_path: str, timeout: float) -> None:
+        # unoserver picks the pdf export filter by the kind of document, which LibreOffice detected on loading
+        cmd = [
+            "unoconvert",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(self.port),
+            "--host-location",
+            "local",
+            source_path,
+            target_path,
+        ]
+        try:
+            subprocess.run(cmd, capture_output=True, check=True, timeout=timeout)
+        except subprocess.TimeoutExpired as e:
+            raise LibreOfficeError(f"LibreOffice did not convert the document within {timeout} seconds") from e
+        except subprocess.CalledProcessError as e:
+            raise LibreOfficeError(f"unoconvert failed with exit code {e.returncode}: {e.stderr!r}") from e
+        if not os.path.exists(target_path):
+            raise LibreOfficeError("LibreOffice did not write the pdf")
+
+    def stop(self) -> None:
+        if self.process is not None:
+            # unoserver stops its LibreOffice instance on SIGTERM, a hanging instance is killed with its group
+            self.signal_group(signal.SIGTERM)
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+            self.signal_group(signal.SIGKILL)
+            self.process.wait()
+        self.process = None
+
+    def signal_group(self, signal_number: int) -> None:
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal_number)
+        except ProcessLookupError:
+            # the whole group has exited already
+            pass
+
+    def restart(self) -> None:
+        self.stop()
+        # a crashed instance might have left a corrupted profile behind
+        shutil.rmtree(self.profile, ignore_errors=True)
+        self.start()
+
+    def close(self) -> None:
+        self.stop()
+        shutil.rmtree(self.profile, ignore_errors=True)
+
+
+class LibreOfficePool:
+    """Hands out LibreOffice daemons to one conversion at a time. Daemons are started on first use."""
+
+    def __init__(self, size: int, timeout: float, startup_timeout: float = 60) -> None:
+        self.size = size
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.lock = Lock()
+        self.daemons: list[LibreOfficeDaemon] = []
+        self.idle: Queue[LibreOfficeDaemon] = Queue()
+
+    @contextmanager
+    def acquire(self) -> Generator[LibreOfficeDaemon, None, None]:
+        daemon = None
+        with self.lock:
+            if self.idle.empty() and len(self.daemons) < self.size:
+                daemon = LibreOfficeDaemon(self.startup_timeout)
+                self.daemons.append(daemon)
+        if daemon is None:
+            daemon = self.idle.get()
+        try:
+            yield daemon
+        finally:
+            self.idle.put(daemon)
+
+    def convert(self, source_path: str, target_path: str) -> None:
+        retries = 1
+        with self.acquire() as daemon:
+            for retry in range(retries + 1):
+                # a failed conversion may have left the instance hanging or in a dialog, even if it still answers
+                if retry > 0 or not daemon.healthy():
+                    if daemon.process is not None:
+                        logger.warning(f"Restarting LibreOffice daemon on port {daemon.port}")
+                    daemon.restart()
+
+                try:
+                    daemon.convert(source_path, target_path, self.timeout)
+                    return
+                except Exception as e:
+                    if retry == retries:
+                        # the next conversion gets a fresh instance
+                        daemon.stop()
+                        raise LibreOfficeError(f"LibreOffice failed to convert the document: {e!r}") from e
+                    logger.warning(f"LibreOffice failed to convert the document, retry {retry + 1}/{retries}: {e!r}")
+
+    def shutdown(self) -> None:
+        with self.lock:
+            for daemon in self.daemons:
+                daemon.close()
+            self.daemons = []
+            self.idle = Queue()
+
+
+_libre_office_pool: LibreOfficePool | None = None
+_libre_office_pool_lock = Lock()
+
+
+def libre_office_pool_size(config: Config) -> int:
+    # the conversions run in the threads of the workers, so there are never more at the same time
+    if config.libre_office_pool_size is None:
+        return config.workers + config.interactive_workers
+    return config.libre_office_pool_size
+
+
+def get_libre_office_pool(config: Config) -> LibreOfficePool | None:
+    """The pool of the main process, or None if documents should be converted by a new `soffice` process each.
+
+    The worker processes do not start daemons, since they are recycled or killed without cleaning up.
+    """
+    global _libre_office_pool
+
+    size = libre_office_pool_size(config)
+    if size == 0 or in_worker_process():
+        return None
+    if not UNOSERVER_AVAILABLE:
+        logger.debug("unoserver is not installed, converting with the soffice cli")
+        return None
+
+    with _libre_office_pool_lock:
+        if _libre_office_pool is None:
+            _libre_office_pool = LibreOfficePool(size, config.libre_office_timeout)
+            # the daemons must not outlive the service, even if the lifespan did not shut them down
+            atexit.register(shutdown_libre_office_pool)
+        return _libre_office_pool
+
+
+def shutdown_libre_office_pool() -> None:
+    global _libre_office_pool
+
+    with _libre_office_pool_lock:
+        if _libre_office_pool is not None:
+            _libre_office_pool.shutdown()
+            _libre_office_pool = None
+            logger.info("Stopped LibreOffice daemons")
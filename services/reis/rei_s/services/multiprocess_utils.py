@@ -1,45 +1,340 @@
+from collections import deque
+from dataclasses import dataclass
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import importlib
+from itertools import batched, islice
 import logging
 import multiprocessing as mp
+from multiprocessing.managers import SyncManager
+from queue import Empty, Full, Queue
+import resource
+from threading import Event, Lock, Thread
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, TypeVar, cast
 
+from rei_s import logger
+from rei_s.config import Config
 from rei_s.logger_formatter import JsonFormatter
-from rei_s.services.formats.abstract_format_provider import AbstractFormatProvider
-from rei_s.types.source_file import SourceFile
+
+if TYPE_CHECKING:
+    # importing these at runtime would lead to a circular import via `rei_s.utils`
+    from langchain_core.documents import Document
+
+    from rei_s.services.formats.abstract_format_provider import AbstractFormatProvider
+    from rei_s.types.source_file import SourceFile
+
+
+T = TypeVar("T")
+
+# modules which are expensive to import and are needed by nearly every task
+# the workers import them once on startup, such that the first task does not pay for it
+WARM_UP_MODULES = ["rei_s.services.formats"]
+
+# set in the worker processes, such that tasks do not submit tasks to the pool they are running in
+_in_worker_process = False
 
 
 def init_subprocess_logger() -> None:
     """For initilizing the logging format in newly spawned processes"""
-    logger = logging.getLogger("root")
+    root_logger = logging.getLogger("root")
 
-    logger.setLevel("INFO")
+    root_logger.setLevel("INFO")
     handler = logging.StreamHandler()
     handler.setFormatter(JsonFormatter())
-    logger.addHandler(handler)
+    root_logger.addHandler(handler)
+
+
+def init_worker_process() -> None:
+    global _in_worker_process
+
+    _in_worker_process = True
+    init_subprocess_logger()
+    for module in WARM_UP_MODULES:
+        importlib.import_module(module)
+
+
+def in_worker_process() -> bool:
+    return _in_worker_process
+
+
+def peak_memory() -> int:
+    """The high-water mark of the resident memory of the current process in bytes."""
+    # on linux `ru_maxrss` is given in kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class TaskMeasurement:
+    """Measured by the worker, while it ran a task."""
+
+    peak_memory: int
+    cpu_time: float
+    # the wall clock is shared with the process, which submitted the task
+    started: float
+    finished: float
+
+
+def run_and_measure(fn: Callable[..., T], *args: Any) -> tuple[T, TaskMeasurement]:
+    started = time.time()
+    start = time.process_time()
+    result = fn(*args)
+    cpu_time = time.process_time() - start
+    return result, TaskMeasurement(peak_memory(), cpu_time, started, time.time())
+
+
+def noop() -> None:
+    pass
+
+
+def stream_to_queue(queue: "Queue[Any]", cancelled: Event, fn: Callable[..., Iterable[Any]], *args: Any) -> None:
+    for item in fn(*args):
+        # the consumer might stop reading, e.g. on an error, so we do not block forever on a full queue
+        while True:
+            if cancelled.is_set():
+                return
+            try:
+                queue.put(item, timeout=1)
+                break
+            except Full:
+                pass
 
 
 def process_file_in_process(
-    format_: AbstractFormatProvider,
-    file: SourceFile,
+    format_: "AbstractFormatProvider",
+    file: "SourceFile",
+    chunk_size: int | None,
+) -> "list[Document]":
+    return format_.process_file(file, chunk_size)
+
+
+def iter_chunks_in_process(
+    format_: "AbstractFormatProvider",
+    file: "SourceFile",
     chunk_size: int | None,
-    queue: mp.Queue,
-) -> None:
-    try:
-        init_subprocess_logger()
-        chunks = format_.process_file(file, chunk_size)
-    except Exception as e:
-        queue.put(e)
-    else:
-        queue.put(chunks)
+    batch_size: int,
+) -> "Iterator[list[Document]]":
+    # the chunks are sent in batches to reduce the overhead of the inter-process communication
+    for batch in batched(format_.iter_chunks(file, chunk_size), batch_size):
+        yield list(batch)
 
 
 def convert_file_in_process(
-    format_: AbstractFormatProvider,
-    file: SourceFile,
-    queue: mp.Queue,
-) -> None:
-    try:
-        init_subprocess_logger()
-        chunks = format_.convert_file_to_pdf(file)
-    except Exception as e:
-        queue.put(e)
-    else:
-        queue.put(chunks)
+    format_: "AbstractFormatProvider",
+    file: "SourceFile",
+) -> "SourceFile":
+    return format_.convert_file_to_pdf(file)
+
+
+class WorkerPool:
+    """A size-bounded pool of long-lived, pre-warmed worker processes.
+
+    Workers are recycled after `max_tasks` tasks. If a worker reports a memory high-water mark above `max_memory`,
+    the whole generation of workers is retired after finishing its running tasks, such that the RAM is handed
+    back to the operating system.
+    """
+
+    # number of items a streaming task may produce ahead of the consumer
+    stream_buffer: int = 4
+    # number of tasks per worker, which `map` submits ahead of the consumer
+    map_window: int = 2
+
+    def __init__(self, size: int, max_tasks: int, max_memory: int) -> None:
+        self.size = size
+        self.max_tasks = max_tasks
+        self.max_memory = max_memory
+        self.lock = Lock()
+        self.executor = self.new_executor()
+        # the tasks, which are queued or running, of all generations
+        self.in_flight = 0
+        # the manager provides the queues of streaming tasks, it is only started when needed
+        self.manager: SyncManager | None = None
+
+    def new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=mp.get_context("spawn"),
+            initializer=init_worker_process,
+            max_tasks_per_child=self.max_tasks,
+        )
+
+    def retire(self, executor: ProcessPoolExecutor) -> None:
+        with self.lock:
+            # another thread might have retired this generation already
+            if executor is not self.executor:
+                return
+            self.executor = self.new_executor()
+        # running and queued tasks of the old generation are still finished
+        # we do not use `shutdown(wait=False)`, since it does not play well with `max_tasks_per_child`
+        Thread(target=executor.shutdown, daemon=True).start()
+
+    def warm_up(self) -> None:
+        """Start all workers now instead of on the first large file."""
+        for _ in range(self.size):
+            self.executor.submit(noop)
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> tuple[ProcessPoolExecutor, Future[Any]]:
+        with self.lock:
+            executor = self.executor
+        try:
+            future = executor.submit(fn, *args)
+        except RuntimeError:
+            # this generation has been retired concurrently, so we use the next one
+            if executor is self.executor:
+                raise
+            return self.submit(fn, *args)
+
+        with self.lock:
+            self.in_flight += 1
+        future.add_done_callback(self.task_done)
+        return executor, future
+
+    def task_done(self, _future: Future[Any]) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+    def has_idle_worker(self) -> bool:
+        with self.lock:
+            return self.in_flight < self.size
+
+    def wait(self, executor: ProcessPoolExecutor, future: Future[Any]) -> tuple[Any, TaskMeasurement]:
+        try:
+            result, measurement = future.result()
+        except BrokenProcessPool:
+            # a worker was killed (e.g. by the OOM killer), this generation can not be used anymore
+            logger.warning("Worker process died unexpectedly, starting new workers")
+            self.retire(executor)
+            raise
+
+        if measurement.peak_memory > self.max_memory:
+            logger.info(f"Worker used {measurement.peak_memory} bytes of memory, recycling workers")
+            self.retire(executor)
+
+        return result, measurement
+
+    def run(
+        self,
+        fn: Callable[..., T],
+        *args: Any,
+        on_cpu_time: Callable[[float], None] | None = None,
+        on_overhead: Callable[[float], None] | None = None,
+    ) -> T:
+        """Runs the task in a worker, `on_cpu_time` is called with the cpu time, which the worker spent on it.
+
+        `on_overhead` is called with the time it took to hand the task to the worker and its result back. It is not
+        called, if the task had to wait for a free worker, since this time depends on the other tasks.
+        """
+        idle = self.has_idle_worker()
+        submitted = time.time()
+        executor, future = self.submit(run_and_measure, fn, *args)
+        result, measurement = self.wait(executor, future)
+
+        if on_cpu_time is not None:
+            on_cpu_time(measurement.cpu_time)
+        if on_overhead is not None and idle:
+            on_overhead(max(0.0, time.time() - submitted - (measurement.finished - measurement.started)))
+        return cast(T, result)
+
+    def map(self, fn: Callable[..., T], args: Iterable[tuple[Any, ...]]) -> Iterator[T]:
+        """Runs the tasks in parallel and yields their results in order.
+
+        At most `map_window` tasks per worker are submitted ahead of the consumer, such that a large file does not
+        queue all of its tasks at once, nor hold all of their results in memory.
+        """
+        remaining = iter(args)
+        tasks: deque[tuple[ProcessPoolExecutor, Future[Any]]] = deque()
+        try:
+            for task_args in islice(remaining, self.size * self.map_window):
+                tasks.append(self.submit(run_and_measure, fn, *task_args))
+            while tasks:
+                executor, future = tasks.popleft()
+                result, _ = self.wait(executor, future)
+                for task_args in islice(remaining, 1):
+                    tasks.append(self.submit(run_and_measure, fn, *task_args))
+                yield result
+        finally:
+            # on failure, the remaining tasks are not needed anymore
+            for _, future in tasks:
+                future.cancel()
+
+    def stream(
+        self, fn: Callable[..., Iterable[T]], *args: Any, on_cpu_time: Callable[[float], None] | None = None
+    ) -> Iterator[T]:
+        """Runs a generator function in a worker and yields its items, while the worker is still producing them."""
+        manager = self.get_manager()
+        queue = manager.Queue(maxsize=self.stream_buffer)
+        cancelled = manager.Event()
+
+        executor, future = self.submit(run_and_measure, stream_to_queue, queue, cancelled, fn, *args)
+        try:
+            while True:
+                try:
+                    item = queue.get(timeout=0.1)
+                except Empty:
+                    # once the task is done, all of its items are in the queue
+                    if future.done() and queue.empty():
+                        break
+                    continue
+                yield item
+        finally:
+            # stops the worker, if the consumer did not read all items
+            cancelled.set()
+
+        _, measurement = self.wait(executor, future)
+        if on_cpu_time is not None:
+            on_cpu_time(measurement.cpu_time)
+
+    def get_manager(self) -> SyncManager:
+        with self.lock:
+            if self.manager is None:
+                self.manager = mp.get_context("spawn").Manager()
+            return self.manager
+
+    def shutdown(self) -> None:
+        with self.lock:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            if self.manager is not None:
+                self.manager.shutdown()
+                self.manager = None
+
+
+_worker_pool: WorkerPool | None = None
+_worker_pool_lock = Lock()
+
+
+def uses_worker_pool(config: Config, size: int) -> bool:
+    """Whether the cpu-bound work on a file of `size` bytes is offloaded to the worker pool."""
+    if config.executor_type == "thread":
+        return False
+    return config.executor_type == "process" or size >= config.filesize_threshold
+
+
+def worker_pool_size(config: Config) -> int:
+    """The number of worker processes, by default one per worker and interactive worker."""
+    return config.worker_pool_size or config.workers + config.interactive_workers
+
+
+def get_worker_pool(config: Config) -> WorkerPool:
+    global _worker_pool
+
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            size = worker_pool_size(config)
+            _worker_pool = WorkerPool(size, config.worker_pool_max_tasks, config.worker_pool_max_memory)
+            logger.info(f"Started worker pool with {size} processes")
+        return _worker_pool
+
+
+def start_worker_pool(config: Config) -> None:
+    if config.executor_type != "thread":
+        get_worker_pool(config).warm_up()
+
+
+def shutdown_worker_pool() -> None:
+    global _worker_pool
+
+    with _worker_pool_lock:
+        if _worker_pool is not None:
+            _worker_pool.shutdown()
+            _worker_pool = None
+            logger.info("Stopped worker pool")
@@ -1,16 +1,31 @@
-import multiprocessing as mp
-from typing import Any, Generator, List
+import asyncio
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import batched
+import time
+from typing import Any, Callable, Generator, Iterable, Iterator, List, Literal
 from math import ceil
+from uuid import uuid4
 
 from fastapi import HTTPException
 from langchain_core.documents import Document
 
 from rei_s import logger
-from rei_s.services.filestore_adapter import FileStoreAdapter
+from rei_s.services.filestore_adapter import DocumentStream, FileStoreAdapter
 from rei_s.services.formats.utils import ProcessingError
-from rei_s.services.multiprocess_utils import convert_file_in_process, process_file_in_process
+from rei_s.services.multiprocess_utils import (
+    convert_file_in_process,
+    get_worker_pool,
+    iter_chunks_in_process,
+    process_file_in_process,
+    uses_worker_pool,
+)
+from rei_s.services.cost_model import get_cost_model, measure_thread_time
 from rei_s.services.embeddings_provider import get_embeddings
 from rei_s.config import Config
+from rei_s.services.ttl_cache import TTLCache
 from rei_s.services.vectorstore_adapter import VectorStoreAdapter, VectorStoreFilter
 from rei_s.services import filestore_provider
 from rei_s.services import vectorstore_provider
@@ -21,9 +36,18 @@ from rei_s.services.formats import get_format_provider_mappings, get_format_prov
 from rei_s.metrics.metrics import files_processed_counter
 
 
-def batched(iterable: List[Document], n: int) -> Generator[List[Document], None, None]:
-    for i in range(0, len(iterable), n):
-        yield iterable[i : i + n]
+# number of chunks, which are passed at once from a worker process streaming a large file
+STREAM_BATCH_SIZE = 100
+
+# called with the number of stored chunks and the total number of chunks (None while a streamed file is parsed)
+ProgressCallback = Callable[[int, int | None], None]
+# called with the ids of every batch of chunks, before it is written to the vector store
+ChunkIdsCallback = Callable[[List[str]], None]
+
+
+def progress(index: int, num_batches: int | None) -> str:
+    # the number of batches is unknown, while the file is still parsed
+    return f"({index + 1}/{num_batches if num_batches is not None else '?'})"
 
 
 def get_vector_store(
@@ -47,6 +71,47 @@ def get_file_store(
     return file_store
 
 
+# remembers for a short time, whether the pdf of a document is in the file store
+# the entries are dropped when the document is added or deleted by this process
+@lru_cache
+def get_file_exists_cache(config: Config) -> TTLCache[str, bool] | None:
+    if config.file_exists_cache_ttl == 0:
+        return None
+
+    return TTLCache(maxsize=config.file_exists_cache_size, ttl=config.file_exists_cache_ttl)
+
+
+def forget_file_exists(config: Config, doc_id: str) -> None:
+    cache = get_file_exists_cache(config)
+    if cache is not None:
+        cache.delete(doc_id)
+
+
+def get_cached_file_exists(config: Config, doc_ids: Iterable[str]) -> tuple[dict[str, bool], list[str]]:
+    """Returns the cached existence of the documents and the ids, which need to be checked in the file store."""
+    cache = get_file_exists_cache(config)
+    if cache is None:
+        return {}, list(doc_ids)
+
+    exists: dict[str, bool] = {}
+    missing: list[str] = []
+    for doc_id in doc_ids:
+        found = cache.get(doc_id)
+        if found is None:
+            missing.append(doc_id)
+        else:
+            exists[doc_id] = found
+
+    return exists, missing
+
+
+def set_cached_file_exists(config: Config, exists: dict[str, bool]) -> None:
+    cache = get_file_exists_cache(config)
+    if cache is not None:
+        for doc_id, found in exists.items():
+            cache.set(doc_id, found)
+
+
 def get_file_name_extensions(config: Config) -> list[str]:
     file_name_extensions: list[str] = []
     for format_provider in get_format_providers(config):
@@ -68,98 +133,150 @@ def process_file(config: Config, file: SourceFile, chunk_size: int | None = None
     return chunks_with_metadata
 
 
-def process_and_add_file(config: Config, file: SourceFile, bucket: str, index_name: str | None) -> bool:
+def process_and_add_file(
+    config: Config,
+    file: SourceFile,
+    bucket: str,
+    index_name: str | None,
+    on_progress: ProgressCallback | None = None,
+    on_chunk_ids: ChunkIdsCallback | None = None,
+) -> bool:
     logger.info(f"Processing and add file: {file.id}")
-    add_file(config, file, bucket, file.id, index_name)
+    add_file(config, file, bucket, file.id, index_name, on_progress, on_chunk_ids)
     files_processed_counter.inc()
     logger.info(f"Completed file: {file.id}")
     return True
 
 
+def chunking_mode(
+    config: Config, format_: AbstractFormatProvider, file: SourceFile
+) -> Literal["thread", "process", "distributed"]:
+    """Where the file is chunked: in this thread, in a worker or distributed to the worker pool by the provider."""
+    if not format_.may_start_separate_process_for_chunking:
+        return "thread"
+    if uses_worker_pool(config, file.size) and format_.distributes_to_worker_pool(file):
+        return "distributed"
+    if config.executor_type == "adaptive":
+        offload = get_cost_model(config).prefers_worker_pool(format_.name, file.size)
+    else:
+        offload = uses_worker_pool(config, file.size)
+    return "process" if offload else "thread"
+
+
 def process_file_synchronously(
-    format_: AbstractFormatProvider, file: SourceFile, chunk_size: int | None, threshold: int = 10**5
+    config: Config, format_: AbstractFormatProvider, file: SourceFile, chunk_size: int | None
 ) -> List[Document]:
     # this function tries to optimize for performance,
     # since the process step is the single CPU intensive part
-    # * small files are processed in the same thread to avoid overhead of starting a new process,
-    #   pickling, copying and unpickling the file
-    # * large files will start a new process to avoid the GIL
-    #   this will also lead python to release the RAM used for the processing back to the operating system
-
-    if not format_.may_start_separate_process_for_chunking or file.size < threshold:
+    # * small files are processed in the same thread to avoid overhead of pickling, copying and unpickling the file
+    # * large files are processed in a pre-warmed worker process to avoid the GIL
+    #   with `EXECUTOR_TYPE=process` all files are, with `thread` none
+    #   the workers are recycled regularly, which leads python to release the RAM back to the operating system
+    # * providers which distribute a file to the worker pool themselves are called in the same thread
+    # with `EXECUTOR_TYPE=adaptive` the measured cpu time per byte of the provider decides instead of the size
+
+    mode = chunking_mode(config, format_, file)
+    if mode == "distributed":
         return format_.process_file(file, chunk_size)
-    else:
-        ctx = mp.get_context("spawn")
-        queue = ctx.Queue()
-        process = ctx.Process(target=process_file_in_process, args=(format_, file, chunk_size, queue))
 
-        process.start()
-        chunks_or_exception = queue.get()
-        process.join()
+    cost_model = get_cost_model(config)
+    predicted = cost_model.predict(format_.name, file.size)
+    if mode == "thread":
+        start = time.thread_time()
+        chunks = format_.process_file(file, chunk_size)
+        cost_model.record(format_.name, mode, file.size, time.thread_time() - start, predicted)
+        return chunks
 
-        if isinstance(chunks_or_exception, Exception):
-            raise chunks_or_exception
-        else:
-            chunks: list[Document] = chunks_or_exception
+    def on_cpu_time(cpu_time: float) -> None:
+        cost_model.record(format_.name, "process", file.size, cpu_time, predicted)
 
-        return chunks
+    return get_worker_pool(config).run(
+        process_file_in_process,
+        format_,
+        file,
+        chunk_size,
+        on_cpu_time=on_cpu_time,
+        on_overhead=cost_model.record_overhead,
+    )
 
 
-def convert_file_synchronously(format_: AbstractFormatProvider, file: SourceFile, threshold: int = 10**5) -> SourceFile:
-    # this function tries to optimize for performance,
-    # since the process step is the single CPU intensive part
-    # * small files are processed in the same thread to avoid overhead of starting a new process,
-    #   pickling, copying and unpickling the file
-    # * large files will start a new process to avoid the GIL
-    #   this will also lead python to release the RAM used for the processing back to the operating system
+def iter_file_chunks_synchronously(
+    config: Config, format_: AbstractFormatProvider, file: SourceFile, chunk_size: int | None
+) -> Iterator[Document]:
+    # see `process_file_synchronously`, but the chunks are passed on while the file is still parsed
+    # the overhead of the worker pool is not measured here, since the consumer slows down the stream
+    mode = chunking_mode(config, format_, file)
+    if mode == "distributed":
+        yield from format_.iter_chunks(file, chunk_size)
+        return
 
-    if not format_.may_start_separate_process_for_converting or file.size < threshold:
-        return format_.convert_file_to_pdf(file)
-    else:
-        ctx = mp.get_context("spawn")
-        queue = ctx.Queue()
-        process = ctx.Process(target=convert_file_in_process, args=(format_, file, queue))
+    cost_model = get_cost_model(config)
+    predicted = cost_model.predict(format_.name, file.size)
 
-        process.start()
-        file_or_exception = queue.get()
-        process.join()
+    def on_cpu_time(cpu_time: float) -> None:
+        cost_model.record(format_.name, "thread" if mode == "thread" else "process", file.size, cpu_time, predicted)
 
-        if isinstance(file_or_exception, Exception):
-            raise file_or_exception
-        else:
-            pdf: SourceFile = file_or_exception
+    if mode == "thread":
+        yield from measure_thread_time(format_.iter_chunks(file, chunk_size), on_cpu_time)
+    else:
+        batch_size = config.batch_size or STREAM_BATCH_SIZE
+        for batch in get_worker_pool(config).stream(
+            iter_chunks_in_process, format_, file, chunk_size, batch_size, on_cpu_time=on_cpu_time
+        ):
+            yield from batch
 
-        return pdf
+
+def convert_file_synchronously(config: Config, format_: AbstractFormatProvider, file: SourceFile) -> SourceFile:
+    # see `process_file_synchronously`
+    if not format_.may_start_separate_process_for_converting or not uses_worker_pool(config, file.size):
+        return format_.convert_file_to_pdf(file)
+    else:
+        return get_worker_pool(config).run(convert_file_in_process, format_, file)
 
 
 def generate_batches(
     config: Config,
     file: SourceFile,
-    chunks: list[Document],
+    chunks: Iterable[Document],
     format_: AbstractFormatProvider,
     bucket: str | None = None,
     doc_id: str | None = None,
-) -> Generator[tuple[List[Document], int, int], None, None]:
-    if len(chunks) > 0:
+) -> Generator[tuple[List[Document], int, int | None], None, None]:
+    """Adds the metadata to the chunks and groups them into batches.
+
+    If the chunks are streamed (i.e., not a list), the batches are yielded as soon as they are full,
+    but the number of batches is unknown (None).
+    Every chunk gets a new id, such that the chunks of a failed attempt can be removed without touching those of a
+    previously stored version of the document.
+    """
+    if isinstance(chunks, list):
+        if len(chunks) == 0:
+            return
         batch_size = config.batch_size if config.batch_size else len(chunks)
-        num_batches = ceil(len(chunks) / batch_size)
-        for index, chunk_batch in enumerate(batched(chunks, batch_size)):
-            with_metadata = [
-                Document(
-                    page_content=x.page_content,
-                    metadata={
-                        **x.metadata,
-                        "format": format_.name,
-                        "mime_type": file.mime_type,
-                        "doc_id": doc_id,
-                        "bucket": bucket,
-                        "source": file.file_name,
-                    },
-                )
-                for x in chunk_batch
-            ]
-
-            yield with_metadata, index, num_batches
+        num_batches: int | None = ceil(len(chunks) / batch_size)
+    else:
+        # a single batch would wait for the whole file
+        batch_size = config.batch_size if config.batch_size else STREAM_BATCH_SIZE
+        num_batches = None
+
+    for index, chunk_batch in enumerate(batched(chunks, batch_size)):
+        with_metadata = [
+            Document(
+                id=str(uuid4()),
+                page_content=x.page_content,
+                metadata={
+                    **x.metadata,
+                    "format": format_.name,
+                    "mime_type": file.mime_type,
+                    "doc_id": doc_id,
+                    "bucket": bucket,
+                    "source": file.file_name,
+                },
+            )
+            for x in chunk_batch
+        ]
+
+        yield with_metadata, index, num_batches
 
     return
 
@@ -171,15 +288,10 @@ def find_format_provider(config: Config, file: SourceFile) -> AbstractFormatProv
     raise HTTPException(status_code=415, detail="File format not supported.")
 
 
-def process_file_into_chunks(
-    config: Config,
-    file: SourceFile,
-    format_: AbstractFormatProvider,
-    doc_id: str | None = None,
-    chunk_size: int | None = None,
-) -> list[Document]:
+@contextmanager
+def processing_errors(doc_id: str | None) -> Generator[None, None, None]:
     try:
-        chunks = process_file_synchronously(format_, file, chunk_size, config.filesize_threshold)
+        yield
     except ProcessingError as e:
         logger.warning(f"Failed processing file `{doc_id}`: {e.message}")
         raise HTTPException(status_code=e.status, detail=f"Processing failed: {e.message}") from e
@@ -188,7 +300,29 @@ def process_file_into_chunks(
         # yield individual errors from special exception classes to ValueError
         logger.warning(f"Failed processing file `{doc_id}`: {e!r}")
         raise HTTPException(status_code=400, detail="Processing failed") from e
-    return chunks
+
+
+def process_file_into_chunks(
+    config: Config,
+    file: SourceFile,
+    format_: AbstractFormatProvider,
+    doc_id: str | None = None,
+    chunk_size: int | None = None,
+) -> list[Document]:
+    with processing_errors(doc_id):
+        return process_file_synchronously(config, format_, file, chunk_size)
+
+
+def iter_file_into_chunks(
+    config: Config,
+    file: SourceFile,
+    format_: AbstractFormatProvider,
+    doc_id: str | None = None,
+    chunk_size: int | None = None,
+) -> Iterator[Document]:
+    # errors are raised while iterating, i.e., possibly after the first chunks have been stored
+    with processing_errors(doc_id):
+        yield from iter_file_chunks_synchronously(config, format_, file, chunk_size)
 
 
 def convert_file_to_pdf(
@@ -198,7 +332,7 @@ def convert_file_to_pdf(
     doc_id: str | None = None,
 ) -> SourceFile:
     try:
-        pdf = convert_file_synchronously(format_, file, config.filesize_threshold)
+        pdf = convert_file_synchronously(config, format_, file)
     except ProcessingError as e:
         logger.warning(f"Failed converting file `{doc_id}`: {e.message}")
         raise HTTPException(status_code=e.status, detail=f"Conversion failed: {e.message}") from e
@@ -210,30 +344,187 @@ def convert_file_to_pdf(
     return pdf
 
 
-def add_file(config: Config, file: SourceFile, bucket: str, doc_id: str, index_name: str | None = None) -> None:
-    file_store = get_file_store(config=config)
-
+def save_pdf_preview(
+    config: Config, file_store: FileStoreAdapter, file: SourceFile, format_: AbstractFormatProvider, doc_id: str
+) -> None:
+    pdf_preview = convert_file_to_pdf(config, file, format_, doc_id)
+    logger.info(f"converted doc_id {doc_id} to pdf")
+    try:
+        file_store.add_document(pdf_preview)
+        logger.info(f"saved pdf for doc_id {doc_id}")
+    finally:
+        pdf_preview.delete()
+
+
+def add_batches(
+    vector_store: VectorStoreAdapter,
+    batches: Iterable[tuple[List[Document], int, int | None]],
+    doc_id: str,
+    executor: Executor,
+    concurrency: int = 1,
+    preview: Future[None] | None = None,
+    on_written: Callable[[List[Document]], None] | None = None,
+) -> None:
+    # up to `concurrency` batches are embedded in the executor, while the oldest batch is written to the vector store
+    # the embeddings are network bound, so this does not need a separate process
+    # batches are written in order, such that the first failure stops all following batches
+    pending: deque[tuple[List[Document], int, int | None, Future[list[list[float]]]]] = deque()
+    try:
+        for batch, index, num_batches in batches:
+            logger.info(f"add {len(batch)} chunks for doc_id {doc_id}: {progress(index, num_batches)}")
+            pending.append((batch, index, num_batches, executor.submit(vector_store.embed_documents, batch)))
+
+            if len(pending) > concurrency:
+                write_batch(vector_store, *pending.popleft(), doc_id, on_written)
+
+            # do not continue to embed chunks of a file, whose preview failed
+            if preview is not None and preview.done() and preview.exception() is not None:
+                break
+
+        while pending:
+            write_batch(vector_store, *pending.popleft(), doc_id, on_written)
+    finally:
+        # on failure, we do not need to embed the remaining batches
+        for *_, embedding in pending:
+            embedding.cancel()
+
+
+def write_batch(
+    vector_store: VectorStoreAdapter,
+    batch: List[Document],
+    index: int,
+    num_batches: int | None,
+    embedding: Future[list[list[float]]],
+    doc_id: str,
+    on_written: Callable[[List[Document]], None] | None = None,
+) -> None:
+    vector_store.add_documents(batch, embedding.result())
+    logger.info(f"ready with {len(batch)} chunks for doc_id {doc_id}: {progress(index, num_batches)}")
+    if on_written is not None:
+        on_written(batch)
+
+
+def add_file(
+    config: Config,
+    file: SourceFile,
+    bucket: str,
+    doc_id: str,
+    index_name: str | None = None,
+    on_progress: ProgressCallback | None = None,
+    on_chunk_ids: ChunkIdsCallback | None = None,
+) -> None:
     format_ = find_format_provider(config, file)
     logger.info(f"start adding doc_id {doc_id} with format {format_.name}")
 
-    chunks = process_file_into_chunks(config, file, format_, doc_id)
-    logger.info(f"chunked doc_id {doc_id} into {len(chunks)} chunks")
+    # the chunking and the preview share their intermediate results, e.g. office files are converted to pdf once
+    try:
+        with file.artifacts():
+            add_file_with_format(config, file, format_, bucket, doc_id, index_name, on_progress, on_chunk_ids)
+    finally:
+        # the cache is per process, so it is invalidated here, in the process which serves the searches, and not where
+        # the preview is generated
+        forget_file_exists(config, doc_id)
 
-    file_store = get_file_store(config=config)
-    if file_store:
-        pdf_preview = convert_file_to_pdf(config, file, format_, doc_id)
-        logger.info(f"converted doc_id {doc_id} to pdf")
-        try:
-            file_store.add_document(pdf_preview)
-            logger.info(f"saved pdf for doc_id {doc_id}")
-        finally:
-            pdf_preview.delete()
 
+def add_file_with_format(
+    config: Config,
+    file: SourceFile,
+    format_: AbstractFormatProvider,
+    bucket: str,
+    doc_id: str,
+    index_name: str | None = None,
+    on_progress: ProgressCallback | None = None,
+    on_chunk_ids: ChunkIdsCallback | None = None,
+) -> None:
+    chunks: Iterable[Document]
+    total: int | None = None
+    if format_.streams_chunks:
+        # the first batches are embedded and stored, while the rest of the file is still parsed
+        chunks = iter_file_into_chunks(config, file, format_, doc_id)
+    else:
+        chunks = process_file_into_chunks(config, file, format_, doc_id)
+        total = len(chunks)
+        logger.info(f"chunked doc_id {doc_id} into {len(chunks)} chunks")
+
+    file_store = get_file_store(config=config)
     vector_store = get_vector_store(config=config, index_name=index_name)
-    for batch, index, num_batches in generate_batches(config, file, chunks, format_, bucket, doc_id):
-        logger.info(f"add {len(batch)} chunks for doc_id {doc_id}: ({index + 1}/{num_batches})")
-        vector_store.add_documents(batch)
-        logger.info(f"ready with {len(batch)} chunks for doc_id {doc_id}: ({index + 1}/{num_batches})")
+    batches = generate_batches(config, file, chunks, format_, bucket, doc_id)
+    if on_chunk_ids is not None:
+        batches = report_chunk_ids(batches, on_chunk_ids)
+
+    written: list[str] = []
+
+    def on_written(batch: List[Document]) -> None:
+        written.extend(doc.id for doc in batch if doc.id is not None)
+        if on_progress is not None:
+            on_progress(len(written), total)
+
+    try:
+        add_file_batches(config, file_store, vector_store, file, format_, batches, doc_id, on_written)
+        if on_progress is not None:
+            on_progress(len(written), len(written))
+    except Exception:
+        # do not leave the chunks of a partially parsed file behind, nor those written before the preview or a later
+        # batch failed
+        # only the chunks of this attempt are removed, a previously stored version of the document stays searchable
+        remove_partial_file(vector_store, doc_id, written)
+        raise
+
+
+def add_file_batches(
+    config: Config,
+    file_store: FileStoreAdapter | None,
+    vector_store: VectorStoreAdapter,
+    file: SourceFile,
+    format_: AbstractFormatProvider,
+    batches: Iterable[tuple[List[Document], int, int | None]],
+    doc_id: str,
+    on_written: Callable[[List[Document]], None] | None = None,
+) -> None:
+    if not config.pipelined_ingest:
+        if file_store:
+            save_pdf_preview(config, file_store, file, format_, doc_id)
+
+        for batch, index, num_batches in batches:
+            logger.info(f"add {len(batch)} chunks for doc_id {doc_id}: {progress(index, num_batches)}")
+            vector_store.add_documents(batch)
+            logger.info(f"ready with {len(batch)} chunks for doc_id {doc_id}: {progress(index, num_batches)}")
+            if on_written is not None:
+                on_written(batch)
+        return
+
+    # the pdf preview is generated while the chunks are embedded and written to the vector store
+    with ThreadPoolExecutor(max_workers=config.embedding_concurrency + 1) as executor:
+        preview = executor.submit(save_pdf_preview, config, file_store, file, format_, doc_id) if file_store else None
+        add_batches(vector_store, batches, doc_id, executor, config.embedding_concurrency, preview, on_written)
+        if preview is not None:
+            preview.result()
+
+
+def report_chunk_ids(
+    batches: Iterable[tuple[List[Document], int, int | None]], on_chunk_ids: ChunkIdsCallback
+) -> Generator[tuple[List[Document], int, int | None], None, None]:
+    # the ids are reported before the batch is embedded, such that a crash while writing it does not leave
+    # unknown chunks behind
+    for batch, index, num_batches in batches:
+        on_chunk_ids([doc.id for doc in batch if doc.id is not None])
+        yield batch, index, num_batches
+
+
+def remove_chunks(config: Config, doc_id: str, ids: List[str], index_name: str | None = None) -> None:
+    """Removes the chunks of an interrupted ingest, without touching a previously stored version of the document."""
+    if ids:
+        remove_partial_file(get_vector_store(config=config, index_name=index_name), doc_id, ids)
+
+
+def remove_partial_file(vector_store: VectorStoreAdapter, doc_id: str, ids: List[str]) -> None:
+    if not ids:
+        return
+    try:
+        vector_store.delete_chunks(ids)
+        logger.info(f"removed partially added chunks of doc_id {doc_id}")
+    except Exception as e:
+        logger.warning(f"Failed removing partially added chunks of doc_id {doc_id}: {e!r}")
 
 
 def search(
@@ -251,6 +542,29 @@ def search(
 
     docs = vector_store.similarity_search(query, take, store_filter)
 
+    return clean_up_search_results(config, docs)
+
+
+async def asearch(
+    config: Config,
+    query: str,
+    bucket: str | None,
+    take: int,
+    doc_ids: List[str] | None = None,
+    index_name: str | None = None,
+) -> List[Document]:
+    # creating the vector store might need to talk to the store, so this is done in a thread
+    vector_store = await asyncio.to_thread(get_vector_store, config=config, index_name=index_name)
+    store_filter = VectorStoreFilter(bucket=bucket, doc_ids=doc_ids)
+
+    logger.info("start similarity search")
+
+    docs = await vector_store.asimilarity_search(query, take, store_filter)
+
+    return clean_up_search_results(config, docs)
+
+
+def clean_up_search_results(config: Config, docs: List[Document]) -> List[Document]:
     # remove bucket before passing it back
     # also call possibly existing cleanup methods for the format
     result: List[Document] = []
@@ -295,6 +609,17 @@ def get_document_pdf(config: Config, doc_id: str) -> SourceFile | None:
     return file_store.get_document(doc_id)
 
 
+def stream_document_pdf(
+    config: Config, doc_id: str, byte_range: str | None = None, if_none_match: str | None = None
+) -> DocumentStream | None:
+    file_store = get_file_store(config=config)
+    if file_store is None:
+        return None
+
+    logger.info(f"stream file: {doc_id}")
+    return file_store.stream_document(doc_id, byte_range, if_none_match)
+
+
 def delete_file(config: Config, doc_id: str, index_name: str | None = None) -> None:
     vector_store = get_vector_store(config=config, index_name=index_name)
     logger.info(f"delete chunks with doc_id '{doc_id}'")
@@ -303,7 +628,10 @@ def delete_file(config: Config, doc_id: str, index_name: str | None = None) -> N
     file_store = get_file_store(config=config)
     if file_store:
         logger.info(f"delete pdf for doc_id '{doc_id}'")
-        file_store.delete(doc_id)
+        try:
+            file_store.delete(doc_id)
+        finally:
+            forget_file_exists(config, doc_id)
 
 
 def get_file_sources_markdown(results: List[Document]) -> str:
@@ -343,15 +671,41 @@ def get_file_sources(config: Config, results: List[Document]) -> List[SourceDto]
     if not results:
         return []
 
-    length = len(results)
-
     file_store = get_file_store(config=config)
     if file_store:
         doc_ids = {doc.metadata["doc_id"] for doc in results if "doc_id" in doc.metadata}
-        exists = {doc_id: file_store.exists(doc_id) for doc_id in doc_ids}
+        exists, missing = get_cached_file_exists(config, doc_ids)
+        if missing:
+            found = file_store.exists_many(missing)
+            set_cached_file_exists(config, found)
+            exists.update(found)
+    else:
+        exists = {}
+
+    return build_file_sources(results, exists)
+
+
+async def aget_file_sources(config: Config, results: List[Document]) -> List[SourceDto]:
+    if not results:
+        return []
+
+    file_store = await asyncio.to_thread(get_file_store, config=config)
+    if file_store:
+        doc_ids = {doc.metadata["doc_id"] for doc in results if "doc_id" in doc.metadata}
+        exists, missing = get_cached_file_exists(config, doc_ids)
+        if missing:
+            found = await file_store.aexists_many(missing)
+            set_cached_file_exists(config, found)
+            exists.update(found)
     else:
         exists = {}
 
+    return build_file_sources(results, exists)
+
+
+def build_file_sources(results: List[Document], exists: dict[str, bool]) -> List[SourceDto]:
+    length = len(results)
+
     return [
         SourceDto(
             title=doc.metadata.get("source", "Unknown"),
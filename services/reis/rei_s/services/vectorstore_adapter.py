@@ -1,7 +1,9 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import List
 
 from langchain_core.documents import Document
+from langchain_core.embeddings.embeddings import Embeddings
 from pydantic import BaseModel
 
 
@@ -11,20 +13,37 @@ class VectorStoreFilter(BaseModel):
 
 
 class VectorStoreAdapter(ABC):
+    embeddings: Embeddings
+
     @abstractmethod
-    def add_documents(self, documents: list[Document]) -> None:
+    def add_documents(self, documents: list[Document], embeddings: list[list[float]] | None = None) -> None:
+        # if the embeddings are not given, the vector store will generate them
         raise NotImplementedError
 
+    def embed_documents(self, documents: list[Document]) -> list[list[float]]:
+        return self.embeddings.embed_documents([doc.page_content for doc in documents])
+
     @abstractmethod
     def delete(self, doc_id: str) -> None:
         raise NotImplementedError
 
+    @abstractmethod
+    def delete_chunks(self, ids: List[str]) -> None:
+        # deletes single chunks by their id, e.g., those written by a failed attempt to add a file
+        raise NotImplementedError
+
     @abstractmethod
     def similarity_search(
         self, query: str, k: int = 4, search_filter: VectorStoreFilter | None = None
     ) -> List[Document]:
         raise NotImplementedError
 
+    async def asimilarity_search(
+        self, query: str, k: int = 4, search_filter: VectorStoreFilter | None = None
+    ) -> List[Document]:
+        # vector stores without an async client run the blocking search in a thread
+        return await asyncio.to_thread(self.similarity_search, query, k, search_filter)
+
     @abstractmethod
     def get_documents(self, ids: List[str]) -> List[Document]:
         raise NotImplementedError
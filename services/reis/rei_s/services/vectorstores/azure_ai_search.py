@@ -91,16 +91,24 @@ class AzureAISearchStoreAdapter(VectorStoreAdapter):
         instance = cls()
 
         instance.vector_store = azure_vector_store
+        instance.embeddings = embeddings
 
         return instance
 
-    def add_documents(self, documents: list[Document]) -> None:
+    def add_documents(self, documents: list[Document], embeddings: list[list[float]] | None = None) -> None:
         # langchain's abstraction of Azure AI seems to forget the ids and replaces them with the kwarg "key"
         # and langchains interface needs us to provide either no keys or keys for every document
         keys = [doc.id for doc in documents if doc.id is not None]
         if len(keys) > 0 and len(keys) != len(documents):
             raise ValueError("If you give an `id` for any document, you need to give an id for every document")
-        self.vector_store.add_documents(documents, keys=keys)
+        if embeddings is None:
+            self.vector_store.add_documents(documents, keys=keys)
+        else:
+            self.vector_store.add_embeddings(
+                zip([doc.page_content for doc in documents], embeddings, strict=True),
+                [doc.metadata for doc in documents],
+                keys=keys,
+            )
 
     def delete(self, doc_id: str) -> None:
         # The `delete` method can only delete by the "key", which is unique, i.e., the chunk id.
@@ -113,6 +121,9 @@ class AzureAISearchStoreAdapter(VectorStoreAdapter):
         ids = [i["id"] for i in response]
         self.vector_store.delete(ids)
 
+    def delete_chunks(self, ids: List[str]) -> None:
+        self.vector_store.delete(ids)
+
     @staticmethod
     def convert_filter(search_filter: VectorStoreFilter | None) -> str | None:
         if search_filter is None:
@@ -142,6 +153,17 @@ class AzureAISearchStoreAdapter(VectorStoreAdapter):
 
         return self.vector_store.similarity_search(query, k, filters=filter_expression)
 
+    async def asimilarity_search(
+        self, query: str, k: int = 4, search_filter: VectorStoreFilter | None = None
+    ) -> List[Document]:
+        if search_filter is not None and search_filter.doc_ids is not None and len(search_filter.doc_ids) == 0:
+            return []
+
+        filter_expression = self.convert_filter(search_filter)
+
+        # uses the async search client and the async embeddings of the vector store
+        return await self.vector_store.asimilarity_search(query, k, filters=filter_expression)
+
     def get_documents(self, ids: List[str]) -> List[Document]:
         filter_query = f"search.in(id, '{', '.join(ids)}')"
         docs = self.vector_store.similarity_search("", len(ids), filters=filter_query)
@@ -15,12 +15,18 @@ class DevNullVectorStoreAdapter(VectorStoreAdapter):
     ) -> "DevNullVectorStoreAdapter":
         return cls()
 
-    def add_documents(self, documents: list[Document]) -> None:
+    def add_documents(self, documents: list[Document], embeddings: list[list[float]] | None = None) -> None:
         pass
 
+    def embed_documents(self, documents: list[Document]) -> list[list[float]]:
+        return [[] for _ in documents]
+
     def delete(self, doc_id: str) -> None:
         pass
 
+    def delete_chunks(self, ids: List[str]) -> None:
+        pass
+
     def similarity_search(
         self, query: str, k: int = 4, search_filter: VectorStoreFilter | None = None
     ) -> List[Document]:
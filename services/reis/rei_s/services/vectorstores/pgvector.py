@@ -4,7 +4,9 @@ from typing import Any, Dict, List
 from langchain_core.documents import Document
 from langchain_postgres import PGVector
 from langchain_core.embeddings.embeddings import Embeddings
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import create_async_engine
 
 from rei_s import logger
 from rei_s.config import Config
@@ -15,10 +17,27 @@ lock = Lock()
 
 # Cache for vector store instances to prevent creating multiple connections
 _vector_store_cache: Dict[str, PGVector] = {}
+# PGVector can either be used sync or async, so the async searches get their own instance
+# it is None, if no async driver is available for the url
+_async_vector_store_cache: Dict[str, PGVector | None] = {}
+# this is taken on the event loop, so it must not wait for `lock`, which is held during the sync database setup.
+# creating the async instance does not connect to the database yet.
+async_lock = Lock()
+
+
+def get_async_url(url: str) -> str:
+    """The url with an async driver, psycopg (version 3) supports both."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "postgresql" and parsed.get_driver_name() in {"psycopg2", "psycopg"}:
+        parsed = parsed.set(drivername="postgresql+psycopg")
+    return parsed.render_as_string(hide_password=False)
 
 
 class PGVectorStoreAdapter(VectorStoreAdapter):
     vector_store: PGVector
+    url: str
+    cache_key: str
+    collection_name: str
 
     @classmethod
     def create(cls, config: Config, embeddings: Embeddings, index_name: str | None = None) -> "PGVectorStoreAdapter":
@@ -32,7 +51,7 @@ class PGVectorStoreAdapter(VectorStoreAdapter):
             collection_name = "index"
 
         # Create a cache key based on connection URL and collection name
-        cache_key = f"{config.store_pgvector_url}:{collection_name}"
+        cache_key = f"{config.store_pgvector_url.get_secret_value()}:{collection_name}"
 
         # In the python version the table name is hardcoded in langchain to `langchain_pg_collection`
         # https://github.com/langchain-ai/langchain/discussions/17223
@@ -62,11 +81,54 @@ class PGVectorStoreAdapter(VectorStoreAdapter):
         instance = cls()
 
         instance.vector_store = pg_vector_store
+        instance.url = config.store_pgvector_url.get_secret_value()
+        instance.cache_key = cache_key
+        instance.collection_name = collection_name
+        instance.embeddings = pg_vector_store.embeddings
 
         return instance
 
-    def add_documents(self, documents: list[Document]) -> None:
-        self.vector_store.add_documents(documents)
+    def get_async_vector_store(self) -> PGVector | None:
+        # the async instance is only created for async searches, such that sync-only use does not need an async driver
+        with async_lock:
+            if self.cache_key not in _async_vector_store_cache:
+                try:
+                    async_engine = create_async_engine(
+                        get_async_url(self.url),
+                        pool_size=5,
+                        max_overflow=10,
+                        pool_recycle=3600,
+                    )
+                except (InvalidRequestError, ImportError) as e:
+                    logger.warning(f"No async driver for the vector store, searching in threads instead: {e!r}")
+                    async_pg_vector_store = None
+                else:
+                    # the tables and the collection are already created by the sync instance
+                    async_pg_vector_store = PGVector(
+                        self.embeddings,
+                        connection=async_engine,
+                        collection_name=self.collection_name,
+                        use_jsonb=True,
+                        create_extension=False,
+                    )
+                _async_vector_store_cache[self.cache_key] = async_pg_vector_store
+
+            return _async_vector_store_cache[self.cache_key]
+
+    def add_documents(self, documents: list[Document], embeddings: list[list[float]] | None = None) -> None:
+        if embeddings is None:
+            self.vector_store.add_documents(documents)
+            return
+
+        ids = [doc.id for doc in documents if doc.id is not None]
+        if len(ids) > 0 and len(ids) != len(documents):
+            raise ValueError("If you give an `id` for any document, you need to give an id for every document")
+        self.vector_store.add_embeddings(
+            texts=[doc.page_content for doc in documents],
+            embeddings=embeddings,
+            metadatas=[doc.metadata for doc in documents],
+            ids=ids or None,
+        )
 
     def delete(self, doc_id: str) -> None:
         # The vector store does not offer a method to delete chunks by metadata (only chunk id), thus
@@ -87,6 +149,9 @@ class PGVectorStoreAdapter(VectorStoreAdapter):
             session.execute(stmt)
             session.commit()
 
+    def delete_chunks(self, ids: List[str]) -> None:
+        self.vector_store.delete(ids)
+
     @staticmethod
     def convert_filter(search_filter: VectorStoreFilter | None) -> Dict[str, Any] | None:
         filter_dict: Dict[str, Any] | None
@@ -108,5 +173,16 @@ class PGVectorStoreAdapter(VectorStoreAdapter):
 
         return self.vector_store.similarity_search(query, k, filter_dict)
 
+    async def asimilarity_search(
+        self, query: str, k: int = 4, search_filter: VectorStoreFilter | None = None
+    ) -> List[Document]:
+        async_vector_store = self.get_async_vector_store()
+        if async_vector_store is None:
+            return await super().asimilarity_search(query, k, search_filter)
+
+        filter_dict = self.convert_filter(search_filter)
+
+        return await async_vector_store.asimilarity_search(query, k, filter_dict)
+
     def get_documents(self, ids: List[str]) -> List[Document]:
         return self.vector_store.get_by_ids(ids)
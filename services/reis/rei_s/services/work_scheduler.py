@@ -0,0 +1,141 @@
+from collections import deque
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from threading import Condition, Thread
+from typing import Any, Callable, Literal, TypeVar
+
+from rei_s import logger
+from rei_s.metrics.metrics import work_queued
+
+T = TypeVar("T")
+
+# interactive work (e.g. `/files/process`) is always started before bulk work (e.g. `/files`)
+Priority = Literal["interactive", "bulk"]
+PRIORITIES: tuple[Priority, ...] = ("interactive", "bulk")
+
+# the fixed cost of a task in bytes, such that many small files of a bucket are not preferred over one large file
+TASK_OVERHEAD = 10**5
+
+
+def estimate_cost(size: int) -> float:
+    """The cost of processing a file of `size` bytes, in the unit of the fair queuing."""
+    return float(size + TASK_OVERHEAD)
+
+
+@dataclass
+class WorkItem:
+    future: Future[Any]
+    fn: Callable[..., Any]
+    args: tuple[Any, ...]
+    kwargs: dict[str, Any]
+    # the virtual time, when the item may start, see `PriorityClass`
+    start_tag: float = 0.0
+
+
+@dataclass
+class PriorityClass:
+    """The queued work of one priority, shared fairly between the buckets by start-time fair queuing.
+
+    Every item gets a start tag, which is the later of the current virtual time and the finish tag of the previous
+    item of its bucket. The item with the smallest start tag is started next, and the virtual time advances to it.
+    Thus a bucket, which queued a lot of (or expensive) work, only gets its share and does not delay the others.
+    """
+
+    buckets: dict[str, deque[WorkItem]] = field(default_factory=dict)
+    finish_tags: dict[str, float] = field(default_factory=dict)
+    virtual_time: float = 0.0
+    size: int = 0
+
+    def push(self, bucket: str, cost: float, item: WorkItem) -> None:
+        item.start_tag = max(self.virtual_time, self.finish_tags.get(bucket, 0.0))
+        self.finish_tags[bucket] = item.start_tag + cost
+        self.buckets.setdefault(bucket, deque()).append(item)
+        self.size += 1
+
+    def pop(self) -> WorkItem:
+        bucket = min(self.buckets, key=lambda b: self.buckets[b][0].start_tag)
+        queue = self.buckets[bucket]
+        item = queue.popleft()
+        self.size -= 1
+        self.virtual_time = item.start_tag
+        if not queue:
+            del self.buckets[bucket]
+        # idle buckets start at the virtual time again, their finish tags are not needed anymore
+        for idle in [b for b, tag in self.finish_tags.items() if b not in self.buckets and tag <= self.virtual_time]:
+            del self.finish_tags[idle]
+        return item
+
+
+class WorkScheduler(Executor):
+    """A thread pool, which starts the queued work by priority and shares it fairly between the buckets.
+
+    `workers` threads run any work, `interactive_workers` additional threads only run interactive work, such that
+    interactive requests are started quickly, even if all workers are busy with large files.
+    """
+
+    def __init__(self, workers: int, interactive_workers: int = 0) -> None:
+        self.condition = Condition()
+        self.classes: dict[Priority, PriorityClass] = {p: PriorityClass() for p in PRIORITIES}
+        self.shutting_down = False
+        self.threads = [
+            Thread(target=self.work, args=(PRIORITIES,), name=f"worker-{n}", daemon=True) for n in range(workers)
+        ] + [
+            Thread(target=self.work, args=(("interactive",),), name=f"interactive-worker-{n}", daemon=True)
+            for n in range(interactive_workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> Future[T]:
+        return self.submit_prioritized("bulk", "", TASK_OVERHEAD, fn, *args, **kwargs)
+
+    def submit_prioritized(
+        self, priority: Priority, bucket: str, cost: float, fn: Callable[..., T], /, *args: Any, **kwargs: Any
+    ) -> Future[T]:
+        future: Future[T] = Future()
+        with self.condition:
+            if self.shutting_down:
+                raise RuntimeError("cannot schedule new work after shutdown")
+            self.classes[priority].push(bucket, cost, WorkItem(future, fn, args, kwargs))
+            work_queued.labels(priority).inc()
+            self.condition.notify_all()
+        return future
+
+    def queued(self, priority: Priority) -> int:
+        return self.classes[priority].size
+
+    def next_item(self, priorities: tuple[Priority, ...]) -> WorkItem | None:
+        with self.condition:
+            while True:
+                for priority in priorities:
+                    if self.classes[priority].size:
+                        work_queued.labels(priority).dec()
+                        return self.classes[priority].pop()
+                if self.shutting_down:
+                    return None
+                self.condition.wait()
+
+    def work(self, priorities: tuple[Priority, ...]) -> None:
+        while (item := self.next_item(priorities)) is not None:
+            if not item.future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = item.fn(*item.args, **item.kwargs)
+            except BaseException as e:
+                item.future.set_exception(e)
+            else:
+                item.future.set_result(result)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self.condition:
+            self.shutting_down = True
+            if cancel_futures:
+                for priority, priority_class in self.classes.items():
+                    while priority_class.size:
+                        work_queued.labels(priority).dec()
+                        priority_class.pop().future.cancel()
+            self.condition.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join()
+        logger.debug("Stopped the work scheduler")
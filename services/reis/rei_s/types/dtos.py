@@ -1,4 +1,4 @@
-from typing import Any, List, Optional, Dict, Tuple
+from typing import Any, List, Literal, Optional, Dict, Tuple
 from pydantic import BaseModel, Field, ConfigDict
 from pydantic.alias_generators import to_camel
 
@@ -66,3 +66,16 @@ class UploadRequest(BaseModel):
 
 class DocumentResponse(BaseModel):
     documents: List[str]
+
+
+class IngestJobDto(BaseModel):
+    id: str = Field(description="The ID of the job.")
+    file_id: str = Field(description="The ID of the file.")
+    status: Literal["queued", "running", "done", "failed"] = Field(description="The state of the job.")
+    chunks_done: int = Field(description="The number of chunks, which are stored in the vector store.")
+    chunks_total: Optional[int] = Field(description="The number of chunks, unknown while the file is still parsed.")
+    error: Optional[str] = Field(description="The reason, why the job failed.")
+    error_status: Optional[int] = Field(description="The status code, which a synchronous upload would have returned.")
+    created_at: float = Field(description="The time, when the job was accepted, in seconds since the epoch.")
+    updated_at: float = Field(description="The time of the last change of the job, in seconds since the epoch.")
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True, from_attributes=True)
@@ -1,8 +1,13 @@
+import codecs
 from contextlib import contextmanager
+import fcntl
+import mmap
 import os
 from pathlib import Path
+import shutil
+import tempfile
 from tempfile import NamedTemporaryFile
-from typing import Generator, Optional
+from typing import BinaryIO, Callable, Generator, Iterator
 import uuid
 
 from pydantic import BaseModel, Field
@@ -18,9 +23,12 @@ class SourceFile(BaseModel):
     # flag to signal that the parent directory should be deleted when deleting the file
     delete_dir: bool = False
 
-    # this can be used to cache a pdf version of the file as microoptimization
-    # some format providers work by converting the file to pdf first, so this avoids repeated conversions
-    preview_pdf_cache: Optional["SourceFile"] = None
+    # a directory for the intermediate results of all stages of an ingest, see `artifacts`
+    # it is a path on disk, such that the stages running in worker processes share it as well
+    artifact_dir: str | None = None
+
+    # artifacts belong to the ingest, they are not deleted by the stages using them
+    is_artifact: bool = False
 
     @property
     def size(self) -> int:
@@ -32,9 +40,40 @@ class SourceFile(BaseModel):
 
     @property
     def buffer(self) -> bytes:
+        """Reads the whole file into a new bytes object. Prefer `view`, `stream` or `text` for large files."""
         with open(self.path, "rb") as f:
             return f.read()
 
+    @contextmanager
+    def view(self) -> Generator[memoryview, None, None]:
+        """Maps the file into memory without copying it. The view is only valid inside the context."""
+        if self.size == 0:
+            # empty files can not be mapped
+            yield memoryview(b"")
+            return
+
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                # the map can only be closed after all views are released
+                view.release()
+
+    def stream(self) -> BinaryIO:
+        """Opens the file for reading, has to be closed by the caller."""
+        return open(self.path, "rb")
+
+    def iter_chunks(self, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        with open(self.path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def text(self, encoding: str = "utf-8") -> str:
+        """Decodes the file directly from the mapped memory, i.e., without an intermediate bytes copy."""
+        with self.view() as view:
+            return codecs.decode(view, encoding)
+
     @staticmethod
     def new_temporary_file(buffer: bytes | None = None, extension: str | None = None) -> "SourceFile":
         id_ = str(uuid.uuid4())
@@ -53,10 +92,44 @@ class SourceFile(BaseModel):
 
         return SourceFile(id=id_, path=path, mime_type="", file_name=file_name)
 
+    @contextmanager
+    def artifacts(self) -> Generator[None, None, None]:
+        """Shares the intermediate results (e.g. the converted pdf) between the stages of an ingest of this file.
+
+        The artifacts are deleted on leaving the context.
+        """
+        self.artifact_dir = tempfile.mkdtemp(prefix="artifacts-")
+        try:
+            yield
+        finally:
+            shutil.rmtree(self.artifact_dir, ignore_errors=True)
+            self.artifact_dir = None
+
+    def artifact(self, name: str, create: Callable[[str], None]) -> str | None:
+        """The path of the artifact, which is created by `create(path)` for the first stage asking for it.
+
+        Stages asking at the same time wait for it, also across processes. Returns None outside of `artifacts`.
+        """
+        if self.artifact_dir is None:
+            return None
+
+        path = os.path.join(self.artifact_dir, name)
+        with open(path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not os.path.exists(path):
+                # a failed attempt does not leave a partial artifact behind
+                partial = path + ".partial"
+                try:
+                    create(partial)
+                    os.replace(partial, path)
+                finally:
+                    if os.path.exists(partial):
+                        os.remove(partial)
+        return path
+
     def delete(self) -> None:
-        if self.preview_pdf_cache:
-            self.preview_pdf_cache.delete()
-            self.preview_pdf_cache = None
+        if self.is_artifact:
+            return
         if self.exists:
             os.remove(self.path)
         if self.delete_dir and os.path.isdir(os.path.dirname(self.path)):
@@ -1,4 +1,3 @@
-from concurrent.futures import ThreadPoolExecutor
 import os
 import tempfile
 from typing import Any
@@ -8,8 +7,12 @@ from fastapi import FastAPI
 from fastapi.concurrency import asynccontextmanager
 
 from rei_s.logger import logger
-from rei_s.config import get_config
+from rei_s.config import Config, get_config
 from rei_s.prometheus_server import PrometheusHttpServer
+from rei_s.services.embeddings_provider import close_embeddings
+from rei_s.services.libre_office_pool import shutdown_libre_office_pool
+from rei_s.services.multiprocess_utils import shutdown_worker_pool, start_worker_pool
+from rei_s.services.work_scheduler import WorkScheduler
 
 
 def get_new_file_path(base_name: str | None = None, extension: str | None = None) -> str:
@@ -26,9 +29,21 @@ def get_new_file_path(base_name: str | None = None, extension: str | None = None
     return normalized_path
 
 
-async def startup_workers(app: FastAPI, workers: int) -> None:
-    app.state.executor = ThreadPoolExecutor(max_workers=workers)
-    logger.info(f"Started {workers} workers")
+async def startup_workers(app: FastAPI, workers: int, interactive_workers: int = 0) -> None:
+    app.state.executor = WorkScheduler(workers, interactive_workers)
+    logger.info(f"Started {workers} workers and {interactive_workers} workers for interactive requests")
+
+
+def start_ingest_queue(app: FastAPI, config: Config) -> None:
+    # the queue runs the store service, which needs this module itself
+    from rei_s.services.ingest_queue import IngestQueue
+    from rei_s.services.job_store_provider import get_job_store
+
+    job_store = get_job_store(config)
+    app.state.ingest_queue = IngestQueue(config, job_store, app.state.executor) if job_store else None
+    if app.state.ingest_queue is not None:
+        app.state.ingest_queue.start()
+        logger.info(f"Started ingest queue, spooling files to {config.job_spool_dir}")
 
 
 async def shutdown_workers(app: FastAPI) -> None:
@@ -45,11 +60,21 @@ async def lifespan(app: FastAPI) -> Any:
         logger.info(f"Starting Prometheus server on port {config.metrics_port}")
         metrics_server.start()
 
-    await startup_workers(app, config.workers)
+    await startup_workers(app, config.workers, config.interactive_workers)
+    start_worker_pool(config)
+    start_ingest_queue(app, config)
 
     yield
 
+    # queued jobs are left to the next process, but the running ones are finished and still renewed meanwhile
+    if app.state.ingest_queue is not None:
+        app.state.ingest_queue.stop()
     await shutdown_workers(app)
+    if app.state.ingest_queue is not None:
+        app.state.ingest_queue.close()
+    shutdown_worker_pool()
+    shutdown_libre_office_pool()
+    await close_embeddings()
 
     if config.metrics_port:
         metrics_server.stop()
@@ -1,10 +1,10 @@
 from typing import Any, Generator
 from fastapi import FastAPI
 import pytest
-from concurrent.futures import ThreadPoolExecutor
 
 from rei_s import app_factory
 from rei_s.config import Config, get_config
+from rei_s.services.work_scheduler import WorkScheduler
 
 
 def get_test_config(settings: dict[str, Any] | None = None) -> Config:
@@ -36,7 +36,7 @@ def app() -> Generator[FastAPI, None, None]:
     # this is good, because, we do not want to start the metrics endpoint for tests
     # but this means that we need to start the executor manually here.
     # For tests using the lifespan context, it will be overwritten.
-    app.state.executor = ThreadPoolExecutor(max_workers=1)
+    app.state.executor = WorkScheduler(workers=1, interactive_workers=1)
 
     yield app
 
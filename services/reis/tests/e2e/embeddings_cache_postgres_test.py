@@ -0,0 +1,66 @@
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import text
+
+from rei_s.services.embeddings_caches.postgres import PostgresEmbeddingsCacheAdapter
+from tests.conftest import get_test_config
+
+# Here we test the postgres embeddings cache.
+# We need a running postgres instance reachable via the url in the env variables
+# (`EMBEDDINGS_CACHE_POSTGRES_URL` or `STORE_PGVECTOR_URL`). We will manipulate the `reis_embeddings_cache` table.
+# If needed environment variables are missing, the test is skipped
+
+
+@pytest.fixture
+def cache() -> PostgresEmbeddingsCacheAdapter:
+    try:
+        config = get_test_config(dict(store_type="pgvector", embeddings_cache_type="postgres"))
+    except ValidationError as e:
+        pytest.skip(f"Skipped! A config value is missing: {e!r}")
+
+    cache = PostgresEmbeddingsCacheAdapter.create(config)
+    with cache.engine.begin() as connection:
+        connection.execute(text("DELETE FROM reis_embeddings_cache"))
+    return cache
+
+
+def test_postgres_cache_get_and_set(cache: PostgresEmbeddingsCacheAdapter) -> None:
+    cache.set_many({"a": [1.0, 2.0], "b": [3.0]})
+    cache.set_many({"b": [4.0]})
+
+    assert cache.get_many(["b", "missing", "a"]) == [[4.0], None, [1.0, 2.0]]
+    assert cache.get_many([]) == []
+
+
+def test_postgres_cache_eviction(cache: PostgresEmbeddingsCacheAdapter) -> None:
+    cache.max_entries = 2
+    cache.touch_interval = 0
+    for key, vector in [("a", [1.0]), ("b", [2.0]), ("c", [3.0])]:
+        cache.set_many({key: vector})
+    # mark `a` as recently used
+    cache.get_many(["a"])
+
+    cache.evict()
+
+    assert cache.get_many(["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+    cache.ttl = 0
+    cache.evict()
+
+    assert cache.get_many(["a", "c"]) == [None, None]
+
+
+def test_postgres_cache_batches_access_times(cache: PostgresEmbeddingsCacheAdapter) -> None:
+    cache.set_many({"a": [1.0]})
+    with cache.engine.begin() as connection:
+        connection.execute(text("UPDATE reis_embeddings_cache SET accessed_at = 0"))
+
+    # within the interval, reads do not write
+    cache.get_many(["a"])
+    with cache.engine.begin() as connection:
+        assert connection.execute(text("SELECT accessed_at FROM reis_embeddings_cache")).scalar() == 0
+
+    # the collected hits are written before the eviction
+    cache.evict()
+    with cache.engine.begin() as connection:
+        assert connection.execute(text("SELECT accessed_at FROM reis_embeddings_cache")).scalar() > 0
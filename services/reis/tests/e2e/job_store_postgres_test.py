@@ -0,0 +1,97 @@
+import time
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import text
+
+from rei_s.services.job_store_adapter import IngestJob
+from rei_s.services.job_stores.postgres import PostgresJobStoreAdapter
+from tests.conftest import get_test_config
+
+# Here we test the postgres job store.
+# We need a running postgres instance reachable via the url in the env variables
+# (`JOB_STORE_POSTGRES_URL` or `STORE_PGVECTOR_URL`). We will manipulate the `reis_ingest_jobs` table.
+# If needed environment variables are missing, the test is skipped
+
+
+@pytest.fixture
+def store() -> PostgresJobStoreAdapter:
+    try:
+        config = get_test_config(
+            dict(store_type="pgvector", job_store_type="postgres", job_spool_dir="/tmp/spool", job_lease=60)
+        )
+    except ValidationError as e:
+        pytest.skip(f"Skipped! A config value is missing: {e!r}")
+
+    store = PostgresJobStoreAdapter.create(config)
+    with store.engine.begin() as connection:
+        connection.execute(text("DELETE FROM reis_ingest_jobs"))
+        connection.execute(text("DELETE FROM reis_ingest_job_chunks"))
+    return store
+
+
+def new_job(job_id: str, owner: str = "other", heartbeat_at: float | None = None) -> IngestJob:
+    job = IngestJob(
+        id=job_id,
+        file_id=f"file-{job_id}",
+        file_name="birthdays.pdf",
+        mime_type="application/pdf",
+        bucket="1",
+        index_name=None,
+        path=f"/spool/{job_id}",
+        owner=owner,
+    )
+    if heartbeat_at is not None:
+        job.heartbeat_at = heartbeat_at
+    return job
+
+
+def test_postgres_job_store_status(store: PostgresJobStoreAdapter) -> None:
+    store.add(new_job("job"))
+    store.set_progress("job", 4, None)
+    store.set_status("job", "failed", "Processing failed", 400)
+
+    job = store.get("job")
+    assert job is not None
+    assert (job.status, job.chunks_done, job.chunks_total) == ("failed", 4, None)
+    assert (job.error, job.error_status, job.attempts) == ("Processing failed", 400, 1)
+    assert store.get("missing") is None
+
+
+def test_postgres_job_store_chunk_ids(store: PostgresJobStoreAdapter) -> None:
+    store.add(new_job("job"))
+    store.add_chunk_ids("job", ["chunk-1", "chunk-2"])
+    store.add_chunk_ids("job", [])
+
+    assert sorted(store.get_chunk_ids("job")) == ["chunk-1", "chunk-2"]
+    store.set_status("job", "running")
+    assert sorted(store.get_chunk_ids("job")) == ["chunk-1", "chunk-2"]
+    # the chunks of an attempt are only needed, until the job is finished
+    store.set_status("job", "done")
+    assert store.get_chunk_ids("job") == []
+
+
+def test_postgres_job_store_claims_abandoned_jobs(store: PostgresJobStoreAdapter) -> None:
+    store.add(new_job("alive", owner="me"))
+    store.add(new_job("abandoned", heartbeat_at=time.time() - 120))
+    store.add(new_job("finished", heartbeat_at=time.time() - 120))
+    store.set_status("finished", "done")
+
+    abandoned = store.list_abandoned()
+    assert [job.id for job in abandoned] == ["abandoned"]
+    assert store.claim(abandoned[0], "me")
+    # someone else was faster
+    assert not store.claim(abandoned[0], "you")
+    assert store.list_abandoned() == []
+
+    claimed = store.get("abandoned")
+    assert claimed is not None
+    assert (claimed.owner, claimed.attempts) == ("me", 2)
+
+    store.heartbeat("me")
+    store.ttl = 0
+    store.evict()
+    assert store.get("finished") is None
+    # unfinished jobs are not evicted
+    assert store.get("alive") is not None
+    assert store.get("abandoned") is not None
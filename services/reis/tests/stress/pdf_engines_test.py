@@ -0,0 +1,43 @@
+from glob import glob
+from time import perf_counter
+
+import pytest
+
+from rei_s.config import PdfEngine
+from rei_s.services.formats.pdf_provider import PdfProvider
+from rei_s.types.source_file import SourceFile
+
+
+# the large files are mostly plain text, the birthday sheet is a small table
+files = glob("tests/data_stress/*.pdf") + ["tests/data/birthdays.pdf"]
+
+engines: list[tuple[PdfEngine, ...]] = [("pdfminer",), ("pypdf",), ("fast", "pdfminer")]
+
+
+@pytest.mark.stress
+@pytest.mark.parametrize("engine_order", engines, ids=["+".join(e) for e in engines])
+@pytest.mark.parametrize("filename", files)
+def test_pdf_engine_throughput(engine_order: tuple[PdfEngine, ...], filename: str) -> None:
+    # runs in this process, such that the numbers only contain the extraction
+    # compare them with `pytest -rs --stress -s tests/stress/pdf_engines_test.py`
+    file = SourceFile(path=filename, mime_type="application/pdf", file_name=filename)
+    splitter = PdfProvider().splitter()
+
+    start = perf_counter()
+    first_chunk = None
+    pages = set()
+    for chunk in PdfProvider.parse_and_split(file, splitter, engine_order):
+        if first_chunk is None:
+            first_chunk = perf_counter() - start
+        pages.add(chunk.metadata["page"])
+    total = perf_counter() - start
+
+    assert first_chunk is not None
+    print(
+        f"\n{filename} with {'+'.join(engine_order)}: "
+        f"first chunk after {first_chunk:.3f}s, {len(pages)} pages in {total:.3f}s "
+        f"({len(pages) / total:.1f} pages/s, {file.size / total / 10**6:.2f} MB/s)"
+    )
+
+    # note that this is dependent on the runtime and should be treated with care
+    assert total < 600
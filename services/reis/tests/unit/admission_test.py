@@ -0,0 +1,126 @@
+import asyncio
+from pathlib import Path
+import tempfile
+from typing import AsyncIterator, Generator, Iterator
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+import pytest
+from pytest_mock import MockerFixture
+
+from rei_s.config import get_config
+from rei_s.routes.files import receive_upload
+from rei_s.services.admission import AdmissionController, get_admission_controller
+from tests.conftest import get_default_test_config, get_test_config
+
+LIMITED_CONFIG = get_test_config(dict(max_queued_files=1, max_queued_bytes=100, admission_retry_after=7))
+
+
+@pytest.fixture
+def client(app: FastAPI) -> Generator[TestClient, None, None]:
+    app.dependency_overrides[get_config] = lambda: LIMITED_CONFIG
+    yield TestClient(app)
+    app.dependency_overrides[get_config] = get_default_test_config
+
+
+def test_admission_limits() -> None:
+    controller = AdmissionController(max_files=2, max_bytes=100)
+    directory = tempfile.gettempdir()
+
+    # a single file above the limit is accepted, if nothing else is queued
+    large = controller.admit(150, directory)
+    with pytest.raises(HTTPException) as e:
+        controller.admit(10, directory)
+    assert (e.value.status_code, e.value.headers) == (429, {"Retry-After": "30"})
+
+    large.release()
+    large.release()
+    assert (controller.files, controller.bytes) == (0, 0)
+
+    controller.admit(60, directory)
+    controller.admit(40, directory)
+    with pytest.raises(HTTPException) as e:
+        controller.admit(0, directory)
+    assert e.value.detail == "Too many files are queued"
+
+
+def test_admission_needs_free_disk(mocker: MockerFixture) -> None:
+    mocker.patch("shutil.disk_usage", return_value=mocker.Mock(free=100))
+    controller = AdmissionController(min_free_disk=50)
+
+    with pytest.raises(HTTPException) as e:
+        controller.admit(51, tempfile.gettempdir())
+    assert e.value.status_code == 503
+
+    # the queued uploads are not written to the disk yet
+    controller.admit(30, tempfile.gettempdir())
+    controller.admit(20, tempfile.gettempdir())
+    with pytest.raises(HTTPException) as e:
+        controller.admit(1, tempfile.gettempdir())
+    assert e.value.status_code == 503
+
+
+def test_admission_needs_the_size_for_limited_bytes() -> None:
+    assert AdmissionController(max_files=1).admit(None, tempfile.gettempdir()).size == 0
+
+    with pytest.raises(HTTPException) as e:
+        AdmissionController(max_bytes=100).admit(None, tempfile.gettempdir())
+    assert (e.value.status_code, e.value.headers) == (411, None)
+
+
+def test_uploads_are_rejected_before_reading_the_body(mocker: MockerFixture, client: TestClient) -> None:
+    open_file = mocker.patch("aiofiles.open")
+    queued = get_admission_controller(LIMITED_CONFIG).admit(0, tempfile.gettempdir())
+
+    response = client.post(
+        "/files/process",
+        content=b"name: Dagobert Duck",
+        headers={"fileName": "test.yaml", "fileMimeType": "application/yaml"},
+    )
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+    open_file.assert_not_called()
+    queued.release()
+
+
+def test_uploads_are_released_after_processing(client: TestClient) -> None:
+    response = client.post(
+        "/files/process",
+        content=b"name: Dagobert Duck",
+        headers={"fileName": "test.yaml", "fileMimeType": "application/yaml"},
+    )
+
+    assert response.status_code == 200
+    controller = get_admission_controller(LIMITED_CONFIG)
+    assert (controller.files, controller.bytes) == (0, 0)
+
+
+def test_uploads_without_length_are_rejected(client: TestClient) -> None:
+    def body() -> Iterator[bytes]:
+        yield b"name: Dagobert Duck"
+
+    # the body is sent chunked
+    response = client.post(
+        "/files/process",
+        content=body(),
+        headers={"fileName": "test.yaml", "fileMimeType": "application/yaml"},
+    )
+
+    assert response.status_code == 411
+
+
+def test_uploads_must_not_exceed_their_length(mocker: MockerFixture, tmp_path: Path) -> None:
+    async def stream() -> AsyncIterator[bytes]:
+        yield b"name: Dagobert"
+        yield b" Duck"
+
+    request = mocker.Mock(stream=stream)
+    controller = AdmissionController()
+
+    asyncio.run(receive_upload(request, str(tmp_path / "upload"), controller.admit(19, str(tmp_path))))
+    assert (tmp_path / "upload").read_bytes() == b"name: Dagobert Duck"
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(receive_upload(request, str(tmp_path / "upload"), controller.admit(14, str(tmp_path))))
+    assert e.value.status_code == 413
@@ -0,0 +1,53 @@
+from typing import Iterator
+
+from rei_s.services.cost_model import INITIAL_OVERHEAD, MIN_SAMPLES, CostModel, get_cost_model, measure_thread_time
+from rei_s.services.store_service import process_file
+from rei_s.types.source_file import SourceFile
+from tests.conftest import get_test_config
+
+
+def test_cost_model_falls_back_to_the_threshold() -> None:
+    model = CostModel(filesize_threshold=1000)
+
+    assert model.predict("pdf", 10) is None
+    assert not model.prefers_worker_pool("pdf", 999)
+    assert model.prefers_worker_pool("pdf", 1000)
+
+
+def test_cost_model_decides_by_the_cost_per_byte() -> None:
+    model = CostModel(filesize_threshold=1000)
+    for _ in range(MIN_SAMPLES):
+        # a pdf of 100 bytes takes longer than the overhead of the pool, a json of 10000 bytes does not
+        model.record("pdf", "thread", 100, 2 * INITIAL_OVERHEAD, None)
+        model.record("json", "thread", 10000, INITIAL_OVERHEAD / 2, None)
+
+    assert model.predict("pdf", 100) == 2 * INITIAL_OVERHEAD
+    assert model.prefers_worker_pool("pdf", 100)
+    assert not model.prefers_worker_pool("json", 10000)
+
+    # the pool got slower
+    for _ in range(20):
+        model.record_overhead(1.0)
+    assert model.overhead.value > 0.9
+    assert not model.prefers_worker_pool("pdf", 100)
+
+
+def test_measure_thread_time() -> None:
+    measured: list[float] = []
+
+    def items() -> Iterator[int]:
+        yield sum(range(10**5))
+        yield 2
+
+    assert list(measure_thread_time(items(), measured.append)) == [sum(range(10**5)), 2]
+    assert len(measured) == 1
+    assert measured[0] > 0
+
+
+def test_processing_is_measured() -> None:
+    config = get_test_config(dict(executor_type="adaptive"))
+    file = SourceFile(path="tests/data/birthdays.yaml", mime_type="application/yaml", file_name="birthdays.yaml")
+
+    process_file(config, file)
+
+    assert get_cost_model(config).rates["yaml"].samples == 1
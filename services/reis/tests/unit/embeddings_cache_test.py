@@ -0,0 +1,111 @@
+import time
+from pathlib import Path
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from rei_s.services.cached_embeddings import CachedEmbeddings
+from rei_s.services.embeddings_caches.sqlite import SqliteEmbeddingsCacheAdapter
+from rei_s.services.ttl_cache import TTLCache
+from tests.conftest import get_test_config
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        self.calls.append([text])
+        return super().embed_query(text)
+
+
+def get_sqlite_cache(path: Path, max_entries: int = 100) -> SqliteEmbeddingsCacheAdapter:
+    return SqliteEmbeddingsCacheAdapter.create(
+        get_test_config(
+            dict(
+                embeddings_cache_type="sqlite",
+                embeddings_cache_sqlite_path=str(path / "cache.sqlite"),
+                embeddings_cache_max_entries=max_entries,
+            )
+        )
+    )
+
+
+def test_cached_embeddings(tmp_path: Path) -> None:
+    embeddings = CountingEmbeddings(size=8, calls=[])
+    cached = CachedEmbeddings(embeddings, get_sqlite_cache(tmp_path), namespace="test/model")
+
+    first = cached.embed_documents(["Donald", "Daisy", "Donald"])
+    assert first == DeterministicFakeEmbedding(size=8).embed_documents(["Donald", "Daisy", "Donald"])
+    # duplicate texts are only embedded once
+    assert embeddings.calls == [["Donald", "Daisy"]]
+
+    second = cached.embed_documents(["Daisy", "Gustav"])
+    assert second == [first[1], DeterministicFakeEmbedding(size=8).embed_query("Gustav")]
+    assert embeddings.calls == [["Donald", "Daisy"], ["Gustav"]]
+
+
+def test_cached_embeddings_namespace(tmp_path: Path) -> None:
+    cache = get_sqlite_cache(tmp_path)
+    CachedEmbeddings(DeterministicFakeEmbedding(size=8), cache, namespace="a").embed_documents(["Donald"])
+
+    assert cache.get_many([CachedEmbeddings.key_for("a", "Donald")])[0] is not None
+    assert cache.get_many([CachedEmbeddings.key_for("b", "Donald")])[0] is None
+
+
+def test_sqlite_cache_eviction(tmp_path: Path) -> None:
+    cache = get_sqlite_cache(tmp_path, max_entries=2)
+    cache.set_many({"a": [1.0], "b": [2.0], "c": [3.0]})
+    # mark `a` as recently used
+    cache.get_many(["a"])
+
+    cache.evict()
+
+    assert cache.get_many(["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+    cache.ttl = 0
+    cache.evict()
+
+    assert cache.get_many(["a", "c"]) == [None, None]
+
+
+def test_sqlite_cache_many_keys(tmp_path: Path) -> None:
+    cache = get_sqlite_cache(tmp_path, max_entries=10**4)
+    # more keys than sqlite allows variables in a statement
+    keys = [f"key-{i}" for i in range(2500)]
+    cache.set_many({key: [float(i)] for i, key in enumerate(keys) if i % 2 == 0})
+
+    vectors = cache.get_many(keys)
+
+    assert vectors == [[float(i)] if i % 2 == 0 else None for i in range(2500)]
+
+
+def test_cached_query_embeddings() -> None:
+    embeddings = CountingEmbeddings(size=8, calls=[])
+    cached = CachedEmbeddings(embeddings, None, namespace="test/model", query_cache=TTLCache(maxsize=10, ttl=60))
+
+    first = cached.embed_query("Where is  Duckburg?")
+    # whitespace differences are normalized
+    assert cached.embed_query(" Where is Duckburg?\n") == first
+    assert cached.embed_query("Where is Entenhausen?") != first
+
+    assert embeddings.calls == [["Where is  Duckburg?"], ["Where is Entenhausen?"]]
+
+
+def test_ttl_cache() -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # mark `a` as recently used
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert [cache.get("a"), cache.get("b"), cache.get("c")] == [1, None, 3]
+
+    cache.ttl = 0
+    cache.set("d", 4)
+    time.sleep(0.01)
+
+    assert cache.get("d") is None
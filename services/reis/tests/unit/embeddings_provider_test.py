@@ -0,0 +1,71 @@
+import asyncio
+from pathlib import Path
+import sqlite3
+from typing import Generator
+
+from langchain_openai import OpenAIEmbeddings
+import pytest
+
+from rei_s.services.cached_embeddings import CachedEmbeddings
+from rei_s.services.embeddings_caches.sqlite import SqliteEmbeddingsCacheAdapter
+from rei_s.services.embeddings_provider import close_embeddings, get_embeddings
+from tests.conftest import get_test_config
+
+
+@pytest.fixture(autouse=True)
+def clean_embeddings_clients() -> Generator[None, None, None]:
+    # the clients are registered module-wide, so the tests do not leave them to other tests
+    asyncio.run(close_embeddings())
+    yield
+    asyncio.run(close_embeddings())
+
+
+def test_embeddings_are_reused_per_config() -> None:
+    config = get_test_config()
+    other_config = get_test_config(dict(batch_size=123))
+
+    assert get_embeddings(config) is get_embeddings(get_test_config())
+    assert get_embeddings(config) is not get_embeddings(other_config)
+
+
+def test_openai_embeddings_share_http_clients() -> None:
+    config = get_test_config(
+        dict(
+            embeddings_type="openai",
+            embeddings_openai_api_key="key",
+            embeddings_openai_model_name="text-embedding-3-small",
+        )
+    )
+
+    embeddings = get_embeddings(config)
+    # the query embeddings are cached by default
+    assert isinstance(embeddings, CachedEmbeddings)
+    assert isinstance(embeddings.embeddings, OpenAIEmbeddings)
+    http_client = embeddings.embeddings.http_client
+    assert http_client is not None
+    assert not http_client.is_closed
+
+    asyncio.run(close_embeddings())
+
+    assert http_client.is_closed
+    assert get_embeddings(config) is not embeddings
+
+
+def test_close_embeddings_closes_the_cache(tmp_path: Path) -> None:
+    config = get_test_config(
+        dict(embeddings_cache_type="sqlite", embeddings_cache_sqlite_path=str(tmp_path / "cache.sqlite"))
+    )
+
+    embeddings = get_embeddings(config)
+    assert isinstance(embeddings, CachedEmbeddings)
+    cache = embeddings.cache
+    assert isinstance(cache, SqliteEmbeddingsCacheAdapter)
+
+    asyncio.run(close_embeddings())
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        cache.get_many(["key"])
+    # a new client gets a new connection
+    new_embeddings = get_embeddings(config)
+    assert isinstance(new_embeddings, CachedEmbeddings)
+    assert new_embeddings.cache is not cache
@@ -0,0 +1,119 @@
+from io import BytesIO
+
+import boto3
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from pytest_mock import MockerFixture
+
+from rei_s.services.filestores.s3 import S3FileStoreAdapter, get_executor
+
+# Here we test the S3 file store without calling out to S3
+
+bucket_name = "test"
+content = b"%PDF-1.4 " + b"x" * 1000
+
+
+@pytest.fixture
+def stubbed_store(mocker: MockerFixture) -> tuple[S3FileStoreAdapter, Stubber]:
+    store = S3FileStoreAdapter()
+    store.client = boto3.client("s3", region_name="us-east-1", aws_access_key_id="a", aws_secret_access_key="b")
+    store.bucket_name = bucket_name
+    store.executor = get_executor(4)
+    stubber = Stubber(store.client)
+    stubber.activate()
+
+    mocker.patch("rei_s.services.store_service.get_file_store", return_value=store)
+
+    return store, stubber
+
+
+@pytest.fixture
+def client(app: FastAPI) -> TestClient:
+    return TestClient(app)
+
+
+def test_stream_range(stubbed_store: tuple[S3FileStoreAdapter, Stubber], client: TestClient) -> None:
+    _store, stubber = stubbed_store
+    stubber.add_response(
+        "get_object",
+        {
+            "Body": StreamingBody(BytesIO(content[:100]), 100),
+            "ContentLength": 100,
+            "ContentRange": f"bytes 0-99/{len(content)}",
+            "ETag": '"abc"',
+        },
+        {"Bucket": bucket_name, "Key": "doc", "Range": "bytes=0-99"},
+    )
+
+    response = client.get("/documents/pdf", params={"doc_id": "doc"}, headers={"Range": "bytes=0-99"})
+
+    assert response.status_code == 206
+    assert response.content == content[:100]
+    assert response.headers["Content-Range"] == f"bytes 0-99/{len(content)}"
+    assert response.headers["ETag"] == '"abc"'
+    stubber.assert_no_pending_responses()
+
+
+def test_stream_not_modified(stubbed_store: tuple[S3FileStoreAdapter, Stubber], client: TestClient) -> None:
+    _store, stubber = stubbed_store
+    stubber.add_client_error(
+        "get_object",
+        service_error_code="304",
+        http_status_code=304,
+        expected_params={"Bucket": bucket_name, "Key": "doc", "IfNoneMatch": '"old", "abc"'},
+        response_meta={"HTTPHeaders": {"etag": '"abc"'}},
+    )
+
+    response = client.get("/documents/pdf", params={"doc_id": "doc"}, headers={"If-None-Match": '"old", "abc"'})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"abc"'
+    stubber.assert_no_pending_responses()
+
+
+def test_stream_not_modified_without_etag(
+    stubbed_store: tuple[S3FileStoreAdapter, Stubber], client: TestClient
+) -> None:
+    _store, stubber = stubbed_store
+    stubber.add_client_error(
+        "get_object",
+        service_error_code="304",
+        http_status_code=304,
+        expected_params={"Bucket": bucket_name, "Key": "doc", "IfNoneMatch": "*"},
+    )
+    stubber.add_response("head_object", {"ETag": '"abc"'}, {"Bucket": bucket_name, "Key": "doc"})
+
+    response = client.get("/documents/pdf", params={"doc_id": "doc"}, headers={"If-None-Match": "*"})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"abc"'
+    stubber.assert_no_pending_responses()
+
+
+def test_stream_missing(stubbed_store: tuple[S3FileStoreAdapter, Stubber], client: TestClient) -> None:
+    _store, stubber = stubbed_store
+    stubber.add_client_error("get_object", service_error_code="NoSuchKey", http_status_code=404)
+
+    response = client.get("/documents/pdf", params={"doc_id": "doc"})
+
+    assert response.status_code == 404
+
+
+def test_exists_many(mocker: MockerFixture, stubbed_store: tuple[S3FileStoreAdapter, Stubber]) -> None:
+    store, _stubber = stubbed_store
+
+    def head_object(**kwargs: str) -> dict[str, str]:
+        if kwargs["Key"] in {"b", "d"}:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {}
+
+    # the requests are sent concurrently, so the answers depend on the key, not on the order
+    mocker.patch.object(store.client, "head_object", side_effect=head_object)
+
+    exists = store.exists_many(["a", "b", "c", "d", "e"])
+
+    assert exists == {"a": True, "b": False, "c": True, "d": False, "e": True}
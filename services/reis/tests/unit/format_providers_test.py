@@ -1,4 +1,16 @@
 from itertools import combinations
+import os
+import threading
+import time
+from typing import Iterator
+
+import ffmpeg
+import httpx
+from langchain_core.documents import Document
+from langchain_core.documents.base import Blob
+import openai
+import pytest
+from pytest_mock import MockerFixture
 
 from rei_s.config import Config
 from rei_s.services.formats import get_format_providers
@@ -11,10 +23,13 @@ from rei_s.services.formats.ms_excel_provider import MsExcelProvider
 from rei_s.services.formats.ms_ppt_provider import MsPptProvider
 from rei_s.services.formats.ms_word_provider import MsWordProvider
 from rei_s.services.formats.outlook_provider import OutlookProvider
-from rei_s.services.formats.pdf_provider import PdfProvider
+from rei_s.services.formats.pdf_provider import PdfProvider, count_pages, TolerantPDFMinerParser, is_plain_text
 from rei_s.services.formats.plain_provider import PlainProvider
+from rei_s.services.formats.utils import ProcessingError
+from rei_s.services.formats.voice_transcription_provider import VoiceTranscriptionProvider
 from rei_s.services.formats.xml_provider import XmlProvider
 from rei_s.services.formats.yaml_provider import YamlProvider
+from rei_s.services.multiprocess_utils import shutdown_worker_pool
 from rei_s.types.source_file import SourceFile, temp_file
 from tests.conftest import get_test_config
 
@@ -76,30 +91,9 @@ def test_odt_provider() -> None:
 
 
 def test_xlsx_provider() -> None:
-    expected_p1 = """Name
-Mickey Mouse
-Donald Duck
-
-Birthday
-3/14/1592
-2/7/1828
-
-BirthdaySheet
-
-Page 1"""
-    expected_p2 = """Name 1
-Mickey Mouse
-
-Name 2
-Mini Mouse
-
-Anniversary
-
-01/01/11
-
-AnniversarySheet
-
-Page 2"""
+    expected_p1 = """Name\tBirthday
+Mickey Mouse\t3/14/1592
+Donald Duck\t2/7/1828"""
     source_file = SourceFile(
         path="tests/data/birthdays.xlsx",
         mime_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
@@ -109,15 +103,15 @@ Page 2"""
     xlsx = MsExcelProvider()
     assert xlsx.supports(source_file)
     docs = xlsx.process_file(source_file)
-    assert len(docs) > 0
+    assert len(docs) == 2
     assert docs[0].page_content == expected_p1
-    assert docs[0].metadata["page"] == 1
-    assert docs[1].page_content == expected_p2
-    assert docs[1].metadata["page"] == 2
+    assert docs[0].metadata == {"sheet": "BirthdaySheet", "first_row": 2, "last_row": 3}
+    assert docs[1].page_content == "Name 1\tName 2\tAnniversary\nMickey Mouse\tMini Mouse\t1911-01-01"
+    assert docs[1].metadata == {"sheet": "AnniversarySheet", "first_row": 2, "last_row": 2}
 
     pdf = xlsx.convert_file_to_pdf(source_file)
-    assert_pdf_contains_text(pdf, expected_p1)
-    assert_pdf_contains_text(pdf, expected_p2)
+    assert_pdf_contains_text(pdf, "Mickey Mouse")
+    assert_pdf_contains_text(pdf, "AnniversarySheet")
     assert pdf.id == source_file.id
 
 
@@ -134,6 +128,7 @@ def test_docx_provider() -> None:
     docs = docx.process_file(source_file)
     assert len(docs) > 0
     assert docs[0].page_content == expected
+    assert docs[0].metadata["paragraph"] == 1
 
     pdf = docx.convert_file_to_pdf(source_file)
     assert_pdf_contains_text(pdf, expected)
@@ -155,6 +150,7 @@ Gladstone Gander: 5/14/2001"""
     docs = pptx.process_file(source_file)
     assert len(docs) > 0
     assert docs[0].page_content == expected
+    assert docs[0].metadata["slide"] == 1
 
     pdf = pptx.convert_file_to_pdf(source_file)
     assert_pdf_contains_text(pdf, "Gladstone Gander")
@@ -199,6 +195,66 @@ Page 2"""
     assert converted_pdf_file.id == source_file.id
 
 
+def test_pdf_provider_parses_page_ranges_in_parallel() -> None:
+    source_file = SourceFile(path="tests/data/birthdays.pdf", mime_type="application/pdf", file_name="text.pdf")
+    config = get_test_config(
+        dict(worker_pool_size=2, filesize_threshold=1, pdf_parallel_min_pages=1, pdf_page_range_size=1)
+    )
+
+    sequential = PdfProvider().process_file(source_file)
+    pdf = PdfProvider(config=config)
+    count_pages.cache_clear()
+    assert pdf.distributes_to_worker_pool(source_file)
+    assert pdf.page_ranges(source_file) == [(0, 1), (1, 2)]
+    try:
+        parallel = pdf.process_file(source_file)
+    finally:
+        shutdown_worker_pool()
+    # the pdf is read once to count its pages
+    assert count_pages.cache_info().misses == 1
+
+    assert [d.page_content for d in parallel] == [d.page_content for d in sequential]
+    assert [d.metadata["page"] for d in parallel] == [1, 2]
+    assert [d.metadata["total_pages"] for d in parallel] == [2, 2]
+
+
+def test_pdf_provider_continues_with_next_engine(mocker: MockerFixture) -> None:
+    source_file = SourceFile(path="tests/data/birthdays.pdf", mime_type="application/pdf", file_name="text.pdf")
+
+    lazy_parse = TolerantPDFMinerParser.lazy_parse
+
+    def fail_after_first_page(self: TolerantPDFMinerParser, blob: Blob) -> Iterator[Document]:
+        yield next(lazy_parse(self, blob))
+        raise ValueError("broken page")
+
+    mocker.patch.object(TolerantPDFMinerParser, "lazy_parse", fail_after_first_page)
+
+    docs = PdfProvider(config=get_test_config(dict(pdf_engines=("pdfminer", "pypdf")))).process_file(source_file)
+    assert [d.metadata["page"] for d in docs] == [1, 2]
+    assert docs[0].metadata["pdf_parser"].startswith("PDFMiner")
+    assert docs[1].metadata["pdf_parser"].startswith("PyPDF")
+    assert docs[1].metadata["total_pages"] == 2
+    assert "Quack" in docs[1].page_content
+
+
+def test_pdf_provider_fast_engine() -> None:
+    source_file = SourceFile(path="tests/data/birthdays.pdf", mime_type="application/pdf", file_name="text.pdf")
+
+    # the birthday sheet is a table, which the fast engine leaves to PDFMiner
+    docs = PdfProvider(config=get_test_config(dict(pdf_engines=("fast", "pdfminer")))).process_file(source_file)
+    assert docs[0].metadata["pdf_parser"].startswith("PDFMiner")
+
+    # as the last engine, it does not decline
+    docs = PdfProvider(config=get_test_config(dict(pdf_engines=("fast",)))).process_file(source_file)
+    assert docs[0].metadata["pdf_parser"].startswith("PyPDF")
+    assert [d.metadata["page"] for d in docs] == [1, 2]
+
+    prose = "The quick brown fox jumps over the lazy dog and runs into the woods.\n" * 10
+    assert is_plain_text(prose)
+    assert not is_plain_text("Name Birthday\nDarkwing Duck 03/14/1892\nDaisy Duck 02/07/1228")
+    assert not is_plain_text(prose.replace(" ", ""))
+
+
 def test_code_provider() -> None:
     content = b'print("Hello World!)'
     expected = content.decode()
@@ -340,6 +396,152 @@ def get_config_all_formats_enabled() -> Config:
     )
 
 
+def whisper_config(**kwargs: int) -> Config:
+    return get_test_config(
+        dict(
+            stt_type="azure-openai-whisper",
+            stt_azure_openai_whisper_endpoint="https://example.com",
+            stt_azure_openai_whisper_deployment_name="whisper",
+            stt_azure_openai_whisper_api_version="version",
+            stt_azure_openai_whisper_api_key="secret",
+            **kwargs,
+        )
+    )
+
+
+def whisper_error(error: type[openai.APIStatusError], status_code: int) -> openai.APIStatusError:
+    response = httpx.Response(status_code, headers={"retry-after": "0"}, request=httpx.Request("POST", "https://x"))
+    return error("error", response=response, body=None)
+
+
+def mock_segments(mocker: MockerFixture, provider: VoiceTranscriptionProvider, n: int) -> list[SourceFile]:
+    segments = [SourceFile(path=f"segment-{i}.mp3", mime_type="audio/mp3", file_name="") for i in range(n)]
+    mocker.patch.object(SourceFile, "delete")
+    mocker.patch.object(provider, "split_into_compatible_format", return_value=(segments, [0, 300, 600, 750], "mp3"))
+    return segments
+
+
+def test_voice_transcription_provider_transcribes_segments_concurrently(mocker: MockerFixture) -> None:
+    provider = VoiceTranscriptionProvider(config=whisper_config(stt_concurrency=3))
+    mock_segments(mocker, provider, 3)
+    running = []
+    lock = threading.Lock()
+
+    def parse(blob: Blob) -> list[Document]:
+        with lock:
+            running.append(str(blob.path))
+        # the first segment finishes last, the transcripts are in order nevertheless
+        time.sleep(0.3 if str(blob.path) == "segment-0.mp3" else 0.1)
+        return [Document(str(blob.path))]
+
+    assert provider.parser is not None
+    mocker.patch.object(provider.parser, "parse", side_effect=parse)
+
+    start = time.monotonic()
+    docs = provider.parse_file(SourceFile(path="meeting.mp3", mime_type="audio/mp3", file_name="meeting.mp3"))
+
+    assert time.monotonic() - start < 0.5
+    assert len(running) == 3
+    assert [d.page_content for d in docs] == ["segment-0.mp3", "segment-1.mp3", "segment-2.mp3"]
+    assert [(d.metadata["segment_begin_seconds"], d.metadata["segment_end_seconds"]) for d in docs] == [
+        (0, 300),
+        (300, 600),
+        (600, 750),
+    ]
+    assert docs[0].metadata["total_segments"] == 3
+    assert docs[0].metadata["total_duration"] == 750
+
+
+def test_voice_transcription_provider_retries_segments(mocker: MockerFixture) -> None:
+    provider = VoiceTranscriptionProvider(config=whisper_config(stt_retries=2))
+    mock_segments(mocker, provider, 1)
+    assert provider.parser is not None
+    parse = mocker.patch.object(
+        provider.parser,
+        "parse",
+        side_effect=[
+            whisper_error(openai.RateLimitError, 429),
+            whisper_error(openai.InternalServerError, 500),
+            [Document("transcript")],
+        ],
+    )
+
+    docs = provider.parse_file(SourceFile(path="meeting.mp3", mime_type="audio/mp3", file_name="meeting.mp3"))
+
+    assert parse.call_count == 3
+    assert docs[0].page_content == "transcript"
+
+    # segments which are too large are not sent again
+    parse.reset_mock(side_effect=True)
+    parse.side_effect = whisper_error(openai.APIStatusError, 413)
+    with pytest.raises(ProcessingError):
+        provider.parse_file(SourceFile(path="meeting.mp3", mime_type="audio/mp3", file_name="meeting.mp3"))
+    assert parse.call_count == 1
+
+
+def test_voice_transcription_provider_shares_transcript_within_ingest(mocker: MockerFixture) -> None:
+    provider = VoiceTranscriptionProvider(config=whisper_config())
+    transcript = [Document("Happy birthday", metadata={"segment_begin_seconds": 0.0, "total_segments": 1})]
+    parse_file = mocker.patch.object(provider, "parse_file", return_value=transcript)
+    file = SourceFile(path="tests/data/birthdays.mp3", mime_type="audio/mp3", file_name="birthdays.mp3")
+
+    with file.artifacts():
+        chunks = provider.process_file(file)
+        assert provider.transcribe(file) == transcript
+    assert parse_file.call_count == 1
+    assert chunks == transcript
+
+    # outside of an ingest, nothing is kept
+    provider.transcribe(file)
+    assert parse_file.call_count == 2
+
+
+def fake_segment_muxer(stream: ffmpeg.nodes.OutputStream, **_kwargs: bool) -> tuple[bytes, bytes]:
+    args = ffmpeg.get_args(stream)
+    pattern, segment_list = args[-1], args[args.index("-segment_list") + 1]
+    with open(segment_list, "w") as f:
+        for n, (start, end) in enumerate([(0, 300), (300, 600), (600, 750.5)]):
+            path = pattern % n
+            with open(path, "wb") as segment:
+                segment.write(b"audio")
+            f.write(f"{os.path.basename(path)},{start}.000000,{end}\n")
+    return b"", b""
+
+
+@pytest.mark.parametrize(
+    "codec, bit_rate, segment_duration, expected",
+    [
+        # a copy of the stream fits into 25 MB
+        ("mp3", "320000", 300, ["-c", "copy"]),
+        # codecs which whisper does not support
+        ("pcm_s16le", "1411200", 300, ["-b:a", "128000"]),
+        # a copy would be too large
+        ("flac", "1411200", 300, ["-b:a", "128000"]),
+        ("mp3", "128000", 3600, ["-b:a", "44444"]),
+        # unknown bitrate
+        ("mp3", None, 300, ["-b:a", "128000"]),
+    ],
+)
+def test_voice_transcription_provider_segments_in_one_pass(
+    mocker: MockerFixture, codec: str, bit_rate: str | None, segment_duration: int, expected: list[str]
+) -> None:
+    stream = {"codec_type": "audio", "codec_name": codec} | ({"bit_rate": bit_rate} if bit_rate else {})
+    mocker.patch("ffmpeg.probe", return_value={"streams": [stream], "format": {"duration": "750.5"}})
+    run = mocker.patch.object(ffmpeg.nodes.OutputStream, "run", autospec=True, side_effect=fake_segment_muxer)
+
+    provider = VoiceTranscriptionProvider()
+    segments, timestamps, _codec = provider.split_into_compatible_format("meeting.audio", segment_duration)
+    try:
+        run.assert_called_once()
+        args = ffmpeg.get_args(run.call_args.args[0])
+        assert " ".join(expected) in " ".join(args)
+        assert all(s.exists for s in segments)
+        assert timestamps == [0, 300, 600, 750.5]
+    finally:
+        for segment in segments:
+            segment.delete()
+
+
 def test_format_providers_unique() -> None:
     # ensure that there are no two providers which handle the same file
     config = get_config_all_formats_enabled()
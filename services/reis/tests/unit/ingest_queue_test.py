@@ -0,0 +1,258 @@
+from pathlib import Path
+import time
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from langchain_community.embeddings import FakeEmbeddings
+from pytest_mock import MockerFixture
+
+from rei_s.config import Config, get_config
+from rei_s.services.ingest_queue import IngestQueue
+from rei_s.services.job_store_adapter import IngestJob, JobStatus
+from rei_s.services.job_stores.sqlite import SqliteJobStoreAdapter
+from rei_s.services.vectorstores.devnull_store import DevNullVectorStoreAdapter
+from rei_s.services.work_scheduler import WorkScheduler
+from tests.conftest import get_default_test_config, get_test_config
+
+
+def get_job_config(path: Path, **kwargs: int | str) -> Config:
+    return get_test_config(
+        dict(
+            metrics_port=0,  # disable prometheus
+            batch_size=2,
+            job_store_type="sqlite",
+            job_store_sqlite_path=str(path / "jobs.sqlite"),
+            job_spool_dir=str(path / "spool"),
+            **kwargs,
+        )
+    )
+
+
+def new_job(job_id: str, owner: str = "other", heartbeat_at: float | None = None) -> IngestJob:
+    job = IngestJob(
+        id=job_id,
+        file_id=f"file-{job_id}",
+        file_name="birthdays.pdf",
+        mime_type="application/pdf",
+        bucket="1",
+        index_name=None,
+        path=f"/spool/{job_id}",
+        owner=owner,
+    )
+    if heartbeat_at is not None:
+        job.heartbeat_at = heartbeat_at
+    return job
+
+
+def test_sqlite_job_store(tmp_path: Path) -> None:
+    store = SqliteJobStoreAdapter.create(get_job_config(tmp_path, job_lease=60))
+    store.add(new_job("alive", owner="me"))
+    store.add(new_job("abandoned", heartbeat_at=time.time() - 120))
+    store.add(new_job("finished", heartbeat_at=time.time() - 120))
+    store.set_status("finished", "failed", "Processing failed", 400)
+    store.set_progress("alive", 4, None)
+
+    alive = store.get("alive")
+    assert alive is not None
+    assert (alive.status, alive.chunks_done, alive.chunks_total) == ("queued", 4, None)
+    finished = store.get("finished")
+    assert finished is not None
+    assert (finished.status, finished.error, finished.error_status) == ("failed", "Processing failed", 400)
+    assert store.get("missing") is None
+
+    abandoned = store.list_abandoned()
+    assert [job.id for job in abandoned] == ["abandoned"]
+    assert store.claim(abandoned[0], "me")
+    # someone else was faster
+    assert not store.claim(abandoned[0], "you")
+    assert store.list_abandoned() == []
+    claimed = store.get("abandoned")
+    assert claimed is not None
+    assert (claimed.owner, claimed.attempts) == ("me", 2)
+
+    # the chunks of an attempt are only needed, until the job is finished
+    store.add_chunk_ids("abandoned", ["chunk-1", "chunk-2"])
+    store.add_chunk_ids("abandoned", ["chunk-3"])
+    assert store.get_chunk_ids("abandoned") == ["chunk-1", "chunk-2", "chunk-3"]
+    store.set_status("abandoned", "running")
+    assert store.get_chunk_ids("abandoned") == ["chunk-1", "chunk-2", "chunk-3"]
+    store.set_status("abandoned", "done")
+    assert store.get_chunk_ids("abandoned") == []
+    store.set_status("abandoned", "running")
+
+    store.heartbeat("me")
+    store.ttl = 0
+    store.evict()
+    assert store.get("finished") is None
+    # unfinished jobs are not evicted
+    assert store.get("alive") is not None
+    assert store.get("abandoned") is not None
+
+
+def test_async_upload(mocker: MockerFixture, app: FastAPI, tmp_path: Path) -> None:
+    app.dependency_overrides[get_config] = lambda: get_job_config(tmp_path)
+    mocker.patch("rei_s.services.embeddings_provider.get_embeddings", return_value=FakeEmbeddings(size=1352))
+    mocker.patch("rei_s.services.store_service.get_vector_store", return_value=DevNullVectorStoreAdapter())
+
+    with TestClient(app) as client:
+        with open("tests/data/birthdays.pdf", "rb") as f:
+            response = client.post(
+                "/files",
+                content=f.read(),
+                headers={
+                    "bucket": "1",
+                    "id": "doc",
+                    "fileName": "birthdays.pdf",
+                    "fileMimeType": "application/pdf",
+                    "Prefer": "respond-async",
+                },
+            )
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+        assert response.headers["Location"] == f"/jobs/{job_id}"
+        assert response.json()["fileId"] == "doc"
+
+        for _ in range(100):
+            job = client.get(f"/jobs/{job_id}").json()
+            if job["status"] in {"done", "failed"}:
+                break
+            time.sleep(0.1)
+
+        assert job["status"] == "done"
+        assert job["chunksDone"] == job["chunksTotal"] > 0
+        assert client.get("/jobs/missing").status_code == 404
+
+    # the spooled file is deleted with the finished job
+    assert list((tmp_path / "spool").iterdir()) == []
+    app.dependency_overrides[get_config] = get_default_test_config
+
+
+def test_abandoned_jobs_are_resumed(mocker: MockerFixture, tmp_path: Path) -> None:
+    config = get_job_config(
+        tmp_path, job_lease=1, file_store_type="filesystem", file_store_filesystem_basepath=str(tmp_path / "files")
+    )
+    store = SqliteJobStoreAdapter.create(config)
+    process_and_add_file = mocker.patch("rei_s.services.store_service.process_and_add_file")
+    vector_store = mocker.patch("rei_s.services.store_service.get_vector_store").return_value
+    # the preview of the version of the document, which was stored before the upload
+    (tmp_path / "files").mkdir()
+    (tmp_path / "files" / "file-crashed").write_bytes(b"%PDF previous")
+
+    with WorkScheduler(workers=1) as executor:
+        queue = IngestQueue(config, store, executor)
+
+        # the process, which accepted the first job, died while storing the chunks
+        crashed = new_job("crashed", heartbeat_at=time.time() - 10)
+        crashed.path = queue.spool_path("crashed")
+        Path(crashed.path).write_bytes(b"%PDF")
+        store.add(crashed)
+        store.set_status("crashed", "running")
+        store.add_chunk_ids("crashed", ["chunk-1", "chunk-2"])
+        # the file of the second job is only known to another process
+        store.add(new_job("elsewhere", heartbeat_at=time.time() - 10))
+
+        queue.start()
+    queue.close()
+
+    job = store.get("crashed")
+    assert job is not None
+    assert (job.status, job.owner) == ("done", queue.owner)
+    # only the chunks of the interrupted attempt are removed, the previous version stays until it is replaced
+    vector_store.delete_chunks.assert_called_once_with(["chunk-1", "chunk-2"])
+    vector_store.delete.assert_not_called()
+    assert (tmp_path / "files" / "file-crashed").read_bytes() == b"%PDF previous"
+    assert process_and_add_file.call_count == 1
+    assert not Path(crashed.path).exists()
+    elsewhere = store.get("elsewhere")
+    assert elsewhere is not None
+    assert elsewhere.status == "queued"
+
+
+def test_failed_jobs_keep_the_error(mocker: MockerFixture, tmp_path: Path) -> None:
+    config = get_job_config(tmp_path)
+    store = SqliteJobStoreAdapter.create(config)
+    mocker.patch(
+        "rei_s.services.store_service.process_and_add_file",
+        side_effect=HTTPException(status_code=415, detail="File format not supported."),
+    )
+
+    with WorkScheduler(workers=1) as executor:
+        queue = IngestQueue(config, store, executor)
+        Path(queue.spool_path("job")).write_bytes(b"?")
+        queue.add("job", "doc", "unknown.xyz", "", "1", None)
+
+    job = store.get("job")
+    assert job is not None
+    assert (job.status, job.error, job.error_status) == ("failed", "File format not supported.", 415)
+    assert not Path(queue.spool_path("job")).exists()
+
+
+def test_jobs_fail_after_too_many_attempts(mocker: MockerFixture, tmp_path: Path) -> None:
+    config = get_job_config(
+        tmp_path,
+        job_lease=1,
+        job_max_attempts=2,
+        file_store_type="filesystem",
+        file_store_filesystem_basepath=str(tmp_path / "files"),
+    )
+    store = SqliteJobStoreAdapter.create(config)
+    process_and_add_file = mocker.patch("rei_s.services.store_service.process_and_add_file")
+    vector_store = mocker.patch("rei_s.services.store_service.get_vector_store").return_value
+
+    with WorkScheduler(workers=1) as executor:
+        queue = IngestQueue(config, store, executor)
+
+        # the file crashed the processes of both attempts
+        crashed = new_job("crashed", heartbeat_at=time.time() - 10)
+        crashed.path = queue.spool_path("crashed")
+        crashed.attempts = 2
+        Path(crashed.path).write_bytes(b"%PDF")
+        store.add(crashed)
+        store.set_status("crashed", "running")
+        # the last attempt crashed before its preview was stored
+        store.add_chunk_ids("crashed", ["chunk-1"])
+
+        queue.start()
+    queue.close()
+
+    job = store.get("crashed")
+    assert job is not None
+    assert (job.status, job.error, job.attempts) == ("failed", "Processing was interrupted too often", 3)
+    process_and_add_file.assert_not_called()
+    # the chunks of the last attempt are removed
+    vector_store.delete_chunks.assert_called_once_with(["chunk-1"])
+    assert store.get_chunk_ids("crashed") == []
+    assert not Path(crashed.path).exists()
+
+
+def test_unsaved_statuses_are_retried(mocker: MockerFixture, tmp_path: Path) -> None:
+    config = get_job_config(tmp_path)
+    store = SqliteJobStoreAdapter.create(config)
+    mocker.patch("rei_s.services.store_service.process_and_add_file")
+    set_status = store.set_status
+
+    def fail_once(job_id: str, status: JobStatus, error: str | None = None, error_status: int | None = None) -> None:
+        if status == "done" and not failed:
+            failed.append(status)
+            raise OSError("database is locked")
+        set_status(job_id, status, error, error_status)
+
+    failed: list[str] = []
+    mocker.patch.object(store, "set_status", side_effect=fail_once)
+
+    with WorkScheduler(workers=1) as executor:
+        queue = IngestQueue(config, store, executor)
+        Path(queue.spool_path("job")).write_bytes(b"%PDF")
+        queue.add("job", "doc", "birthdays.pdf", "application/pdf", "1", None)
+
+    job = store.get("job")
+    assert job is not None
+    assert job.status == "running"
+    # the file is not needed anymore, even though the status was not saved
+    assert not Path(queue.spool_path("job")).exists()
+
+    queue.save_statuses()
+    job = store.get("job")
+    assert job is not None
+    assert job.status == "done"
+    assert queue.unsaved == {}
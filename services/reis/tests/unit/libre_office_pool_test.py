@@ -0,0 +1,203 @@
+import os
+from pathlib import Path
+import shutil
+import socket
+import sys
+import time
+
+import pytest
+from pytest_mock import MockerFixture
+
+from rei_s.services import libre_office_pool
+from rei_s.services.libre_office_pool import (
+    LibreOfficeError,
+    LibreOfficePool,
+    get_libre_office_pool,
+    shutdown_libre_office_pool,
+)
+from tests.conftest import get_test_config
+
+# stand-ins for the commands of unoserver, such that the pool runs its real processes without LibreOffice
+# it starts a child in place of LibreOffice and writes its pid into the profile
+FAKE_UNOSERVER = """
+import socket
+import subprocess
+import sys
+
+port = int(sys.argv[sys.argv.index("--port") + 1])
+server = socket.socket()
+server.bind(("127.0.0.1", port))
+server.listen()
+child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(600)"])
+profile = sys.argv[sys.argv.index("--user-installation") + 1].removeprefix("file://")
+with open(profile + "/child.pid", "w") as f:
+    f.write(str(child.pid))
+while True:
+    server.accept()[0].close()
+"""
+
+# copies the file instead of converting it, the next conversion of a file fails, if `<file>.fail` exists
+FAKE_UNOCONVERT = """
+import os
+import shutil
+import sys
+
+source, target = sys.argv[-2:]
+if os.path.exists(source + ".fail"):
+    os.remove(source + ".fail")
+    sys.exit(1)
+shutil.copy(source, target)
+"""
+
+
+def running(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # a zombie has exited, but is not reaped yet
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@pytest.fixture
+def fake_unoserver(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name, script in [("unoserver", FAKE_UNOSERVER), ("unoconvert", FAKE_UNOCONVERT)]:
+        path = bin_dir / name
+        path.write_text(f"#!{sys.executable}\n{script}")
+        path.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+@pytest.mark.usefixtures("fake_unoserver")
+def test_pool_reuses_daemons(tmp_path: Path) -> None:
+    source = tmp_path / "in.docx"
+    source.write_bytes(b"document")
+
+    pool = LibreOfficePool(size=1, timeout=10)
+    try:
+        pool.convert(str(source), str(tmp_path / "first.pdf"))
+        process = pool.daemons[0].process
+        pool.convert(str(source), str(tmp_path / "second.pdf"))
+
+        assert pool.daemons[0].process is process
+    finally:
+        pool.shutdown()
+
+    assert (tmp_path / "second.pdf").read_bytes() == b"document"
+    assert process is not None and process.poll() is not None
+
+
+@pytest.mark.usefixtures("fake_unoserver")
+def test_pool_restarts_daemons_after_a_failed_conversion(tmp_path: Path) -> None:
+    source = tmp_path / "in.docx"
+    source.write_bytes(b"document")
+
+    pool = LibreOfficePool(size=1, timeout=10)
+    try:
+        pool.convert(str(source), str(tmp_path / "warm-up.pdf"))
+        process = pool.daemons[0].process
+        (tmp_path / "in.docx.fail").touch()
+
+        # the daemon still answers, but it is restarted before the conversion is retried
+        pool.convert(str(source), str(tmp_path / "out.pdf"))
+
+        assert pool.daemons[0].process is not process
+        assert pool.daemons[0].healthy()
+    finally:
+        pool.shutdown()
+
+    assert (tmp_path / "out.pdf").exists()
+
+
+@pytest.mark.usefixtures("fake_unoserver")
+def test_pool_gives_up_after_retry(tmp_path: Path) -> None:
+    pool = LibreOfficePool(size=2, timeout=10)
+    try:
+        with pytest.raises(LibreOfficeError):
+            pool.convert(str(tmp_path / "missing.docx"), str(tmp_path / "out.pdf"))
+        # the daemon is handed out again for the next document
+        with pytest.raises(LibreOfficeError):
+            pool.convert(str(tmp_path / "missing.docx"), str(tmp_path / "out.pdf"))
+        assert len(pool.daemons) == 1
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.skipif(shutil.which("unoserver") is None, reason="unoserver is not installed")
+def test_pool_converts_with_libre_office(tmp_path: Path) -> None:
+    pool = LibreOfficePool(size=1, timeout=120)
+    try:
+        pool.convert(os.path.abspath("tests/data/birthdays.docx"), str(tmp_path / "birthdays.pdf"))
+    finally:
+        pool.shutdown()
+
+    assert (tmp_path / "birthdays.pdf").read_bytes().startswith(b"%PDF")
+
+
+@pytest.mark.usefixtures("fake_unoserver")
+def test_stop_kills_the_process_group(tmp_path: Path) -> None:
+    source = tmp_path / "in.docx"
+    source.write_bytes(b"document")
+
+    pool = LibreOfficePool(size=1, timeout=10)
+    try:
+        pool.convert(str(source), str(tmp_path / "out.pdf"))
+        child = int(Path(pool.daemons[0].profile, "child.pid").read_text())
+        assert running(child)
+    finally:
+        pool.shutdown()
+
+    # the instance of LibreOffice does not outlive unoserver
+    for _ in range(50):
+        if not running(child):
+            break
+        time.sleep(0.1)
+    assert not running(child)
+
+
+@pytest.mark.usefixtures("fake_unoserver")
+def test_daemon_retries_when_its_port_is_taken(tmp_path: Path, mocker: MockerFixture) -> None:
+    source = tmp_path / "in.docx"
+    source.write_bytes(b"document")
+    taken = socket.socket()
+    taken.bind(("127.0.0.1", 0))
+    ports = iter([taken.getsockname()[1]])
+    free_port = libre_office_pool.free_port
+    mocker.patch.object(libre_office_pool, "free_port", side_effect=lambda: next(ports, None) or free_port())
+
+    pool = LibreOfficePool(size=1, timeout=10)
+    try:
+        pool.convert(str(source), str(tmp_path / "out.pdf"))
+        assert pool.daemons[0].port != taken.getsockname()[1]
+    finally:
+        pool.shutdown()
+        taken.close()
+
+
+def test_get_libre_office_pool(mocker: MockerFixture) -> None:
+    mocker.patch.object(libre_office_pool, "UNOSERVER_AVAILABLE", False)
+    assert get_libre_office_pool(get_test_config()) is None
+
+    mocker.patch.object(libre_office_pool, "UNOSERVER_AVAILABLE", True)
+    assert get_libre_office_pool(get_test_config(dict(libre_office_pool_size=0))) is None
+    try:
+        pool = get_libre_office_pool(get_test_config(dict(libre_office_pool_size=3)))
+        assert pool is not None
+        assert pool.size == 3
+        assert pool.daemons == []
+    finally:
+        shutdown_libre_office_pool()
+
+    try:
+        # one instance per worker by default
+        pool = get_libre_office_pool(get_test_config(dict(workers=3, interactive_workers=1)))
+        assert pool is not None
+        assert pool.size == 4
+    finally:
+        shutdown_libre_office_pool()
+
+    # the workers are recycled or killed without cleaning up, so they convert with the soffice cli
+    mocker.patch.object(libre_office_pool, "in_worker_process", return_value=True)
+    assert get_libre_office_pool(get_test_config()) is None
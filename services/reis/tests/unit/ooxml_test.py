@@ -0,0 +1,163 @@
+from pathlib import Path
+import zipfile
+
+from pytest_mock import MockerFixture
+
+from rei_s.services.formats.ms_excel_provider import MsExcelProvider
+from rei_s.services.formats.ms_word_provider import MsWordProvider
+from rei_s.services.formats.pdf_provider import PdfProvider
+from rei_s.services.formats.ooxml import column_index, group_paragraphs, iter_docx_paragraphs, iter_xlsx_sheets
+from rei_s.types.source_file import SourceFile
+from tests.conftest import get_test_config
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+S = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PR = "http://schemas.openxmlformats.org/package/2006/relationships"
+MC = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+
+
+def write_docx(path: Path, body: str) -> str:
+    document = f'<w:document xmlns:w="{W}" xmlns:mc="{MC}"><w:body>{body}</w:body></w:document>'
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", document)
+    return str(path)
+
+
+def test_docx_paragraphs(tmp_path: Path) -> None:
+    body = (
+        "<w:p><w:r><w:t>Dagobert</w:t><w:tab/><w:t>Duck</w:t><w:br/><w:t>Entenhausen</w:t></w:r></w:p>"
+        "<w:p/>"
+        # text boxes are stored as preferred choice and as fallback, and contain paragraphs themselves
+        # the text of the paragraph containing them comes first, also if it continues after the text box
+        "<w:p><w:r><w:t>Money</w:t></w:r><mc:AlternateContent>"
+        "<mc:Choice><w:p><w:r><w:t>Text box</w:t></w:r></w:p></mc:Choice>"
+        "<mc:Fallback><w:p><w:r><w:t>Text box</w:t></w:r></w:p></mc:Fallback>"
+        "</mc:AlternateContent><w:r><w:t> bin</w:t></w:r></w:p>"
+    )
+    path = write_docx(tmp_path / "duck.docx", body)
+
+    assert list(iter_docx_paragraphs(path)) == ["Dagobert\tDuck\nEntenhausen", "", "Money bin", "Text box"]
+
+
+def test_group_paragraphs() -> None:
+    paragraphs = ["a" * 40, "", "b" * 40, "c" * 40, "d" * 200]
+
+    assert list(group_paragraphs(paragraphs, 100)) == [
+        (1, "a" * 40 + "\n\n" + "b" * 40),
+        (4, "c" * 40),
+        (5, "d" * 200),
+    ]
+
+
+def test_column_index() -> None:
+    assert column_index("A1") == 0
+    assert column_index("Z9") == 25
+    assert column_index("AB12") == 27
+
+
+def test_invalid_docx_is_converted_to_pdf(mocker: MockerFixture, tmp_path: Path) -> None:
+    path = tmp_path / "legacy.docx"
+    path.write_bytes(b"\xd0\xcf\x11\xe0 an old binary word file")
+    file = SourceFile(path=path, mime_type="", file_name="legacy.docx")
+    pdf = SourceFile(path="tests/data/birthdays.pdf", mime_type="application/pdf", file_name="legacy.docx")
+    convert = mocker.patch.object(MsWordProvider, "convert_file_to_pdf", return_value=pdf)
+    mocker.patch.object(SourceFile, "delete")
+
+    docs = MsWordProvider().process_file(file)
+
+    convert.assert_called_once()
+    assert docs[0].metadata["page"] == 1
+
+
+def write_xlsx(path: Path, rows: str) -> str:
+    workbook = (
+        f'<workbook xmlns="{S}" xmlns:r="{R}"><workbookPr date1904="false"/>'
+        '<sheets><sheet name="Ducks" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    )
+    rels = (
+        f'<Relationships xmlns="{PR}">'
+        '<Relationship Id="rId1" Type="worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="sharedStrings" Target="/xl/sharedStrings.xml"/>'
+        '<Relationship Id="rId3" Type="styles" Target="styles.xml"/>'
+        "</Relationships>"
+    )
+    shared_strings = (
+        f'<sst xmlns="{S}"><si><t>Name</t></si><si><r><t>Born</t></r><r><t xml:space="preserve"> on</t></r></si></sst>'
+    )
+    styles = (
+        f'<styleSheet xmlns="{S}"><numFmts><numFmt numFmtId="164" formatCode="dd.mm.yyyy"/></numFmts>'
+        '<cellXfs><xf numFmtId="0"/><xf numFmtId="164"/></cellXfs></styleSheet>'
+    )
+    sheet = f'<worksheet xmlns="{S}"><sheetData>{rows}</sheetData></worksheet>'
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("xl/workbook.xml", workbook)
+        archive.writestr("xl/_rels/workbook.xml.rels", rels)
+        archive.writestr("xl/sharedStrings.xml", shared_strings)
+        archive.writestr("xl/styles.xml", styles)
+        archive.writestr("xl/worksheets/sheet1.xml", sheet)
+    return str(path)
+
+
+def test_xlsx_rows(tmp_path: Path) -> None:
+    rows = (
+        '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c></row>'
+        '<row r="3"><c r="A3" t="inlineStr"><is><t>Dagobert</t></is></c><c r="C3" s="1"><v>4019.5</v></c></row>'
+        '<row r="4"><c r="A4"/></row>'
+        '<row r="5"><c r="B5" t="b"><v>1</v></c><c r="C5"><v>3.5</v></c></row>'
+    )
+    path = write_xlsx(tmp_path / "ducks.xlsx", rows)
+
+    sheets = [(name, list(rows)) for name, rows in iter_xlsx_sheets(path)]
+    assert sheets == [
+        (
+            "Ducks",
+            [(1, ["Name", "Born on"]), (3, ["Dagobert", "", "1911-01-01 12:00:00"]), (5, ["", "TRUE", "3.5"])],
+        )
+    ]
+
+
+def test_xlsx_sections_repeat_the_header() -> None:
+    rows = [(1, ["id", "name"])] + [(i, [str(i), "x" * 20]) for i in range(2, 7)]
+
+    sections = list(MsExcelProvider.sheet_sections("Ducks", rows, chunk_size=60))
+
+    assert [s.metadata for s in sections] == [
+        {"sheet": "Ducks", "first_row": 2, "last_row": 3},
+        {"sheet": "Ducks", "first_row": 4, "last_row": 5},
+        {"sheet": "Ducks", "first_row": 6, "last_row": 6},
+    ]
+    assert all(s.page_content.startswith("id\tname\n") for s in sections)
+    assert all(len(s.page_content) <= 60 for s in sections)
+    assert sections[2].page_content == "id\tname\n6\t" + "x" * 20
+
+
+def test_converted_pdf_is_parsed_with_the_config(mocker: MockerFixture, tmp_path: Path) -> None:
+    path = tmp_path / "legacy.docx"
+    path.write_bytes(b"\xd0\xcf\x11\xe0 an old binary word file")
+    file = SourceFile(path=path, mime_type="", file_name="legacy.docx")
+    pdf = SourceFile(path="tests/data/birthdays.pdf", mime_type="application/pdf", file_name="legacy.docx")
+    mocker.patch.object(MsWordProvider, "convert_file_to_pdf", return_value=pdf)
+    mocker.patch.object(SourceFile, "delete")
+    parse_and_split = mocker.spy(PdfProvider, "parse_and_split")
+
+    MsWordProvider(config=get_test_config(dict(pdf_engines=["pypdf"]))).process_file(file)
+
+    assert parse_and_split.call_args.args[2] == ("pypdf",)
+
+
+def test_files_to_convert_stay_in_the_main_process(mocker: MockerFixture, tmp_path: Path) -> None:
+    legacy = tmp_path / "legacy.docx"
+    legacy.write_bytes(b"\xd0\xcf\x11\xe0 an old binary word file")
+    legacy_file = SourceFile(path=legacy, mime_type="", file_name="legacy.docx")
+    docx_file = SourceFile(path=write_docx(tmp_path / "new.docx", ""), mime_type="", file_name="new.docx")
+    provider = MsWordProvider(config=get_test_config())
+
+    # without daemons, the conversion can run in a worker as well
+    get_pool = mocker.patch("rei_s.services.formats.office_provider.get_libre_office_pool", return_value=None)
+    assert not provider.distributes_to_worker_pool(legacy_file)
+
+    # the daemons belong to the main process
+    get_pool.return_value = mocker.Mock()
+    assert provider.distributes_to_worker_pool(legacy_file)
+    assert not provider.distributes_to_worker_pool(docx_file)
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+import pytest
+
+from rei_s.types.source_file import SourceFile, temp_file
+
+
+def test_readers_match_buffer() -> None:
+    content = "Dagobert Duck, Entenhausen – Geldspeicher\n" * 1000
+
+    with temp_file(content.encode()) as file:
+        with file.view() as view:
+            assert view.tobytes() == file.buffer
+        assert file.text() == content
+        assert b"".join(file.iter_chunks(chunk_size=100)) == file.buffer
+        with file.stream() as f:
+            assert f.read() == file.buffer
+
+
+def test_readers_of_empty_file() -> None:
+    file = SourceFile.new_temporary_file(extension="txt")
+    open(file.path, "wb").close()
+    try:
+        assert file.text() == ""
+        assert list(file.iter_chunks()) == []
+    finally:
+        file.delete()
+
+
+def test_artifacts_are_created_once() -> None:
+    calls = []
+
+    def create(path: str) -> None:
+        calls.append(path)
+        time.sleep(0.1)
+        with open(path, "w") as f:
+            f.write("converted")
+
+    with temp_file(b"original") as file:
+        assert file.artifact("converted.pdf", create) is None
+
+        with file.artifacts():
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                paths = list(executor.map(lambda _: file.artifact("converted.pdf", create), range(4)))
+
+            assert len(calls) == 1
+            assert len(set(paths)) == 1
+            path = paths[0]
+            assert path is not None
+            with open(path) as f:
+                assert f.read() == "converted"
+
+            artifact = SourceFile(path=path, mime_type="", file_name="converted.pdf", is_artifact=True)
+            artifact.delete()
+            assert artifact.exists
+
+        assert not os.path.exists(path)
+
+
+def test_failed_artifacts_are_created_again() -> None:
+    def fail(path: str) -> None:
+        with open(path, "w") as f:
+            f.write("partial")
+        raise ValueError("conversion failed")
+
+    with temp_file(b"original") as file, file.artifacts():
+        with pytest.raises(ValueError):
+            file.artifact("converted.pdf", fail)
+
+        path = file.artifact("converted.pdf", lambda p: open(p, "w").close())
+        assert path is not None
+        assert os.path.getsize(path) == 0
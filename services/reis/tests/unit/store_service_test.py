@@ -0,0 +1,253 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+from pathlib import Path
+import shutil
+from threading import Event
+from typing import Iterator
+from unittest.mock import Mock
+
+from fastapi import HTTPException
+
+from langchain_core.documents import Document
+import pytest
+from pytest_mock import MockerFixture
+
+from rei_s.services.filestores.filesystem import FSFileStoreAdapter
+from rei_s.services.formats.pdf_provider import PdfProvider
+from rei_s.services.multiprocess_utils import WorkerPool, shutdown_worker_pool
+from rei_s.services.store_service import (
+    add_batches,
+    add_file,
+    add_file_with_format,
+    aget_file_sources,
+    find_format_provider,
+    forget_file_exists,
+    generate_batches,
+    get_cached_file_exists,
+    get_file_sources,
+    process_file,
+    set_cached_file_exists,
+)
+from rei_s.services.vectorstores.devnull_store import DevNullVectorStoreAdapter
+from rei_s.types.source_file import SourceFile
+from tests.conftest import get_test_config
+
+
+def make_batches(n: int) -> list[tuple[list[Document], int, int]]:
+    return [([Document(page_content=f"chunk {i}")], i, n) for i in range(n)]
+
+
+def test_add_batches_keeps_order(mocker: MockerFixture) -> None:
+    vector_store = mocker.Mock(spec=DevNullVectorStoreAdapter)
+    vector_store.embed_documents.side_effect = lambda batch: [[float(len(batch))] for _ in batch]
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        add_batches(vector_store, make_batches(7), "doc", executor, concurrency=3)
+
+    written = [args[0][0].page_content for args, _kwargs in vector_store.add_documents.call_args_list]
+    assert written == [f"chunk {i}" for i in range(7)]
+    assert all(args[1] == [[1.0]] for args, _kwargs in vector_store.add_documents.call_args_list)
+
+
+def test_add_batches_stops_on_first_failure(mocker: MockerFixture) -> None:
+    def embed(batch: list[Document]) -> list[list[float]]:
+        if batch[0].page_content == "chunk 2":
+            raise ValueError("embedding failed")
+        return [[0.0]]
+
+    vector_store = mocker.Mock(spec=DevNullVectorStoreAdapter)
+    vector_store.embed_documents.side_effect = embed
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(ValueError, match="embedding failed"):
+            add_batches(vector_store, make_batches(10), "doc", executor, concurrency=2)
+
+    written = [args[0][0].page_content for args, _kwargs in vector_store.add_documents.call_args_list]
+    assert written == ["chunk 0", "chunk 1"]
+    # the window bounds the number of batches which are embedded
+    assert vector_store.embed_documents.call_count <= 5
+
+
+def mock_ingest(mocker: MockerFixture, num_chunks: int) -> Mock:
+    mocker.patch(
+        "rei_s.services.store_service.process_file_into_chunks",
+        return_value=[Document(page_content=f"chunk {i}") for i in range(num_chunks)],
+    )
+    mocker.patch("rei_s.services.store_service.get_file_store", return_value=mocker.Mock())
+    vector_store = mocker.Mock(spec=DevNullVectorStoreAdapter)
+    vector_store.embed_documents.side_effect = lambda batch: [[0.0] for _ in batch]
+    mocker.patch("rei_s.services.store_service.get_vector_store", return_value=vector_store)
+    return vector_store
+
+
+def test_failed_preview_removes_written_chunks(mocker: MockerFixture) -> None:
+    config = get_test_config(dict(batch_size=1))
+    vector_store = mock_ingest(mocker, 3)
+    stored = Event()
+    vector_store.add_documents.side_effect = lambda *args: stored.set()
+
+    def fail_preview(*args: object) -> None:
+        # the preview fails after the first chunks were stored
+        stored.wait(10)
+        raise HTTPException(status_code=400, detail="Conversion failed")
+
+    mocker.patch("rei_s.services.store_service.save_pdf_preview", side_effect=fail_preview)
+    file = SourceFile(path="tests/data/birthdays.yaml", mime_type="application/yaml", file_name="birthdays.yaml")
+
+    with pytest.raises(HTTPException, match="Conversion failed"):
+        add_file_with_format(config, file, find_format_provider(config, file), "1", "doc")
+
+    written = [doc.id for args, _kwargs in vector_store.add_documents.call_args_list for doc in args[0]]
+    assert written
+    # a previously stored version of the document is kept
+    vector_store.delete.assert_not_called()
+    vector_store.delete_chunks.assert_called_once_with(written)
+
+
+def test_failed_embedding_removes_written_chunks(mocker: MockerFixture) -> None:
+    config = get_test_config(dict(batch_size=1))
+    vector_store = mock_ingest(mocker, 3)
+    mocker.patch("rei_s.services.store_service.save_pdf_preview")
+
+    def embed(batch: list[Document]) -> list[list[float]]:
+        if batch[0].page_content == "chunk 1":
+            raise ValueError("embedding failed")
+        return [[0.0]]
+
+    vector_store.embed_documents.side_effect = embed
+    file = SourceFile(path="tests/data/birthdays.yaml", mime_type="application/yaml", file_name="birthdays.yaml")
+
+    with pytest.raises(ValueError, match="embedding failed"):
+        add_file_with_format(config, file, find_format_provider(config, file), "1", "doc")
+
+    assert vector_store.add_documents.call_count == 1
+    written = [doc.id for doc in vector_store.add_documents.call_args.args[0]]
+    vector_store.delete.assert_not_called()
+    vector_store.delete_chunks.assert_called_once_with(written)
+
+
+def test_chunk_ids_are_reported_before_they_are_written(mocker: MockerFixture) -> None:
+    config = get_test_config(dict(batch_size=1))
+    vector_store = mock_ingest(mocker, 3)
+    mocker.patch("rei_s.services.store_service.save_pdf_preview")
+    reported: list[str] = []
+
+    def add_documents(batch: list[Document], *args: object) -> None:
+        # a crash while writing the batch must not leave unknown chunks behind
+        assert all(doc.id in reported for doc in batch)
+
+    vector_store.add_documents.side_effect = add_documents
+    file = SourceFile(path="tests/data/birthdays.yaml", mime_type="application/yaml", file_name="birthdays.yaml")
+
+    add_file_with_format(config, file, find_format_provider(config, file), "1", "doc", on_chunk_ids=reported.extend)
+
+    written = [doc.id for args, _kwargs in vector_store.add_documents.call_args_list for doc in args[0]]
+    assert reported == written
+
+
+def test_aget_file_sources_matches_sync(tmp_path: Path) -> None:
+    config = get_test_config(dict(file_store_type="filesystem", file_store_filesystem_basepath=str(tmp_path)))
+    (tmp_path / "stored").write_bytes(b"%PDF")
+    results = [
+        Document(page_content="a", metadata={"doc_id": "stored", "source": "a.pdf", "page": 1}),
+        Document(page_content="b", metadata={"doc_id": "missing", "source": "b.pdf"}),
+    ]
+
+    sources = asyncio.run(aget_file_sources(config, results))
+
+    assert sources == get_file_sources(config, results)
+    assert [source.document and source.document.download_available for source in sources] == [True, False]
+
+
+def test_get_file_sources_caches_existence(mocker: MockerFixture, tmp_path: Path) -> None:
+    config = get_test_config(
+        dict(file_store_type="filesystem", file_store_filesystem_basepath=str(tmp_path), file_exists_cache_ttl=60)
+    )
+    exists_many = mocker.patch.object(FSFileStoreAdapter, "exists_many", autospec=True, return_value={"doc": True})
+    results = [Document(page_content="a", metadata={"doc_id": "doc"})]
+
+    get_file_sources(config, results)
+    sources = asyncio.run(aget_file_sources(config, results))
+
+    assert exists_many.call_count == 1
+    assert sources[0].document and sources[0].document.download_available
+
+    forget_file_exists(config, "doc")
+    get_file_sources(config, results)
+
+    assert exists_many.call_count == 2
+
+
+def test_add_file_forgets_file_exists(mocker: MockerFixture, tmp_path: Path) -> None:
+    config = get_test_config(
+        dict(file_store_type="filesystem", file_store_filesystem_basepath=str(tmp_path), file_exists_cache_ttl=60)
+    )
+    # the preview might be generated in another thread or process
+    mocker.patch("rei_s.services.store_service.save_pdf_preview")
+    set_cached_file_exists(config, {"doc": False, "other": False})
+    file = SourceFile(path="tests/data/birthdays.yaml", mime_type="application/yaml", file_name="birthdays.yaml")
+
+    add_file(config, file, bucket="1", doc_id="doc")
+
+    assert get_cached_file_exists(config, ["doc", "other"]) == ({"other": False}, ["doc"])
+
+
+def test_generate_batches_streams_chunks() -> None:
+    config = get_test_config(dict(batch_size=3))
+    file = SourceFile(path="test.pdf", mime_type="application/pdf", file_name="test.pdf")
+    consumed = []
+
+    def chunks() -> Iterator[Document]:
+        for i in range(7):
+            consumed.append(i)
+            yield Document(page_content=f"chunk {i}")
+
+    batches = generate_batches(config, file, chunks(), PdfProvider(), bucket="1", doc_id="doc")
+
+    batch, index, num_batches = next(batches)
+    # the first batch is passed on before the remaining chunks are parsed
+    assert consumed == [0, 1, 2]
+    assert (len(batch), index, num_batches) == (3, 0, None)
+    assert batch[0].metadata["doc_id"] == "doc"
+    assert [len(batch) for batch, _, _ in batches] == [3, 1]
+
+
+def test_add_office_file_converts_once(mocker: MockerFixture, tmp_path: Path) -> None:
+    config = get_test_config(dict(file_store_type="filesystem", file_store_filesystem_basepath=str(tmp_path)))
+    write_office_pdf = mocker.patch(
+        "rei_s.services.formats.utils.write_office_pdf",
+        side_effect=lambda file, path, config=None: shutil.copyfile("tests/data/birthdays.pdf", path),
+    )
+    file = SourceFile(
+        id="doc",
+        path="tests/data/birthdays.docx",
+        mime_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        file_name="birthdays.docx",
+    )
+
+    add_file(config, file, bucket="1", doc_id="doc")
+
+    # the chunking and the preview share the converted pdf
+    assert write_office_pdf.call_count == 1
+    assert (tmp_path / "doc").exists()
+    assert file.artifact_dir is None
+    assert os.path.exists(file.path)
+
+
+@pytest.mark.parametrize(
+    ("executor_type", "uses_pool"),
+    [("thread", False), ("hybrid", False), ("process", True)],
+)
+def test_small_files_in_worker_pool(mocker: MockerFixture, executor_type: str, uses_pool: bool) -> None:
+    config = get_test_config(dict(executor_type=executor_type, worker_pool_size=1))
+    run = mocker.spy(WorkerPool, "run")
+    file = SourceFile(path="tests/data/birthdays.pdf", mime_type="application/pdf", file_name="birthdays.pdf")
+
+    try:
+        chunks = process_file(config, file)
+    finally:
+        shutdown_worker_pool()
+
+    assert any("Darkwing Duck" in chunk.page_content for chunk in chunks)
+    assert run.called == uses_pool
@@ -1,4 +1,7 @@
 from io import BytesIO
+import re
+from typing import Any, Generator
+from aioresponses import aioresponses
 from faker import Faker
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
@@ -70,29 +73,50 @@ def test_upload_file(faker: Faker, client: TestClient, responses: RequestsMock)
     assert response.status_code == 200
 
 
+@pytest.fixture
+def async_responses() -> Generator[aioresponses, None, None]:
+    # the search of the /files endpoint uses the async client, which is based on aiohttp
+    with aioresponses() as mock:
+        yield mock
+
+
+def search_response(filename: str, input_content: str) -> dict[str, Any]:
+    return {
+        "value": [
+            {
+                "@search.score": 0.03333333507180214,
+                "id": "1",
+                "content": input_content,
+                "metadata": '{"format": "markdown", "id": "1", "bucket": "15", "source": "%s", "doc_id": "3"}'
+                % filename,
+            }
+        ]
+    }
+
+
 def mock_search_response(responses: RequestsMock, filename: str, input_content: str) -> None:
     responses.add(index_get(endpoint, index_name, api_version))
     responses.add(
         responses.POST,
         f"{endpoint}/indexes('{index_name}')/docs/search.post.search?api-version={api_version}",
-        json={
-            "value": [
-                {
-                    "@search.score": 0.03333333507180214,
-                    "id": "1",
-                    "content": input_content,
-                    "metadata": '{"format": "markdown", "id": "1", "bucket": "15", "source": "%s", "doc_id": "3"}'
-                    % filename,
-                }
-            ]
-        },
+        json=search_response(filename, input_content),
     )
 
 
-def test_get_files(client: TestClient, responses: RequestsMock, faker: Faker) -> None:
+def mock_async_search_response(
+    responses: RequestsMock, async_responses: aioresponses, filename: str, input_content: str
+) -> None:
+    responses.add(index_get(endpoint, index_name, api_version))
+    async_responses.post(
+        re.compile(re.escape(f"{endpoint}/indexes('{index_name}')/docs/search.post.search") + ".*"),
+        payload=search_response(filename, input_content),
+    )
+
+
+def test_get_files(client: TestClient, responses: RequestsMock, async_responses: aioresponses, faker: Faker) -> None:
     filename = faker.file_name(extension="md")
     input_content = faker.text()
-    mock_search_response(responses, filename, input_content)
+    mock_async_search_response(responses, async_responses, filename, input_content)
 
     response = client.get("/files", params={"query": "test", "bucket": "1", "take": "3"})
 
@@ -106,10 +130,13 @@ def test_get_files(client: TestClient, responses: RequestsMock, faker: Faker) ->
     assert "bucket" not in content["files"][0]["metadata"]
 
 
-def test_get_documents_content(client: TestClient, responses: RequestsMock, faker: Faker) -> None:
+def test_get_documents_content(
+    client: TestClient, responses: RequestsMock, async_responses: aioresponses, faker: Faker
+) -> None:
     filename = faker.file_name(extension="md")
     input_content = faker.text()
 
+    mock_async_search_response(responses, async_responses, filename, input_content)
     mock_search_response(responses, filename, input_content)
 
     response = client.get("/files", params={"query": "test", "bucket": "1", "take": "3"})
@@ -0,0 +1,59 @@
+import asyncio
+
+from langchain_community.embeddings import FakeEmbeddings
+from pytest_mock import MockerFixture
+from sqlalchemy.exc import InvalidRequestError
+
+from rei_s.services.vectorstores import pgvector
+from rei_s.services.vectorstores.pgvector import PGVectorStoreAdapter, get_async_url
+from tests.conftest import get_test_config
+
+
+def create_adapter(mocker: MockerFixture, url: str) -> PGVectorStoreAdapter:
+    # the sync engine would connect on creation
+    mocker.patch("rei_s.services.vectorstores.pgvector.create_engine")
+    config = get_test_config(dict(store_pgvector_url=url))
+    return PGVectorStoreAdapter.create(config, FakeEmbeddings(size=8))
+
+
+def test_get_async_url() -> None:
+    assert get_async_url("postgresql://u:p@db/reis") == "postgresql+psycopg://u:p@db/reis"
+    assert get_async_url("postgresql+psycopg2://u:p@db/reis") == "postgresql+psycopg://u:p@db/reis"
+    assert get_async_url("postgresql+asyncpg://u:p@db/reis") == "postgresql+asyncpg://u:p@db/reis"
+
+
+def test_async_engine_is_created_lazily(mocker: MockerFixture) -> None:
+    create_async_engine = mocker.patch("rei_s.services.vectorstores.pgvector.create_async_engine")
+    mocker.patch("rei_s.services.vectorstores.pgvector.PGVector")
+    adapter = create_adapter(mocker, "postgresql+psycopg2://u:p@db/lazy")
+
+    create_async_engine.assert_not_called()
+
+    adapter.get_async_vector_store()
+    adapter.get_async_vector_store()
+    create_async_engine.assert_called_once()
+    assert create_async_engine.call_args.args[0] == "postgresql+psycopg://u:p@db/lazy"
+
+
+def test_search_without_async_driver(mocker: MockerFixture) -> None:
+    mocker.patch(
+        "rei_s.services.vectorstores.pgvector.create_async_engine",
+        side_effect=InvalidRequestError("The asyncio extension requires an async driver to be used."),
+    )
+    pg_vector = mocker.patch("rei_s.services.vectorstores.pgvector.PGVector")
+    pg_vector.return_value.similarity_search.return_value = []
+    adapter = create_adapter(mocker, "postgresql+psycopg2://u:p@db/sync")
+
+    # the search runs with the sync driver in a thread
+    assert asyncio.run(adapter.asimilarity_search("Donald", 3)) == []
+    pg_vector.return_value.similarity_search.assert_called_once_with("Donald", 3, None)
+
+
+def test_async_vector_store_does_not_wait_for_the_sync_setup(mocker: MockerFixture) -> None:
+    mocker.patch("rei_s.services.vectorstores.pgvector.create_async_engine")
+    mocker.patch("rei_s.services.vectorstores.pgvector.PGVector")
+    adapter = create_adapter(mocker, "postgresql+psycopg2://u:p@db/setup")
+
+    # another thread creates a sync instance, which holds the lock while it talks to the database
+    with pgvector.lock:
+        assert adapter.get_async_vector_store() is not None
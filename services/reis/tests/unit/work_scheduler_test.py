@@ -0,0 +1,83 @@
+from concurrent.futures import CancelledError, Future
+from threading import Event
+
+import pytest
+
+from rei_s.services.work_scheduler import WorkScheduler, estimate_cost
+
+
+def block(scheduler: WorkScheduler) -> tuple[Event, Future[None]]:
+    """Occupies a worker until the returned event is set."""
+    started, release = Event(), Event()
+
+    def wait() -> None:
+        started.set()
+        release.wait(10)
+
+    future = scheduler.submit(wait)
+    assert started.wait(10)
+    return release, future
+
+
+def test_interactive_work_is_started_before_bulk_work() -> None:
+    order: list[str] = []
+    with WorkScheduler(workers=1) as scheduler:
+        release, _ = block(scheduler)
+        for n in range(3):
+            scheduler.submit_prioritized("bulk", "1", estimate_cost(0), order.append, f"bulk-{n}")
+        scheduler.submit_prioritized("interactive", "", estimate_cost(0), order.append, "interactive")
+        assert (scheduler.queued("bulk"), scheduler.queued("interactive")) == (3, 1)
+        release.set()
+
+    assert order == ["interactive", "bulk-0", "bulk-1", "bulk-2"]
+
+
+def test_buckets_are_shared_fairly() -> None:
+    order: list[str] = []
+    with WorkScheduler(workers=1) as scheduler:
+        release, _ = block(scheduler)
+        # a bulk import of one bucket, which is queued before the others
+        for n in range(5):
+            scheduler.submit_prioritized("bulk", "import", estimate_cost(10**6), order.append, f"import-{n}")
+        scheduler.submit_prioritized("bulk", "small", estimate_cost(10**3), order.append, "small-0")
+        scheduler.submit_prioritized("bulk", "small", estimate_cost(10**3), order.append, "small-1")
+        release.set()
+
+    # the small files cost less, so the second one is also started before the import continues
+    assert order == ["import-0", "small-0", "small-1", "import-1", "import-2", "import-3", "import-4"]
+
+
+def test_interactive_workers_are_not_blocked_by_bulk_work() -> None:
+    with WorkScheduler(workers=1, interactive_workers=1) as scheduler:
+        release, blocked = block(scheduler)
+        bulk = scheduler.submit_prioritized("bulk", "1", estimate_cost(0), lambda: "bulk")
+        interactive = scheduler.submit_prioritized("interactive", "", estimate_cost(0), lambda: "interactive")
+
+        assert interactive.result(timeout=10) == "interactive"
+        assert not bulk.done()
+        release.set()
+        assert bulk.result(timeout=10) == "bulk"
+        assert blocked.result(timeout=10) is None
+
+
+def test_exceptions_are_set_on_the_future() -> None:
+    with WorkScheduler(workers=1) as scheduler:
+        future = scheduler.submit(int, "not a number")
+        with pytest.raises(ValueError):
+            future.result(timeout=10)
+
+
+def test_shutdown_cancels_queued_work() -> None:
+    scheduler = WorkScheduler(workers=1)
+    release, blocked = block(scheduler)
+    queued = scheduler.submit_prioritized("bulk", "1", estimate_cost(0), lambda: "bulk")
+
+    scheduler.shutdown(wait=False, cancel_futures=True)
+    release.set()
+    scheduler.shutdown(wait=True)
+
+    assert blocked.result(timeout=10) is None
+    with pytest.raises(CancelledError):
+        queued.result(timeout=10)
+    with pytest.raises(RuntimeError):
+        scheduler.submit(lambda: None)
@@ -0,0 +1,123 @@
+import os
+import time
+from typing import Iterator
+
+import pytest
+from pytest_mock import MockerFixture
+
+from rei_s.services.formats.utils import ProcessingError
+from rei_s.services.multiprocess_utils import WorkerPool, worker_pool_size
+from tests.conftest import get_test_config
+
+
+def raise_processing_error() -> None:
+    raise ProcessingError("File too large.", 413)
+
+
+def test_worker_pool_recycles_workers() -> None:
+    pool = WorkerPool(size=1, max_tasks=2, max_memory=10**12)
+    try:
+        pids = [pool.run(os.getpid) for _ in range(4)]
+    finally:
+        pool.shutdown()
+
+    assert os.getpid() not in pids
+    # every worker is replaced after two tasks
+    assert pids[0] == pids[1]
+    assert pids[1] != pids[2]
+    assert pids[2] == pids[3]
+
+
+def test_worker_pool_retires_workers_above_memory_limit() -> None:
+    pool = WorkerPool(size=1, max_tasks=100, max_memory=1)
+    try:
+        executor = pool.executor
+        first = pool.run(os.getpid)
+        second = pool.run(os.getpid)
+    finally:
+        pool.shutdown()
+
+    assert pool.executor is not executor
+    assert first != second
+
+
+def test_worker_pool_passes_exceptions() -> None:
+    pool = WorkerPool(size=1, max_tasks=100, max_memory=10**12)
+    try:
+        with pytest.raises(ProcessingError) as exc_info:
+            pool.run(raise_processing_error)
+    finally:
+        pool.shutdown()
+
+    assert exc_info.value.status == 413
+    assert exc_info.value.message == "File too large."
+
+
+def count_up(n: int) -> Iterator[int]:
+    for i in range(n):
+        yield i
+    if n > 10:
+        raise ProcessingError("File too large.", 413)
+
+
+def test_worker_pool_streams_items() -> None:
+    pool = WorkerPool(size=1, max_tasks=100, max_memory=10**12)
+    try:
+        items = list(pool.stream(count_up, 10))
+
+        # errors are raised after the items produced before
+        streamed = []
+        with pytest.raises(ProcessingError):
+            for item in pool.stream(count_up, 11):
+                streamed.append(item)
+
+        # the worker stops, if the consumer stops early
+        first = next(iter(pool.stream(count_up, 1000)))
+        assert pool.run(os.getpid) is not None
+    finally:
+        pool.shutdown()
+
+    assert items == list(range(10))
+    assert streamed == list(range(11))
+    assert first == 0
+
+
+def test_worker_pool_map_bounds_the_submitted_tasks(mocker: MockerFixture) -> None:
+    pool = WorkerPool(size=1, max_tasks=100, max_memory=10**12)
+    submit = mocker.spy(pool, "submit")
+    try:
+        results = pool.map(abs, [(-n,) for n in range(5)])
+        assert next(results) == 0
+        # the first task was consumed, so only one more task than the window is submitted
+        assert submit.call_count == pool.map_window + 1
+        assert list(results) == [1, 2, 3, 4]
+    finally:
+        pool.shutdown()
+
+
+def test_worker_pool_measures_the_overhead_without_waiting() -> None:
+    pool = WorkerPool(size=1, max_tasks=100, max_memory=10**12)
+    overheads: list[float] = []
+    try:
+        _, busy = pool.submit(time.sleep, 1)
+        # the task waits for the busy worker, which is not part of the overhead
+        pool.run(os.getpid, on_overhead=overheads.append)
+        assert busy.done()
+        assert overheads == []
+
+        cpu_times: list[float] = []
+        pool.run(sum, range(10**6), on_cpu_time=cpu_times.append, on_overhead=overheads.append)
+    finally:
+        pool.shutdown()
+
+    assert len(overheads) == 1
+    # the time the worker spent on the task is not part of the overhead
+    assert 0 <= overheads[0] < 1
+    assert cpu_times[0] > 0
+
+
+def test_worker_pool_size() -> None:
+    # one process per worker and interactive worker
+    assert worker_pool_size(get_test_config(dict(workers=3))) == 4
+    assert worker_pool_size(get_test_config(dict(workers=3, interactive_workers=0))) == 3
+    assert worker_pool_size(get_test_config(dict(workers=3, worker_pool_size=2))) == 2